@@ -1,30 +1,26 @@
-import sqlite3
 import hashlib
-from config import DB_PATH
+from utils.db import get_connection
+from utils.user_cache import UserCache
+from config import USER_CACHE_MAX_ENTRIES
+from utils.interaction_archive import purge_user_from_archive
+from department_stats import remove_user_from_rollups
 
 USER_LIMIT = 50
 
+# Registros de usuario en memoria; las funciones que modifican users la invalidan
+user_cache = UserCache(max_entries=USER_CACHE_MAX_ENTRIES)
+
 def hash_password(password: str) -> str:
     """Devuelve el hash SHA-256 de una contraseña."""
     return hashlib.sha256(password.encode()).hexdigest()
 
 def user_exists(username: str) -> bool:
     """Verifica si un nombre de usuario ya está registrado."""
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-    cursor.execute("SELECT id FROM users WHERE username = ?", (username,))
-    result = cursor.fetchone()
-    conn.close()
-    return result is not None
+    return user_cache.get_by_username(username) is not None
 
 def count_total_users() -> int:
     """Retorna el número total de usuarios registrados."""
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-    cursor.execute("SELECT COUNT(*) FROM users")
-    count = cursor.fetchone()[0]
-    conn.close()
-    return count
+    return user_cache.count()
 
 def register_user(username: str, password: str, department: str) -> str:
     """Registra un nuevo usuario con rol 'user' y departamento. Retorna mensaje de estado."""
@@ -34,75 +30,57 @@ def register_user(username: str, password: str, department: str) -> str:
     if count_total_users() >= USER_LIMIT:
         return "Se ha alcanzado el límite máximo de usuarios permitidos."
 
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-
     hashed_pw = hash_password(password)
-    cursor.execute(
-        "INSERT INTO users (username, password_hash, role, department) VALUES (?, ?, ?, ?)",
-        (username, hashed_pw, "user", department)
-    )
-    conn.commit()
-    conn.close()
+    conn = get_connection()
+    with conn:
+        conn.execute(
+            "INSERT INTO users (username, password_hash, role, department) VALUES (?, ?, ?, ?)",
+            (username, hashed_pw, "user", department)
+        )
+    user_cache.invalidate(username=username)
     return "Usuario registrado exitosamente."
 
 def login_user(username: str, password: str) -> dict:
     """Verifica credenciales. Retorna dict con éxito, user_id y rol."""
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-    cursor.execute("SELECT id, password_hash, role FROM users WHERE username = ?", (username,))
-    row = cursor.fetchone()
-    conn.close()
+    user = user_cache.get_by_username(username)
 
-    if not row:
+    if not user:
         return {"success": False, "message": "Usuario no encontrado."}
 
-    user_id, stored_hash, role = row
-    if hash_password(password) != stored_hash:
+    if hash_password(password) != user.password_hash:
         return {"success": False, "message": "Contraseña incorrecta."}
 
-    return {"success": True, "user_id": user_id, "role": role}
+    return {"success": True, "user_id": user.id, "role": user.role}
 
 def get_user_role(user_id: int) -> str:
     """Devuelve el rol ('admin' o 'user') de un usuario por su ID."""
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-    cursor.execute("SELECT role FROM users WHERE id = ?", (user_id,))
-    result = cursor.fetchone()
-    conn.close()
-    return result[0] if result else None
+    user = user_cache.get_by_id(user_id)
+    return user.role if user else None
 
 def get_user_id(username: str) -> int:
     """Devuelve el ID de usuario a partir de su nombre."""
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-    cursor.execute("SELECT id FROM users WHERE username = ?", (username,))
-    result = cursor.fetchone()
-    conn.close()
-    return result[0] if result else None
+    user = user_cache.get_by_username(username)
+    return user.id if user else None
 
 def delete_user(user_id: int) -> bool:
     """Elimina al usuario de todas las tablas. Retorna True si tuvo éxito."""
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-
-    cursor.execute("SELECT id FROM users WHERE id = ?", (user_id,))
-    if not cursor.fetchone():
-        conn.close()
-        return False
-
-    cursor.execute("DELETE FROM user_interactions WHERE user_id = ?", (user_id,))
-    cursor.execute("DELETE FROM user_metrics WHERE user_id = ?", (user_id,))
-    cursor.execute("DELETE FROM users WHERE id = ?", (user_id,))
-    conn.commit()
-    conn.close()
+    conn = get_connection()
+
+    with conn:
+        if not conn.execute("SELECT id FROM users WHERE id = ?", (user_id,)).fetchone():
+            return False
+
+        conn.execute("DELETE FROM user_interactions WHERE user_id = ?", (user_id,))
+        conn.execute("DELETE FROM user_metrics WHERE user_id = ?", (user_id,))
+        conn.execute("DELETE FROM user_scenario_seen WHERE user_id = ?", (user_id,))
+        remove_user_from_rollups(conn, user_id)
+        conn.execute("DELETE FROM users WHERE id = ?", (user_id,))
+    user_cache.invalidate(user_id=user_id)
+    # Sus interacciones antiguas también salen del archivo frío
+    purge_user_from_archive(user_id)
     return True
 
 def get_all_users() -> list:
     """Devuelve una lista de todos los usuarios registrados (excluyendo al administrador)."""
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-    cursor.execute("SELECT id, username, department FROM users WHERE role = 'user'")
-    users = cursor.fetchall()
-    conn.close()
-    return users
+    conn = get_connection()
+    return conn.execute("SELECT id, username, department FROM users WHERE role = 'user'").fetchall()
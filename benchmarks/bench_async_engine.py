@@ -0,0 +1,46 @@
+"""Benchmark: rendimiento del motor asíncrono contra un endpoint falso local.
+
+Usa utils/mock_openai_server.py con una latencia fija y mide solicitudes por
+segundo para distintos niveles de concurrencia.
+
+Uso: python benchmarks/bench_async_engine.py [--latency-ms 200] [--requests 64]
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+# El endpoint falso no valida la clave, pero el cliente exige una
+os.environ.setdefault("OPENAI_API_KEY", "bench")
+
+from chatbot_async import AsyncChatbotEngine
+from utils.mock_openai_server import MockOpenAIServer
+
+
+async def run_level(base_url, concurrency, total):
+    engine = AsyncChatbotEngine(api_key="bench", base_url=base_url, max_concurrency=concurrency)
+    messages = [{"role": "user", "content": "no hago clic"}]
+    start = time.perf_counter()
+    await asyncio.gather(*(engine.complete(messages) for _ in range(total)))
+    elapsed = time.perf_counter() - start
+    await engine.aclose()
+    return total / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--latency-ms", type=int, default=200)
+    parser.add_argument("--requests", type=int, default=64)
+    parser.add_argument("--levels", default="1,4,16,64")
+    args = parser.parse_args()
+
+    with MockOpenAIServer(latency_ms=args.latency_ms) as server:
+        for level in (int(x) for x in args.levels.split(",")):
+            rps = asyncio.run(run_level(server.base_url, level, args.requests))
+            print(f"concurrencia {level:>3}: {rps:8.1f} solicitudes/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+"""Micro-benchmark: costo por llamada de abrir una conexión nueva vs. la conexión compartida.
+
+Uso: python benchmarks/bench_db_connections.py [--calls N]
+"""
+import argparse
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from utils.db import get_connection, close_all_connections
+
+
+def prepare_db(db_path):
+    conn = sqlite3.connect(db_path)
+    conn.execute(
+        "CREATE TABLE users (id INTEGER PRIMARY KEY AUTOINCREMENT, username TEXT UNIQUE NOT NULL, "
+        "password_hash TEXT NOT NULL, role TEXT NOT NULL DEFAULT 'user')"
+    )
+    conn.executemany(
+        "INSERT INTO users (username, password_hash) VALUES (?, ?)",
+        [(f"user{i}", "x" * 64) for i in range(1000)]
+    )
+    conn.commit()
+    conn.close()
+
+
+def lookup_fresh(db_path, username):
+    """Patrón anterior: una conexión por consulta."""
+    conn = sqlite3.connect(db_path)
+    cursor = conn.cursor()
+    cursor.execute("SELECT id FROM users WHERE username = ?", (username,))
+    result = cursor.fetchone()
+    conn.close()
+    return result
+
+
+def lookup_shared(db_path, username):
+    """Patrón actual: conexión del hilo reutilizada."""
+    conn = get_connection(db_path)
+    return conn.execute("SELECT id FROM users WHERE username = ?", (username,)).fetchone()
+
+
+def run(fn, db_path, calls):
+    start = time.perf_counter()
+    for i in range(calls):
+        fn(db_path, f"user{i % 1000}")
+    return (time.perf_counter() - start) / calls * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--calls", type=int, default=20000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "bench.db")
+        prepare_db(db_path)
+
+        fresh = run(lookup_fresh, db_path, args.calls)
+        shared = run(lookup_shared, db_path, args.calls)
+        close_all_connections()
+
+    print(f"Conexión nueva por llamada: {fresh:8.1f} µs/llamada")
+    print(f"Conexión compartida:        {shared:8.1f} µs/llamada")
+    print(f"Aceleración:                {fresh / shared:8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
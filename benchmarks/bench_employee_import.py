@@ -0,0 +1,70 @@
+"""Benchmark: importación masiva de empleados frente a register_user uno por uno.
+
+Genera un CSV con N empleados (algunos repetidos o inválidos), lo importa con
+employee_import.import_employees sin límite de usuarios y compara con llamar
+register_user por cada fila sobre una muestra.
+
+Uso: python benchmarks/bench_employee_import.py [--employees 10000] [--sample 500]
+"""
+import argparse
+import csv
+import os
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import config
+
+
+def write_csv(path, count, prefix):
+    with open(path, "w", newline="", encoding="utf-8") as file:
+        writer = csv.writer(file)
+        writer.writerow(["username", "password", "department"])
+        for i in range(count):
+            if i % 500 == 499:
+                writer.writerow([f"{prefix}{i - 1}", "secreto1", "Ventas"])   # repetido
+            elif i % 1000 == 998:
+                writer.writerow([f"{prefix}{i}", "123", "Ventas"])            # contraseña corta
+            else:
+                writer.writerow([f"{prefix}{i}", f"secreto{i}", ("Ventas", "TI", "RRHH")[i % 3]])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--employees", type=int, default=10000)
+    parser.add_argument("--sample", type=int, default=500, help="filas registradas una por una")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        config.DB_PATH = os.path.join(tmp, "data", "bench.db")
+        import database_setup
+        database_setup.DB_PATH = config.DB_PATH
+        database_setup.create_tables()
+
+        import auth
+        from employee_import import import_employees
+
+        path = os.path.join(tmp, "empleados.csv")
+        write_csv(path, args.employees, "bulk")
+        start = time.perf_counter()
+        report = import_employees(path, user_limit=None)
+        elapsed = time.perf_counter() - start
+        print(f"import_employees: {report.imported} importados, {len(report.errors)} errores "
+              f"en {elapsed:.2f} s ({args.employees / elapsed:,.0f} filas/s)")
+
+        # register_user aplica USER_LIMIT; se levanta para medir solo el costo por fila
+        auth.USER_LIMIT = float("inf")
+        start = time.perf_counter()
+        for i in range(args.sample):
+            auth.register_user(f"single{i}", f"secreto{i}", "Ventas")
+        per_row = (time.perf_counter() - start) / args.sample
+        print(f"register_user:    {per_row * 1000:.3f} ms por fila "
+              f"(≈ {per_row * args.employees:.2f} s para {args.employees} filas)")
+
+        database_setup.interaction_writer.close()
+
+
+if __name__ == "__main__":
+    main()
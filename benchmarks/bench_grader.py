@@ -0,0 +1,63 @@
+"""Benchmark: costo de la calificación local por rúbrica.
+
+Califica un conjunto de respuestas típicas y reporta el tiempo medio por
+respuesta y qué fracción se resolvería sin llamar al modelo. Verifica que las
+respuestas con negaciones distintas de «no» nunca se califiquen localmente
+como incorrectas.
+
+Uso: python benchmarks/bench_grader.py [--iterations 5000]
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from config import GRADER_CONFIDENCE_THRESHOLD
+from utils.grader import grade_answer
+
+ANSWERS = [
+    "No hago clic y lo reporto a TI",
+    "Hago clic en el enlace para ver qué pasa",
+    "Verifico el remitente y elimino el correo",
+    "Transfiero el dinero, es urgente",
+    "Llamo al banco al número de la tarjeta",
+    "Ingreso mis datos para confirmar",
+    "No sé qué haría",
+    "Reviso el correo con calma",
+]
+
+# Reacciones seguras expresadas con otras negaciones
+NEGATED_SAFE = [
+    "Nunca hago clic en esos enlaces",
+    "Jamás abro el adjunto",
+    "Tampoco doy clic",
+    "Ni abro el enlace ni respondo",
+    "Nunca ingreso mis datos",
+]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=5000)
+    args = parser.parse_args()
+
+    scenario = {"rubric": None}
+    for answer in ANSWERS + NEGATED_SAFE:
+        grade = grade_answer(scenario, answer)
+        local = "local" if grade.confidence >= GRADER_CONFIDENCE_THRESHOLD else "modelo"
+        print(f"{answer:<45} correcta={grade.correct!s:<5} confianza={grade.confidence:.2f} -> {local}")
+        if answer in NEGATED_SAFE:
+            assert grade.correct or grade.confidence < GRADER_CONFIDENCE_THRESHOLD, answer
+
+    start = time.perf_counter()
+    for i in range(args.iterations):
+        grade_answer(scenario, ANSWERS[i % len(ANSWERS)])
+    per_answer = (time.perf_counter() - start) / args.iterations
+    print(f"\nTiempo medio por respuesta: {per_answer * 1e6:.1f} µs")
+    print("Verificaciones: OK")
+
+
+if __name__ == "__main__":
+    main()
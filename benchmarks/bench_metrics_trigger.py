@@ -0,0 +1,77 @@
+"""Benchmark: costo de inserción en user_interactions con el trigger de métricas.
+
+Inserta N interacciones para un único usuario y reporta el tiempo por bloque,
+que debe mantenerse constante aunque crezca el historial. Con --legacy se
+instala el trigger anterior (recálculo completo) para comparar.
+
+Uso: python benchmarks/bench_metrics_trigger.py [--rows 100000] [--legacy]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import config
+from benchmarks.legacy_schema import LEGACY_TRIGGER
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=100000)
+    parser.add_argument("--block", type=int, default=10000)
+    parser.add_argument("--legacy", action="store_true", help="usar el trigger de recálculo completo")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        config.DB_PATH = os.path.join(tmp, "data", "bench.db")
+
+        import database_setup
+        from utils.db import get_connection, close_all_connections
+
+        database_setup.DB_PATH = config.DB_PATH
+        database_setup.create_tables()
+        conn = get_connection()
+        with conn:
+            conn.execute(
+                "INSERT INTO users (username, password_hash) VALUES ('bench', 'x')"
+            )
+            conn.executemany(
+                "INSERT INTO phishing_scenarios (scenario_text, difficulty_level) VALUES (?, 'Fácil')",
+                [(f"Escenario {i}",) for i in range(50)]
+            )
+            if args.legacy:
+                conn.execute("DROP TRIGGER trg_user_metrics_incremental")
+                conn.execute(LEGACY_TRIGGER)
+        user_id = conn.execute("SELECT id FROM users WHERE username = 'bench'").fetchone()[0]
+
+        total_start = time.perf_counter()
+        for block_start in range(0, args.rows, args.block):
+            block_rows = min(args.block, args.rows - block_start)
+            start = time.perf_counter()
+            with conn:
+                for i in range(block_start, block_start + block_rows):
+                    feedback = "¡Correcto! Bien hecho." if i % 3 == 0 else "Revisa el remitente."
+                    conn.execute(
+                        "INSERT INTO user_interactions (user_id, scenario_id, user_response, chatbot_feedback) "
+                        "VALUES (?, ?, ?, ?)",
+                        (user_id, i % 50 + 1, "no hago clic", feedback)
+                    )
+            elapsed = time.perf_counter() - start
+            print(f"filas {block_start + block_rows:>8}: {elapsed / block_rows * 1e6:8.1f} µs/inserción")
+
+        total = time.perf_counter() - total_start
+        metrics = conn.execute(
+            "SELECT scenarios_completed, total_attempts, correct_percentage FROM user_metrics WHERE user_id = ?",
+            (user_id,)
+        ).fetchone()
+        close_all_connections()
+
+    print(f"Total: {args.rows} inserciones en {total:.2f} s ({args.rows / total:,.0f} inserciones/s)")
+    print(f"Métricas finales: completados={metrics[0]} intentos={metrics[1]} aciertos={metrics[2]}%")
+
+
+if __name__ == "__main__":
+    main()
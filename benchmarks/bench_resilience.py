@@ -0,0 +1,90 @@
+"""Benchmark: latencia de cola del chatbot durante fallas del proveedor.
+
+Levanta utils/mock_openai_server.py e inyecta fallas por fases: proveedor sano,
+errores 503 intermitentes con Retry-After, caída total y respuestas más lentas
+que el plazo. Para cada fase reporta p50/p99, cuántas respuestas fueron la
+retroalimentación local y el estado del disyuntor.
+
+Uso: python benchmarks/bench_resilience.py [--requests 40] [--deadline 2]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from utils.mock_openai_server import MockOpenAIServer
+
+# (nombre, error_rate, error_status, retry_after, latencia en ms)
+PHASES = [
+    ("sano", 0.0, 500, None, 50),
+    ("503 intermitente", 0.3, 503, 0.1, 50),
+    ("caída total", 1.0, 500, None, 50),
+    ("lento", 0.0, 500, None, 5000),
+]
+
+
+def percentile(sorted_values, pct):
+    index = max(0, min(len(sorted_values) - 1, round(pct / 100 * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=40)
+    parser.add_argument("--deadline", type=float, default=2.0, help="plazo por respuesta en segundos")
+    args = parser.parse_args()
+
+    with MockOpenAIServer() as server, tempfile.TemporaryDirectory() as tmp:
+        # La configuración se lee al importar, así que se fija antes de cargar el proyecto
+        os.environ["OPENAI_BASE_URL"] = server.base_url
+        os.environ.setdefault("OPENAI_API_KEY", "bench")
+        os.environ["RESPONSE_CACHE_ENABLED"] = "0"
+        import config
+        config.DB_PATH = os.path.join(tmp, "data", "bench.db")
+        import database_setup
+        database_setup.DB_PATH = config.DB_PATH
+        database_setup.create_tables()
+        database_setup.insert_sample_scenarios()
+
+        import chatbot
+        from utils.resilience import CircuitBreaker, UpstreamUnavailable
+
+        scenario = database_setup.get_random_phishing_scenario()
+        chatbot.api_guard.deadline_seconds = args.deadline
+
+        for name, error_rate, error_status, retry_after, latency_ms in PHASES:
+            server.error_rate = error_rate
+            server.error_status = error_status
+            server.retry_after = retry_after
+            server.latency_ms = latency_ms
+            breaker = chatbot.api_guard.breaker = CircuitBreaker(
+                config.CIRCUIT_FAILURE_THRESHOLD, config.CIRCUIT_RESET_SECONDS
+            )
+
+            latencies = []
+            fallbacks = 0
+            for i in range(args.requests):
+                history = chatbot.build_conversation(scenario, f"no hago clic {i}")
+                start = time.perf_counter()
+                try:
+                    chatbot.fetch_completion(scenario, f"no hago clic {i}", history)
+                except UpstreamUnavailable:
+                    fallbacks += 1
+                latencies.append(time.perf_counter() - start)
+
+            latencies.sort()
+            print(f"{name:<18} p50={percentile(latencies, 50) * 1000:8.1f} ms  "
+                  f"p99={percentile(latencies, 99) * 1000:8.1f} ms  "
+                  f"locales={fallbacks:>3}/{args.requests}  disyuntor={breaker.state} "
+                  f"(aperturas={breaker.trips}, rechazadas={breaker.rejected})")
+
+        import llm_metrics
+        llm_metrics.llm_call_writer.close()
+        database_setup.interaction_writer.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""Benchmark: selección aleatoria con ORDER BY RANDOM() vs. el catálogo en memoria.
+
+Uso: python benchmarks/bench_scenario_catalog.py [--scenarios 100000] [--picks 1000]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import config
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--scenarios", type=int, default=100000)
+    parser.add_argument("--picks", type=int, default=1000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        config.DB_PATH = os.path.join(tmp, "data", "bench.db")
+
+        import database_setup
+        from utils.db import get_connection, close_all_connections
+
+        database_setup.DB_PATH = config.DB_PATH
+        database_setup.create_tables()
+        conn = get_connection()
+        levels = ("Fácil", "Intermedio", "Difícil")
+        with conn:
+            conn.executemany(
+                "INSERT INTO phishing_scenarios (scenario_text, difficulty_level, image_path) VALUES (?, ?, ?)",
+                [(f"Escenario de prueba número {i} " + "x" * 120, levels[i % 3], f"img/{i}.png")
+                 for i in range(args.scenarios)]
+            )
+
+        start = time.perf_counter()
+        for _ in range(args.picks):
+            conn.execute(
+                "SELECT id, scenario_text, difficulty_level, image_path FROM phishing_scenarios "
+                "ORDER BY RANDOM() LIMIT 1"
+            ).fetchone()
+        order_by_random = (time.perf_counter() - start) / args.picks * 1e6
+
+        catalog = database_setup.scenario_catalog
+        start = time.perf_counter()
+        catalog.refresh()
+        load = time.perf_counter() - start
+
+        start = time.perf_counter()
+        for _ in range(args.picks):
+            database_setup.get_random_phishing_scenario()
+        catalog_pick = (time.perf_counter() - start) / args.picks * 1e6
+
+        start = time.perf_counter()
+        for _ in range(args.picks):
+            database_setup.get_random_phishing_scenario("Difícil")
+        filtered_pick = (time.perf_counter() - start) / args.picks * 1e6
+
+        deck = database_setup.create_scenario_deck()
+        start = time.perf_counter()
+        seen = {deck.draw().id for _ in range(args.picks)}
+        deck_pick = (time.perf_counter() - start) / args.picks * 1e6
+        assert len(seen) == args.picks, "el deck repitió escenarios"
+
+        close_all_connections()
+
+    print(f"Escenarios: {args.scenarios}")
+    print(f"ORDER BY RANDOM() LIMIT 1:  {order_by_random:10.1f} µs/selección")
+    print(f"Carga inicial del catálogo: {load * 1000:10.1f} ms")
+    print(f"Catálogo (aleatorio):       {catalog_pick:10.1f} µs/selección")
+    print(f"Catálogo (por dificultad):  {filtered_pick:10.1f} µs/selección")
+    print(f"Deck sin repeticiones:      {deck_pick:10.1f} µs/selección")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+"""Benchmark: ingesta de un paquete grande de escenarios y su repetición idempotente.
+
+Genera un paquete JSONL con N escenarios (una parte con imagen y rúbrica), lo
+carga dos veces con utils.scenario_ingest y reporta el tiempo de cada carga,
+las filas resultantes y la versión del catálogo.
+
+Uso: python benchmarks/bench_scenario_ingest.py [--scenarios 50000]
+"""
+import argparse
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import config
+
+DIFFICULTIES = ("Fácil", "Intermedio", "Difícil")
+
+
+def write_pack(pack_dir, count):
+    os.makedirs(pack_dir)
+    shutil.copy(os.path.join(config.BASE_DIR, "ui", "assets", "scenario_images", "escenario1.png"),
+                os.path.join(pack_dir, "correo.png"))
+    with open(os.path.join(pack_dir, "escenarios.jsonl"), "w", encoding="utf-8") as file:
+        for i in range(count):
+            record = {"text": f"Escenario {i}: recibes un correo urgente que pide revisar la factura {i}.",
+                      "difficulty": DIFFICULTIES[i % 3]}
+            if i % 10 == 0:
+                record["image"] = "correo.png"
+            if i % 5 == 0:
+                record["rubric"] = {"safe_keywords": ["factura"], "tip": "Verifica al proveedor por otro medio."}
+            file.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scenarios", type=int, default=50000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        config.DB_PATH = os.path.join(tmp, "data", "bench.db")
+        import database_setup
+        database_setup.DB_PATH = config.DB_PATH
+        database_setup.create_tables()
+
+        from utils.db import get_connection
+        from utils.scenario_ingest import ingest_scenarios
+
+        pack_dir = os.path.join(tmp, "paquete")
+        write_pack(pack_dir, args.scenarios)
+        conn = get_connection()
+        for label in ("primera carga", "repetición"):
+            start = time.perf_counter()
+            report = ingest_scenarios(pack_dir)
+            elapsed = time.perf_counter() - start
+            rows = conn.execute("SELECT COUNT(*) FROM phishing_scenarios").fetchone()[0]
+            version = conn.execute("SELECT version FROM scenario_catalog_meta").fetchone()[0]
+            print(f"{label:<14} {elapsed:6.2f} s  nuevos={report.inserted} actualizados={report.updated} "
+                  f"sin cambios={report.unchanged} errores={len(report.errors)}  filas={rows} versión={version}")
+
+        database_setup.interaction_writer.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""Benchmark y verificación: migración de una base antigua y arranque con la base al día.
+
+Crea una base con el esquema original de la aplicación (sin departamento, sin
+rúbricas ni calificación estructurada y con el trigger que recalculaba todo el
+historial), la llena con N interacciones y la migra con create_tables.
+Comprueba que quede en SCHEMA_VERSION con columnas, índices, métricas y el
+índice de texto completo correctos, y mide el costo de create_tables en cada
+arranque posterior. Las pruebas de las migraciones están en tests/test_migrations.py.
+
+Uso: python benchmarks/bench_schema_migrations.py [--interactions 20000] [--startups 2000]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import config
+from benchmarks.legacy_schema import build_legacy_db
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--interactions", type=int, default=20000)
+    parser.add_argument("--startups", type=int, default=2000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        config.DB_PATH = os.path.join(tmp, "data", "legacy.db")
+        build_legacy_db(config.DB_PATH, args.interactions)
+
+        import database_setup
+        from utils.db import get_connection
+        from utils.migrations import column_names, get_schema_version
+        database_setup.DB_PATH = config.DB_PATH
+
+        start = time.perf_counter()
+        database_setup.create_tables()
+        migrate_s = time.perf_counter() - start
+
+        conn = get_connection()
+        assert get_schema_version(conn) == database_setup.SCHEMA_VERSION
+        assert {"department"} <= column_names(conn, "users")
+        assert {"rubric", "content_hash"} <= column_names(conn, "phishing_scenarios")
+        assert {"is_correct", "grader"} <= column_names(conn, "user_interactions")
+        assert conn.execute("SELECT COUNT(*) FROM users WHERE department = 'General'").fetchone()[0] == 50
+        objects = {name for (name,) in conn.execute("SELECT name FROM sqlite_master")}
+        assert "trg_update_user_metrics" not in objects
+        assert {"trg_user_metrics_incremental", "idx_users_department", "idx_user_interactions_scenario",
+                "idx_phishing_scenarios_hash", "user_interactions_fts", "chat_sessions"} <= objects
+        total, correct = conn.execute(
+            "SELECT SUM(total_attempts), SUM(correct_attempts) FROM user_metrics").fetchone()
+        assert total == args.interactions and correct == sum(1 for i in range(args.interactions) if i % 3), (total, correct)
+        assert conn.execute(
+            "SELECT COUNT(*) FROM user_interactions_fts WHERE user_interactions_fts MATCH 'respuesta'"
+        ).fetchone()[0] == args.interactions
+        assert conn.execute("SELECT COUNT(*) FROM phishing_scenarios WHERE content_hash IS NULL").fetchone()[0] == 0
+        assert conn.execute(
+            "SELECT SUM(attempts), MAX(active_users) FROM department_daily_stats WHERE difficulty = 'Todas'"
+        ).fetchone() == (args.interactions, 50)
+
+        # Las escrituras de la aplicación funcionan sobre la base migrada
+        database_setup.save_user_interaction(1, 1, "no hago clic", "¡Correcto!", is_correct=1, grader="rubric")
+        database_setup.flush_interactions()
+        assert conn.execute("SELECT total_attempts FROM user_metrics WHERE user_id = 1").fetchone()[0] \
+            == args.interactions // 50 + 1
+
+        start = time.perf_counter()
+        for _ in range(args.startups):
+            database_setup.create_tables()
+        startup_us = (time.perf_counter() - start) / args.startups * 1e6
+
+        print(f"Migración de base antigua ({args.interactions} interacciones): {migrate_s * 1000:.1f} ms "
+              f"-> versión {database_setup.SCHEMA_VERSION}")
+        print(f"create_tables con la base al día: {startup_us:.1f} µs por arranque")
+        print("Verificaciones: OK")
+
+        database_setup.interaction_writer.close()
+
+
+if __name__ == "__main__":
+    main()
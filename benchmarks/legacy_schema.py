@@ -0,0 +1,93 @@
+"""Esquema original de la aplicación, para probar y medir las migraciones.
+
+Es el esquema de la primera versión de database_setup.create_tables: sin
+departamento, sin rúbricas ni calificación estructurada y con el trigger que
+recalculaba todo el historial del usuario en cada inserción. Lo usan
+benchmarks/bench_schema_migrations.py, benchmarks/bench_metrics_trigger.py y
+tests/test_migrations.py.
+"""
+import os
+import sqlite3
+
+LEGACY_SCHEMA = '''
+    CREATE TABLE users (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        username TEXT UNIQUE NOT NULL,
+        password_hash TEXT NOT NULL,
+        role TEXT CHECK(role IN ('admin', 'user')) NOT NULL DEFAULT 'user'
+    );
+    CREATE TABLE phishing_scenarios (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        scenario_text TEXT NOT NULL,
+        difficulty_level TEXT CHECK(difficulty_level IN ('Fácil', 'Intermedio', 'Difícil')) NOT NULL,
+        image_path TEXT
+    );
+    CREATE TABLE user_interactions (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        user_id INTEGER NOT NULL,
+        scenario_id INTEGER NOT NULL,
+        user_response TEXT NOT NULL,
+        chatbot_feedback TEXT NOT NULL,
+        timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
+        FOREIGN KEY(user_id) REFERENCES users(id),
+        FOREIGN KEY(scenario_id) REFERENCES phishing_scenarios(id)
+    );
+    CREATE TABLE user_metrics (
+        user_id INTEGER PRIMARY KEY,
+        scenarios_completed INTEGER DEFAULT 0,
+        total_attempts INTEGER DEFAULT 0,
+        correct_percentage REAL DEFAULT 0.0,
+        error_percentage REAL DEFAULT 0.0,
+        FOREIGN KEY(user_id) REFERENCES users(id)
+    );
+    CREATE INDEX idx_user_interactions_user ON user_interactions(user_id);
+    CREATE INDEX idx_phishing_scenarios_difficulty ON phishing_scenarios(difficulty_level);
+'''
+
+# Trigger original: recalculaba todo el historial del usuario en cada inserción
+LEGACY_TRIGGER = '''
+    CREATE TRIGGER trg_update_user_metrics
+    AFTER INSERT ON user_interactions
+    BEGIN
+        INSERT OR REPLACE INTO user_metrics (
+            user_id, scenarios_completed, total_attempts, correct_percentage, error_percentage
+        )
+        SELECT
+            ui.user_id,
+            COUNT(DISTINCT ui.scenario_id),
+            COUNT(ui.id),
+            ROUND(SUM(CASE WHEN ui.chatbot_feedback LIKE '¡Correcto!%' THEN 1 ELSE 0 END) * 100.0 / COUNT(ui.id), 2),
+            ROUND(SUM(CASE WHEN ui.chatbot_feedback NOT LIKE '¡Correcto!%' THEN 1 ELSE 0 END) * 100.0 / COUNT(ui.id), 2)
+        FROM user_interactions ui
+        WHERE ui.user_id = NEW.user_id
+        GROUP BY ui.user_id;
+    END;
+'''
+
+LEGACY_SCENARIOS = 30
+
+
+def legacy_feedback(i) -> str:
+    """Retroalimentación de la interacción i: dos de cada tres son aciertos."""
+    return "¡Correcto! Bien hecho." if i % 3 else "Incorrecto."
+
+
+def build_legacy_db(path, interactions, users=50):
+    """Crea en `path` una base con el esquema original y `interactions` interacciones."""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    conn = sqlite3.connect(path)
+    conn.executescript(LEGACY_SCHEMA)
+    conn.executemany("INSERT INTO users (username, password_hash) VALUES (?, 'x')",
+                     [(f"legacy{i}",) for i in range(users)])
+    conn.executemany("INSERT INTO phishing_scenarios (scenario_text, difficulty_level) VALUES (?, ?)",
+                     [(f"Escenario antiguo {i}", ("Fácil", "Intermedio", "Difícil")[i % 3])
+                      for i in range(LEGACY_SCENARIOS)])
+    # El trigger se crea después de la carga: con él, llenar la base sería cuadrático
+    conn.executemany(
+        "INSERT INTO user_interactions (user_id, scenario_id, user_response, chatbot_feedback) VALUES (?, ?, ?, ?)",
+        [(i % users + 1, i % LEGACY_SCENARIOS + 1, f"respuesta {i}", legacy_feedback(i))
+         for i in range(interactions)],
+    )
+    conn.executescript(LEGACY_TRIGGER)
+    conn.commit()
+    conn.close()
@@ -0,0 +1,236 @@
+"""Suite de benchmarks de extremo a extremo contra el servidor simulado de OpenAI.
+
+Mide get_chatbot_response (normal y en streaming), save_user_interaction, el trigger de métricas,
+get_user_stats y las consultas de autenticación sobre una base de datos temporal. Reporta p50/p95/p99 y
+solicitudes por segundo, escribe JSON y compara contra una línea base.
+
+Uso:
+    python benchmarks/run_suite.py --output resultados.json
+    python benchmarks/run_suite.py --save-baseline benchmarks/baseline.json
+    python benchmarks/run_suite.py --baseline benchmarks/baseline.json [--tolerance 0.2]
+"""
+import argparse
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from utils.mock_openai_server import MockOpenAIServer
+
+
+def percentile(sorted_values, pct):
+    """Percentil por rango más cercano sobre una lista ya ordenada."""
+    if not sorted_values:
+        return 0.0
+    index = max(0, min(len(sorted_values) - 1, round(pct / 100 * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+def summarize(latencies, wall_seconds):
+    values = sorted(latencies)
+    return {
+        "count": len(values),
+        "p50_ms": round(percentile(values, 50) * 1000, 3),
+        "p95_ms": round(percentile(values, 95) * 1000, 3),
+        "p99_ms": round(percentile(values, 99) * 1000, 3),
+        "rps": round(len(values) / wall_seconds, 1) if wall_seconds else 0.0,
+    }
+
+
+def measure(fn, args_list, concurrency=1):
+    """Ejecuta fn(*args) para cada elemento y devuelve (latencias, segundos totales)."""
+    def timed(args):
+        start = time.perf_counter()
+        fn(*args)
+        return time.perf_counter() - start
+
+    start = time.perf_counter()
+    if concurrency > 1:
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            latencies = list(pool.map(timed, args_list))
+    else:
+        latencies = [timed(args) for args in args_list]
+    return latencies, time.perf_counter() - start
+
+
+def run_suite(args):
+    import chatbot
+    import database_setup
+    from utils.db import get_connection
+
+    database_setup.create_tables()
+    database_setup.insert_sample_scenarios()
+    conn = get_connection()
+    with conn:
+        conn.executemany(
+            "INSERT INTO users (username, password_hash, department) VALUES (?, 'x', 'Bench')",
+            [(f"bench{i}",) for i in range(args.users)]
+        )
+    user_ids = [row[0] for row in conn.execute("SELECT id FROM users WHERE department = 'Bench'")]
+    scenario = database_setup.get_random_phishing_scenario()
+    results = {}
+
+    # get_chatbot_response de extremo a extremo (API simulada + escritura)
+    def chat(i):
+        user_id = user_ids[i % len(user_ids)]
+        chatbot.start_scenario(user_id, scenario)
+        response = chatbot.get_chatbot_response(user_id, scenario, f"no hago clic {i}")
+        if response.startswith("Error inesperado"):
+            raise RuntimeError(response)
+
+    latencies, wall = measure(chat, [(i,) for i in range(args.requests)], args.concurrency)
+    results["get_chatbot_response"] = summarize(latencies, wall)
+
+    # Modo streaming: tiempo hasta el primer fragmento
+    first_token = []
+
+    def chat_stream(i):
+        user_id = user_ids[i % len(user_ids)]
+        chatbot.start_scenario(user_id, scenario)
+        start = time.perf_counter()
+        seen = []
+
+        def on_delta(delta):
+            if not seen:
+                seen.append(True)
+                first_token.append(time.perf_counter() - start)
+
+        chatbot.get_chatbot_response(user_id, scenario, f"reporto el correo {i}", on_delta=on_delta)
+
+    latencies, wall = measure(chat_stream, [(i,) for i in range(args.requests)], args.concurrency)
+    results["get_chatbot_response_stream"] = summarize(latencies, wall)
+    results["time_to_first_token"] = summarize(first_token, wall)
+    database_setup.flush_interactions()
+
+    # save_user_interaction: costo de encolar y, aparte, el throughput con el flush final
+    def save(i):
+        database_setup.save_user_interaction(user_ids[i % len(user_ids)], scenario["id"], "respuesta", "feedback")
+
+    start = time.perf_counter()
+    latencies, _ = measure(save, [(i,) for i in range(args.writes)])
+    database_setup.flush_interactions()
+    results["save_user_interaction"] = summarize(latencies, time.perf_counter() - start)
+
+    # Trigger de métricas: inserción confirmada fila por fila
+    def insert(i):
+        with conn:
+            conn.execute(
+                "INSERT INTO user_interactions (user_id, scenario_id, user_response, chatbot_feedback) "
+                "VALUES (?, ?, ?, ?)",
+                (user_ids[0], scenario["id"], "respuesta", "¡Correcto! bien" if i % 2 else "mal")
+            )
+
+    latencies, wall = measure(insert, [(i,) for i in range(args.writes)])
+    results["metrics_trigger_insert"] = summarize(latencies, wall)
+
+    latencies, wall = measure(database_setup.get_user_stats, [(user_ids[i % len(user_ids)],) for i in range(args.reads)])
+    results["get_user_stats"] = summarize(latencies, wall)
+
+    # Consultas de autenticación de una sesión (login + get_user_id), servidas por la caché de usuarios
+    import auth
+
+    def auth_lookup(i):
+        username = f"bench{i % len(user_ids)}"
+        auth.login_user(username, "x")
+        auth.get_user_id(username)
+
+    latencies, wall = measure(auth_lookup, [(i,) for i in range(args.reads)])
+    results["auth_lookup"] = summarize(latencies, wall)
+    print(f"Caché de usuarios: {auth.user_cache.stats()}")
+
+    return results
+
+
+def compare(results, baseline, tolerance):
+    """Imprime la comparación y devuelve la lista de regresiones."""
+    regressions = []
+    for name, current in results.items():
+        previous = baseline.get("results", {}).get(name)
+        if not previous:
+            continue
+        for metric in ("p50_ms", "p95_ms", "p99_ms"):
+            before, after = previous[metric], current[metric]
+            ratio = after / before if before else 1.0
+            flag = ""
+            if ratio > 1 + tolerance:
+                flag = "  <-- REGRESIÓN"
+                regressions.append(f"{name}.{metric}")
+            print(f"  {name:<28} {metric:<7} {before:>10.3f} -> {after:>10.3f} ms ({ratio:5.2f}x){flag}")
+        before, after = previous["rps"], current["rps"]
+        if before and after < before * (1 - tolerance):
+            regressions.append(f"{name}.rps")
+            print(f"  {name:<28} rps     {before:>10.1f} -> {after:>10.1f}  <-- REGRESIÓN")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=200, help="llamadas a get_chatbot_response")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--writes", type=int, default=2000)
+    parser.add_argument("--reads", type=int, default=2000)
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--latency-ms", type=float, default=50)
+    parser.add_argument("--jitter-ms", type=float, default=10)
+    parser.add_argument("--chunk-delay-ms", type=float, default=5)
+    parser.add_argument("--with-cache", action="store_true", help="no desactivar la caché de respuestas")
+    parser.add_argument("--with-grader", action="store_true",
+                        help="no desactivar la calificación local (las respuestas evidentes no llaman a la API)")
+    parser.add_argument("--output", help="archivo JSON de resultados")
+    parser.add_argument("--baseline", help="JSON de línea base contra el cual comparar")
+    parser.add_argument("--save-baseline", help="guardar los resultados como nueva línea base")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="empeoramiento tolerado (0.2 = 20%%)")
+    args = parser.parse_args()
+
+    with MockOpenAIServer(latency_ms=args.latency_ms, jitter_ms=args.jitter_ms,
+                          chunk_delay_ms=args.chunk_delay_ms) as server, \
+            tempfile.TemporaryDirectory() as tmp:
+        # La configuración se lee al importar, así que se fija antes de cargar el proyecto
+        os.environ["OPENAI_BASE_URL"] = server.base_url
+        os.environ.setdefault("OPENAI_API_KEY", "bench")
+        if not args.with_cache:
+            os.environ["RESPONSE_CACHE_ENABLED"] = "0"
+        if not args.with_grader:
+            os.environ["GRADER_ENABLED"] = "0"
+        import config
+        config.DB_PATH = os.path.join(tmp, "data", "bench.db")
+        import database_setup
+        database_setup.DB_PATH = config.DB_PATH
+
+        results = run_suite(args)
+        database_setup.interaction_writer.close()
+
+    report = {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "params": {k: v for k, v in vars(args).items() if k not in ("output", "baseline", "save_baseline")},
+        "results": results,
+    }
+
+    for name, stats in results.items():
+        print(f"{name:<28} p50={stats['p50_ms']:>9.3f} ms  p95={stats['p95_ms']:>9.3f} ms  "
+              f"p99={stats['p99_ms']:>9.3f} ms  {stats['rps']:>9.1f} ops/s")
+
+    for path in (args.output, args.save_baseline):
+        if path:
+            with open(path, "w", encoding="utf-8") as f:
+                json.dump(report, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+        print(f"\nComparación con {args.baseline} (tolerancia {args.tolerance:.0%}):")
+        regressions = compare(results, baseline, args.tolerance)
+        if regressions:
+            print(f"\nRegresiones: {', '.join(regressions)}")
+            sys.exit(1)
+        print("\nSin regresiones.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""Reporte de arranque: tiempos de importación y tiempo hasta la primera ventana.
+
+1. Ejecuta `python -X importtime -c "import main"` y lista los módulos con mayor
+   tiempo acumulado, además de confirmar que openai/httpx no se cargan al inicio.
+2. Lanza main.py con CHATBOT_STARTUP_PROBE=1 (plataforma Qt offscreen por defecto)
+   y mide el tiempo hasta que se muestra la ventana de onboarding.
+
+Uso: python benchmarks/startup_report.py [--runs 5] [--top 15] [--max-first-window-ms 800] [--output arranque.json]
+"""
+import argparse
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+
+# Módulos que no deben importarse antes de mostrar la primera ventana
+DEFERRED_MODULES = ("openai", "httpx", "pydantic", "ui.main_window", "ui.admin_window", "chatbot")
+
+_IMPORTTIME_LINE = re.compile(r"import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)")
+
+
+def import_times():
+    """Devuelve [(módulo, propio_us, acumulado_us, profundidad)] de `import main`."""
+    env = dict(os.environ, PREWARM_ON_STARTUP="0")
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import main"],
+        cwd=ROOT, env=env, capture_output=True, text=True
+    )
+    rows = []
+    for line in proc.stderr.splitlines():
+        match = _IMPORTTIME_LINE.match(line)
+        if match:
+            self_us, cumulative_us, indent, module = match.groups()
+            rows.append((module, int(self_us), int(cumulative_us), len(indent) // 2))
+    return rows
+
+
+def first_window_ms():
+    """Lanza la aplicación y devuelve (ms medidos dentro del proceso, ms de reloj total)."""
+    env = dict(os.environ, CHATBOT_STARTUP_PROBE="1")
+    env.setdefault("QT_QPA_PLATFORM", "offscreen")
+    start = time.perf_counter()
+    proc = subprocess.run([sys.executable, "main.py"], cwd=ROOT, env=env, capture_output=True, text=True, timeout=60)
+    wall = (time.perf_counter() - start) * 1000
+    match = re.search(r"first_window_ms=([\d.]+)", proc.stdout)
+    if not match:
+        raise RuntimeError(f"main.py no reportó la primera ventana:\n{proc.stdout}\n{proc.stderr}")
+    return float(match.group(1)), wall
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=15)
+    parser.add_argument("--max-first-window-ms", type=float, help="falla si la mediana supera este valor")
+    parser.add_argument("--output", help="archivo JSON con el reporte")
+    args = parser.parse_args()
+
+    rows = import_times()
+    top_level = [r for r in rows if r[3] == 1 or r[0] == "main"]
+    total_us = next((r[2] for r in rows if r[0] == "main"), sum(r[2] for r in top_level))
+    loaded = {r[0] for r in rows}
+    eager = [m for m in DEFERRED_MODULES if m in loaded]
+
+    print(f"Importación de main: {total_us / 1000:.1f} ms")
+    print("Módulos más costosos (acumulado):")
+    for module, self_us, cumulative_us, _ in sorted(rows, key=lambda r: -r[2])[:args.top]:
+        print(f"  {cumulative_us / 1000:9.1f} ms  {module}")
+    print("Módulos diferidos cargados al inicio: " + (", ".join(eager) if eager else "ninguno"))
+
+    samples = [first_window_ms() for _ in range(args.runs)]
+    in_process = statistics.median(s[0] for s in samples)
+    wall = statistics.median(s[1] for s in samples)
+    print(f"Primera ventana (mediana de {args.runs}): {in_process:.1f} ms en proceso, {wall:.1f} ms incluyendo el intérprete")
+
+    report = {
+        "import_main_ms": round(total_us / 1000, 1),
+        "eager_deferred_modules": eager,
+        "first_window_ms": round(in_process, 1),
+        "first_window_wall_ms": round(wall, 1),
+        "top_imports": [
+            {"module": m, "cumulative_ms": round(c / 1000, 2)} for m, _, c, _ in sorted(rows, key=lambda r: -r[2])[:args.top]
+        ],
+    }
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+    failed = bool(eager)
+    if args.max_first_window_ms is not None and in_process > args.max_first_window_ms:
+        print(f"La primera ventana superó {args.max_first_window_ms} ms")
+        failed = True
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
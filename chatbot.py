@@ -1,87 +1,357 @@
 import random
-from openai import OpenAI
-from config import API_KEY, MODEL_NAME, MAX_TOKENS, TEMPERATURE
-from database_setup import get_random_phishing_scenario, save_user_interaction
+import threading
+import time
+from config import (
+    API_KEY, OPENAI_BASE_URL, MODEL_NAME, MAX_TOKENS, TEMPERATURE, RESPONSE_CACHE_ENABLED,
+    RESPONSE_CACHE_MEMORY_ENTRIES, RESPONSE_CACHE_MAX_ROWS, RESPONSE_CACHE_TTL_HOURS,
+    CONVERSATION_MAX_TOKENS, CONVERSATION_SUMMARY_ENABLED, CONVERSATION_SUMMARY_TOKENS,
+    SESSION_MAX_ENTRIES, SESSION_IDLE_TTL_SECONDS, SESSION_PERSIST, LLM_TIMEOUT_SECONDS, LLM_MAX_ATTEMPTS, LLM_BACKOFF_BASE_SECONDS,
+    LLM_BACKOFF_MAX_SECONDS, CIRCUIT_FAILURE_THRESHOLD, CIRCUIT_RESET_SECONDS, GRADER_ENABLED,
+    GRADER_CONFIDENCE_THRESHOLD
+)
+from database_setup import get_random_phishing_scenario, save_user_interaction, create_scenario_deck, session_writer
 from config import DB_PATH
+from utils.response_cache import ResponseCache, make_cache_key
+from utils.conversation_memory import ConversationMemory
+from utils.session_store import SessionStore
+from utils.resilience import (
+    CircuitBreaker, ResilientCaller, RetryPolicy, UpstreamUnavailable, parse_retry_after
+)
+from utils.grader import compile_rubric, grade_answer, parse_outcome
+from llm_metrics import LLMCall
 
-# Instanciar cliente de OpenAI
-client = OpenAI(api_key=API_KEY)
+# Cliente de OpenAI; se crea en el primer uso para no cargar openai/httpx al iniciar la app
+client = None
+_client_lock = threading.Lock()
 
-# Diccionario para rastrear las interacciones por usuario
-user_interaction_count = {}
+def get_client():
+    """Devuelve el cliente de OpenAI, creándolo la primera vez."""
+    global client
+    if client is None:
+        with _client_lock:
+            if client is None:
+                from openai import OpenAI
+                # Los reintentos los maneja api_guard, no el cliente
+                client = OpenAI(api_key=API_KEY, base_url=OPENAI_BASE_URL,
+                                max_retries=0, timeout=LLM_TIMEOUT_SECONDS)
+    return client
 
-def get_new_scenario():
-    """Obtiene un nuevo escenario aleatorio desde la base de datos."""
-    scenario = get_random_phishing_scenario()
+def classify_api_error(error):
+    """Indica si un error de la API merece reintento y cuánto pide esperar el proveedor."""
+    from openai import APIConnectionError, APIStatusError
+    if isinstance(error, (APIConnectionError, TimeoutError)):
+        return True, None
+    if isinstance(error, APIStatusError) and (error.status_code == 429 or error.status_code >= 500):
+        return True, parse_retry_after(error.response.headers.get("retry-after"))
+    return False, None
+
+# Plazo, reintentos y disyuntor compartidos por todas las llamadas al modelo
+api_guard = ResilientCaller(
+    classify_api_error,
+    deadline_seconds=LLM_TIMEOUT_SECONDS,
+    policy=RetryPolicy(LLM_MAX_ATTEMPTS, LLM_BACKOFF_BASE_SECONDS, LLM_BACKOFF_MAX_SECONDS),
+    breaker=CircuitBreaker(CIRCUIT_FAILURE_THRESHOLD, CIRCUIT_RESET_SECONDS),
+)
+
+# Versión del prompt; cambiarla invalida las respuestas guardadas en caché
+PROMPT_VERSION = 2
+
+# Caché de respuestas para entradas equivalentes en el mismo escenario
+response_cache = ResponseCache(
+    max_memory_entries=RESPONSE_CACHE_MEMORY_ENTRIES,
+    max_rows=RESPONSE_CACHE_MAX_ROWS,
+    ttl_seconds=RESPONSE_CACHE_TTL_HOURS * 3600,
+)
+
+# Turnos previos de cada escenario en curso, acotados por presupuesto de tokens
+conversation_memory = ConversationMemory(
+    max_tokens=CONVERSATION_MAX_TOKENS,
+    summarize=CONVERSATION_SUMMARY_ENABLED,
+    summary_tokens=CONVERSATION_SUMMARY_TOKENS,
+)
+
+# Estado de cada sesión (usuario, escenario): turnos, historial y marcas de tiempo
+session_store = SessionStore(
+    max_sessions=SESSION_MAX_ENTRIES,
+    idle_ttl_seconds=SESSION_IDLE_TTL_SECONDS,
+    writer=session_writer if SESSION_PERSIST else None,
+)
+
+def get_new_scenario(deck=None, user_id=None):
+    """Obtiene un nuevo escenario aleatorio; con un deck, evita repetirlos en la sesión.
+
+    Con user_id, el escenario empieza una sesión nueva del usuario (ver start_scenario).
+    """
+    scenario = deck.draw() if deck is not None else get_random_phishing_scenario()
     if not scenario:
         return None
+    if user_id is not None:
+        start_scenario(user_id, scenario)
     return scenario
 
-def get_chatbot_response(user_id, scenario, user_input):
-    """Genera la respuesta del chatbot con retroalimentación ajustada y guía al usuario."""
-
-    # Si el usuario no tiene un contador, inicializarlo
-    if user_id not in user_interaction_count:
-        user_interaction_count[user_id] = 0
+def start_scenario(user_id, scenario):
+    """Empieza una presentación del escenario: descarta los turnos y el cierre de la anterior."""
+    session_store.reset(user_id, scenario["id"])
 
-    # Frases de refuerzo positivo
-    positive_feedback_phrases = [
-        "¡Buena decisión!", 
-        "Eso es correcto.", 
-        "Bien pensado.", 
-        "Esa es una excelente estrategia."
-    ]
+# Frases de refuerzo positivo
+POSITIVE_FEEDBACK_PHRASES = [
+    "¡Buena decisión!", 
+    "Eso es correcto.", 
+    "Bien pensado.", 
+    "Esa es una excelente estrategia."
+]
 
-    # Contar el número de interacciones por usuario
-    if user_interaction_count[user_id] >= 3:
-        return "¡Excelente! Has completado este escenario. ¿Quieres otro? (Responde 'sí' para continuar o 'salir' para terminar)"
+def build_conversation(scenario, user_input, user_id=None):
+    """Crea el historial de conversación con el contexto fijo del escenario.
 
-    try:
-        # Crear el historial de conversación con el contexto fijo
-        conversation_history = [
-            {
-                "role": "system",
-                "content": (
-                    "Eres un chatbot especializado en entrenar a usuarios para detectar ataques de phishing. "
-                    "Tu tarea es evaluar la respuesta del usuario en el siguiente escenario. "
-                    "Si el usuario da una respuesta acertada, confirma su decisión con una breve retroalimentación positiva "
-                    "y luego sugiere un paso adicional. No hagas más de 3 preguntas por escenario."
-                    "\n\n📌 **Escenario:** " + scenario["text"]
-                )
-            },
+    Con user_id se incluyen los turnos previos del usuario en este escenario,
+    dentro del presupuesto de tokens de la memoria de conversación.
+    """
+    system_message = (
+        "Eres un chatbot especializado en entrenar a usuarios para detectar ataques de phishing. "
+        "Tu tarea es evaluar la respuesta del usuario en el siguiente escenario. "
+        "Si el usuario da una respuesta acertada, confirma su decisión con una breve retroalimentación positiva "
+        "y luego sugiere un paso adicional. No hagas más de 3 preguntas por escenario. "
+        "Comienza siempre con «¡Correcto!» si la reacción del usuario es segura o con «Incorrecto.» si no lo es."
+        "\n\n📌 **Escenario:** " + scenario["text"]
+    )
+    if user_id is None:
+        return [
+            {"role": "system", "content": system_message},
             {"role": "user", "content": user_input}
         ]
+    with session_store.session(user_id, scenario["id"]) as session:
+        return conversation_memory.build_messages(session, system_message, user_input)
+
+def is_upstream_error(error):
+    """True si el error viene del proveedor y no de quien hizo la llamada (p. ej. una cancelación en on_delta)."""
+    if isinstance(error, UpstreamUnavailable):
+        return True
+    from openai import APIError
+    return isinstance(error, APIError)
+
+def completion_cache_key(scenario, user_input, conversation_history):
+    """Clave de caché de la solicitud; los turnos previos forman parte de la clave."""
+    context = "\x1e".join(message["content"] for message in conversation_history[1:-1])
+    return make_cache_key(scenario["id"], user_input, MODEL_NAME, TEMPERATURE, PROMPT_VERSION, context)
 
-        # Llamar a la API de OpenAI
-        response = client.chat.completions.create(
+def request_completion(conversation_history, on_delta=None, call=None, timeout=None):
+    """Llama a la API de OpenAI. Si se indica on_delta, transmite la respuesta por fragmentos.
+
+    `call` (un llm_metrics.LLMCall) recibe el primer fragmento y el uso de tokens.
+    `timeout` son los segundos disponibles para esta llamada.
+    """
+    if on_delta is None:
+        response = get_client().chat.completions.create(
             model=MODEL_NAME,
             messages=conversation_history,
             max_tokens=MAX_TOKENS,
-            temperature=TEMPERATURE
+            temperature=TEMPERATURE,
+            timeout=timeout
         )
+        if call is not None:
+            call.mark_first_token()
+            call.set_usage(response.usage)
+        return response.choices[0].message.content.strip()
 
-        bot_response = response.choices[0].message.content.strip()
+    stream = get_client().chat.completions.create(
+        model=MODEL_NAME,
+        messages=conversation_history,
+        max_tokens=MAX_TOKENS,
+        temperature=TEMPERATURE,
+        stream=True,
+        stream_options={"include_usage": True},
+        timeout=timeout
+    )
+    # El timeout del cliente vale por lectura; el plazo total se revisa entre fragmentos
+    deadline = time.monotonic() + timeout if timeout else None
+    parts = []
+    for chunk in stream:
+        if deadline is not None and time.monotonic() > deadline:
+            stream.close()
+            raise TimeoutError("La respuesta en streaming superó el plazo.")
+        # El último fragmento trae el uso de tokens y ninguna opción
+        if chunk.usage is not None and call is not None:
+            call.set_usage(chunk.usage)
+        if not chunk.choices:
+            continue
+        delta = chunk.choices[0].delta.content
+        if delta:
+            if call is not None:
+                call.mark_first_token()
+            parts.append(delta)
+            on_delta(delta)
+    return "".join(parts).strip()
 
-        # Determinar si la respuesta del bot es apropiada para el escenario
-        if "?" in bot_response:
-            # Solo dar retroalimentación positiva si la respuesta fue correcta
-            if "bueno" in bot_response.lower() or "correcto" in bot_response.lower():
-                bot_response = f"{random.choice(positive_feedback_phrases)} {bot_response}"
-            else:
-                # Evitar dar retroalimentación positiva innecesaria
-                bot_response = f"{bot_response} ¿Te gustaría que te diera más detalles sobre cómo identificar phishing?"
+def rubric_feedback(scenario, grade, automatic=False):
+    """Retroalimentación local a partir de la calificación por rúbrica."""
+    tip = compile_rubric(scenario.get("rubric")).tip
+    if grade.correct:
+        text = "¡Correcto! Es una reacción segura. " + (
+            tip or "Recuerda verificar siempre el remitente y reportar los mensajes sospechosos al equipo de TI."
+        )
+    else:
+        text = "Incorrecto. Esa reacción es riesgosa: no hagas clic en enlaces ni descargues adjuntos. " + (
+            tip or "Verifica el remitente por otro medio y reporta el mensaje al equipo de TI."
+        )
+    if automatic:
+        text += " (Retroalimentación automática: el asistente no está disponible en este momento.)"
+    return text
+
+def fallback_response(scenario, grade, on_delta=None):
+    """Retroalimentación local cuando el modelo no está disponible. Retorna (texto, resultado).
+
+    Con una calificación poco confiable no se da veredicto: se responde con una
+    guía neutral y el resultado es (None, None), como en resolve_outcome().
+    """
+    if grade.confidence >= GRADER_CONFIDENCE_THRESHOLD:
+        bot_response = rubric_feedback(scenario, grade, automatic=True)
+        outcome = (grade.correct, "rubric")
+    else:
+        tip = compile_rubric(scenario.get("rubric")).tip
+        bot_response = (
+            "No pude evaluar tu respuesta con seguridad. Ante un mensaje sospechoso, no hagas clic en "
+            "enlaces ni abras adjuntos, verifica el remitente por otro medio y reporta el mensaje al equipo de TI. "
+            + (tip + " " if tip else "")
+            + "(Retroalimentación automática: el asistente no está disponible en este momento.)"
+        )
+        outcome = (None, None)
+    if on_delta is not None:
+        on_delta(bot_response)
+    return bot_response, outcome
+
+def fetch_completion(scenario, user_input, conversation_history, on_delta=None, user_id=None):
+    """Obtiene la respuesta del modelo pasando por la caché de respuestas.
+
+    Las llamadas pasan por api_guard (plazo, reintentos y disyuntor); si el proveedor
+    no está disponible se relanza UpstreamUnavailable para que quien llama responda
+    con fallback_response(). Cada llamada queda registrada en llm_calls (latencia,
+    tokens, costo y errores).
+    """
+    call = LLMCall(MODEL_NAME, user_id, scenario["id"], stream=on_delta is not None)
+
+    def compute():
+        return api_guard.call(lambda timeout: request_completion(conversation_history, on_delta, call, timeout))
 
-        # Guardar la interacción
-        save_user_interaction(user_id, scenario["id"], user_input, bot_response)
+    bot_response, cached = None, False
+    try:
+        if not RESPONSE_CACHE_ENABLED:
+            bot_response = compute()
+        else:
+            key = completion_cache_key(scenario, user_input, conversation_history)
+            bot_response, cached = response_cache.get_or_compute(key, compute, share_error=is_upstream_error)
+            # Una respuesta en caché se entrega completa como un único fragmento
+            if cached and on_delta is not None:
+                call.mark_first_token()
+                on_delta(bot_response)
+    except Exception as e:
+        call.record(conversation_history, error=e)
+        raise
+    call.record(conversation_history, bot_response, cache_hit=cached)
+    return bot_response
+
+def postprocess_response(bot_response):
+    """Ajusta la respuesta del modelo con refuerzo positivo o una pregunta de seguimiento."""
+    # Determinar si la respuesta del bot es apropiada para el escenario
+    if "?" in bot_response:
+        # Solo dar retroalimentación positiva si la respuesta fue correcta
+        if "bueno" in bot_response.lower() or "correcto" in bot_response.lower():
+            bot_response = f"{random.choice(POSITIVE_FEEDBACK_PHRASES)} {bot_response}"
+        else:
+            # Evitar dar retroalimentación positiva innecesaria
+            bot_response = f"{bot_response} ¿Te gustaría que te diera más detalles sobre cómo identificar phishing?"
+    return bot_response
+
+def start_turn(user_id, scenario):
+    """Prepara el turno del usuario. Retorna el mensaje de cierre si ya completó el escenario."""
+    with session_store.session(user_id, scenario["id"]) as session:
+        completed = session.completed
+    if completed:
+        return "¡Excelente! Has completado este escenario. ¿Quieres otro? (Responde 'sí' para continuar o 'salir' para terminar)"
+    return None
+
+def resolve_outcome(bot_response, grade):
+    """Resultado estructurado del turno: (acierto, calificador).
+
+    Si la rúbrica no es confiable y el modelo no indicó el resultado, retorna
+    (None, None) y las métricas lo deducen del texto de la respuesta.
+    """
+    if GRADER_ENABLED and grade.confidence >= GRADER_CONFIDENCE_THRESHOLD:
+        return grade.correct, "rubric"
+    outcome = parse_outcome(bot_response)
+    if outcome is None:
+        return None, None
+    return outcome, "llm"
+
+def answer_locally(scenario, grade, on_delta=None):
+    """Retroalimentación de la rúbrica si la calificación es confiable; None para consultar al modelo."""
+    if not GRADER_ENABLED or grade.confidence < GRADER_CONFIDENCE_THRESHOLD:
+        return None
+    bot_response = rubric_feedback(scenario, grade)
+    if on_delta is not None:
+        on_delta(bot_response)
+    return bot_response
+
+def finish_turn(user_id, scenario, user_input, bot_response, grade, outcome=None):
+    """Procesa la respuesta del modelo, guarda la interacción y retorna el texto final.
+
+    outcome es el (acierto, calificador) ya conocido; si falta, se deduce con resolve_outcome().
+    """
+    is_correct, grader = outcome or resolve_outcome(bot_response, grade)
+
+    # El posprocesamiento se aplica una vez completada la respuesta
+    bot_response = postprocess_response(bot_response)
 
-        # Incrementar el contador de interacciones
-        user_interaction_count[user_id] += 1
+    # Guardar la interacción con su resultado
+    save_user_interaction(user_id, scenario["id"], user_input, bot_response,
+                          None if is_correct is None else int(is_correct), grader)
+
+    with session_store.session(user_id, scenario["id"]) as session:
+        # Incrementar el contador de interacciones del escenario
+        session.turn_count += 1
 
         # Si el usuario completó el escenario correctamente
-        if user_interaction_count[user_id] >= 3:
+        if session.turn_count >= 3:
+            session.completed = True
+            conversation_memory.reset(session)
             return "¡Buen trabajo! Has completado este escenario de phishing. ¿Te gustaría intentar otro?"
 
-        return bot_response
+        # Recordar el turno para dar contexto a los siguientes del mismo escenario
+        conversation_memory.record(session, user_input, bot_response)
+    return bot_response
+
+def get_chatbot_response(user_id, scenario, user_input, on_delta=None, check_cancelled=None):
+    """Genera la respuesta del chatbot con retroalimentación ajustada y guía al usuario.
+
+    Si se pasa on_delta, la respuesta se solicita en modo streaming y cada fragmento
+    se entrega a on_delta en cuanto llega. El texto retornado siempre es la respuesta
+    final ya procesada. check_cancelled() se llama justo antes de guardar el turno y
+    puede lanzar una excepción para descartarlo (p. ej. Worker.check_cancelled).
+    """
+    completed_message = start_turn(user_id, scenario)
+    if completed_message:
+        return completed_message
+
+    try:
+        # Las respuestas evidentes se califican localmente, sin llamar al modelo
+        grade = grade_answer(scenario, user_input)
+        bot_response = answer_locally(scenario, grade, on_delta)
+        outcome = None
+
+        if bot_response is None:
+            conversation_history = build_conversation(scenario, user_input, user_id)
+
+            # Llamar a la API de OpenAI (o reutilizar una respuesta equivalente)
+            try:
+                bot_response = fetch_completion(scenario, user_input, conversation_history, on_delta, user_id)
+            except UpstreamUnavailable:
+                # Sin modelo, el resultado registrado es el de la rúbrica (si es confiable)
+                bot_response, outcome = fallback_response(scenario, grade, on_delta)
+
+        # Una cancelación tardía no guarda la interacción ni avanza el turno
+        if check_cancelled is not None:
+            check_cancelled()
+        return finish_turn(user_id, scenario, user_input, bot_response, grade, outcome)
 
     except Exception as e:
         return f"Error inesperado: {str(e)}"
@@ -93,7 +363,8 @@ def main():
     
     user_id = input("Por favor, ingresa tu ID de usuario: ")
     
-    scenario = get_new_scenario()
+    deck = create_scenario_deck()
+    scenario = get_new_scenario(deck, user_id)
     
     if not scenario:
         print("⚠️ No se encontraron escenarios disponibles en la base de datos.")
@@ -109,15 +380,32 @@ def main():
             break
 
         if user_message.lower() == "sí":
-            scenario = get_new_scenario()
+            scenario = get_new_scenario(deck, user_id)
             if scenario:
                 print(f"\n📌 **Nuevo escenario:** {scenario['text']}\n")
             else:
                 print("⚠️ No hay más escenarios disponibles.")
             continue
 
-        bot_response = get_chatbot_response(user_id, scenario, user_message)
-        print(f"\n🤖 **Chatbot:** {bot_response}\n")
+        # Mostrar los fragmentos a medida que llegan
+        streamed = []
+
+        def print_delta(delta):
+            if not streamed:
+                print("\n🤖 **Chatbot:** ", end="", flush=True)
+            streamed.append(delta)
+            print(delta, end="", flush=True)
+
+        bot_response = get_chatbot_response(user_id, scenario, user_message, on_delta=print_delta)
+        streamed_text = "".join(streamed).strip()
+
+        if not streamed:
+            print(f"\n🤖 **Chatbot:** {bot_response}\n")
+        elif bot_response.startswith(streamed_text):
+            # Mostrar solo lo que agregó el posprocesamiento
+            print(f"{bot_response[len(streamed_text):]}\n")
+        else:
+            print(f"\n\n🤖 **Chatbot:** {bot_response}\n")
 
 if __name__ == "__main__":
     main()
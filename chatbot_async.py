@@ -0,0 +1,222 @@
+import asyncio
+import threading
+import time
+
+import httpx
+from openai import AsyncOpenAI
+
+from config import (
+    API_KEY, OPENAI_BASE_URL, MODEL_NAME, MAX_TOKENS, TEMPERATURE, RESPONSE_CACHE_ENABLED, ASYNC_MAX_CONCURRENCY,
+    LLM_TIMEOUT_SECONDS
+)
+from chatbot import (
+    answer_locally, api_guard, build_conversation, completion_cache_key, fallback_response, is_upstream_error,
+    start_turn, finish_turn, response_cache
+)
+from utils.grader import grade_answer
+from utils.resilience import UpstreamUnavailable
+from llm_metrics import LLMCall
+
+
+class AsyncChatbotEngine:
+    """Motor asíncrono del chatbot sobre AsyncOpenAI.
+
+    Comparte un único pool de conexiones HTTP entre todas las solicitudes y
+    limita las llamadas simultáneas a la API con un semáforo. Las solicitudes
+    idénticas concurrentes comparten una sola llamada. Las operaciones que
+    bloquean (SQLite de la caché, de las métricas y de las sesiones, y la cola
+    del escritor de interacciones) se ejecutan con asyncio.to_thread para no
+    detener el bucle de eventos.
+    """
+
+    def __init__(self, api_key=API_KEY, base_url=OPENAI_BASE_URL, max_concurrency=ASYNC_MAX_CONCURRENCY):
+        self.api_key = api_key
+        self.base_url = base_url
+        self.max_concurrency = max_concurrency
+        self._client = None
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._inflight = {}
+
+    @property
+    def client(self) -> AsyncOpenAI:
+        if self._client is None:
+            limits = httpx.Limits(
+                max_connections=self.max_concurrency,
+                max_keepalive_connections=self.max_concurrency,
+            )
+            self._client = AsyncOpenAI(
+                api_key=self.api_key,
+                base_url=self.base_url,
+                http_client=httpx.AsyncClient(limits=limits),
+                max_retries=0,
+                timeout=LLM_TIMEOUT_SECONDS,
+            )
+        return self._client
+
+    async def complete(self, conversation_history, on_delta=None, call=None, timeout=None) -> str:
+        """Llama a la API respetando el límite de concurrencia."""
+        async with self._semaphore:
+            if on_delta is None:
+                response = await self.client.chat.completions.create(
+                    model=MODEL_NAME,
+                    messages=conversation_history,
+                    max_tokens=MAX_TOKENS,
+                    temperature=TEMPERATURE,
+                    timeout=timeout
+                )
+                if call is not None:
+                    call.mark_first_token()
+                    call.set_usage(response.usage)
+                return response.choices[0].message.content.strip()
+
+            stream = await self.client.chat.completions.create(
+                model=MODEL_NAME,
+                messages=conversation_history,
+                max_tokens=MAX_TOKENS,
+                temperature=TEMPERATURE,
+                stream=True,
+                stream_options={"include_usage": True},
+                timeout=timeout
+            )
+            deadline = time.monotonic() + timeout if timeout else None
+            parts = []
+            async for chunk in stream:
+                if deadline is not None and time.monotonic() > deadline:
+                    await stream.close()
+                    raise TimeoutError("La respuesta en streaming superó el plazo.")
+                if chunk.usage is not None and call is not None:
+                    call.set_usage(chunk.usage)
+                if not chunk.choices:
+                    continue
+                delta = chunk.choices[0].delta.content
+                if delta:
+                    if call is not None:
+                        call.mark_first_token()
+                    parts.append(delta)
+                    on_delta(delta)
+            return "".join(parts).strip()
+
+    async def fetch_completion(self, scenario, user_input, conversation_history, on_delta=None, user_id=None) -> str:
+        """Versión asíncrona de chatbot.fetch_completion, con la misma caché, resiliencia y registro."""
+        call = LLMCall(MODEL_NAME, user_id, scenario["id"], stream=on_delta is not None)
+        try:
+            bot_response, cached = await self._fetch(scenario, user_input, conversation_history, on_delta, call)
+        except Exception as e:
+            await asyncio.to_thread(call.record, conversation_history, error=e)
+            raise
+        await asyncio.to_thread(call.record, conversation_history, bot_response, cache_hit=cached)
+        return bot_response
+
+    async def _guarded_complete(self, conversation_history, on_delta, call):
+        return await api_guard.acall(
+            lambda timeout: self.complete(conversation_history, on_delta, call, timeout)
+        )
+
+    async def _fetch(self, scenario, user_input, conversation_history, on_delta, call):
+        if not RESPONSE_CACHE_ENABLED:
+            return await self._guarded_complete(conversation_history, on_delta, call), False
+
+        key = completion_cache_key(scenario, user_input, conversation_history)
+        cached = await asyncio.to_thread(response_cache.get, key)
+        while cached is None:
+            flight = self._inflight.get(key)
+            if flight is None or flight.done():
+                flight = asyncio.ensure_future(self._guarded_complete(conversation_history, on_delta, call))
+                self._inflight[key] = flight
+                try:
+                    bot_response = await flight
+                finally:
+                    if self._inflight.get(key) is flight:
+                        del self._inflight[key]
+                await asyncio.to_thread(response_cache.put, key, bot_response)
+                return bot_response, False
+            try:
+                cached = await asyncio.shield(flight)
+            except (Exception, asyncio.CancelledError) as e:
+                # Solo se comparten los errores del proveedor; si la llamada compartida se
+                # canceló o falló por su on_delta, esta solicitud la repite
+                if not flight.done() or (not flight.cancelled() and is_upstream_error(e)):
+                    raise
+
+        if on_delta is not None:
+            call.mark_first_token()
+            on_delta(cached)
+        return cached, True
+
+    async def respond(self, user_id, scenario, user_input, on_delta=None) -> str:
+        """Equivalente asíncrono de chatbot.get_chatbot_response."""
+        completed_message = await asyncio.to_thread(start_turn, user_id, scenario)
+        if completed_message:
+            return completed_message
+
+        try:
+            grade = grade_answer(scenario, user_input)
+            bot_response = answer_locally(scenario, grade, on_delta)
+            outcome = None
+            if bot_response is None:
+                conversation_history = await asyncio.to_thread(build_conversation, scenario, user_input, user_id)
+                try:
+                    bot_response = await self.fetch_completion(
+                        scenario, user_input, conversation_history, on_delta, user_id
+                    )
+                except UpstreamUnavailable:
+                    bot_response, outcome = fallback_response(scenario, grade, on_delta)
+            return await asyncio.to_thread(
+                finish_turn, user_id, scenario, user_input, bot_response, grade, outcome
+            )
+        except Exception as e:
+            return f"Error inesperado: {str(e)}"
+
+    async def aclose(self):
+        """Cierra el pool de conexiones HTTP."""
+        if self._client is not None:
+            await self._client.close()
+            self._client = None
+
+
+class EngineLoopThread:
+    """Bucle de asyncio en un hilo propio para usar el motor desde código síncrono (p. ej. Qt).
+
+    submit() devuelve un concurrent.futures.Future; respond() bloquea el hilo que
+    la llama (nunca el de la interfaz si se usa desde un Worker).
+    """
+
+    def __init__(self, engine_factory=AsyncChatbotEngine):
+        self._engine_factory = engine_factory
+        self._loop = None
+        self._thread = None
+        self._ready = threading.Event()
+        self._lock = threading.Lock()
+        self.engine = None
+
+    def _run(self):
+        self._loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self._loop)
+        self.engine = self._engine_factory()
+        self._ready.set()
+        self._loop.run_forever()
+
+    def start(self):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="chatbot-engine", daemon=True)
+                self._thread.start()
+        self._ready.wait()
+
+    def submit(self, coro):
+        """Programa una corrutina en el bucle del motor."""
+        self.start()
+        return asyncio.run_coroutine_threadsafe(coro, self._loop)
+
+    def respond(self, user_id, scenario, user_input, on_delta=None) -> str:
+        self.start()
+        return self.submit(self.engine.respond(user_id, scenario, user_input, on_delta)).result()
+
+    def stop(self):
+        """Cierra el motor y detiene el bucle."""
+        if self._thread is None:
+            return
+        self.submit(self.engine.aclose()).result()
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+        self._thread = None
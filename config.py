@@ -1,6 +1,5 @@
 import os
 from dotenv import load_dotenv
-from openai import OpenAI
 
 # Cargar las variables de entorno del archivo .env
 load_dotenv()
@@ -10,9 +9,64 @@ MODEL_NAME = "gpt-4o-mini"
 MAX_TOKENS = 200
 TEMPERATURE = 0.7
 API_KEY = os.getenv("OPENAI_API_KEY")  # Cargar la clave API desde el .env
+# URL base de un servidor compatible con OpenAI (p. ej. utils/mock_openai_server.py); None usa la API oficial
+OPENAI_BASE_URL = os.getenv("OPENAI_BASE_URL") or None
 
 # Ruta raíz del proyecto
 BASE_DIR = os.path.abspath(os.path.dirname(__file__))
 
 # Ruta absoluta al archivo de la base de datos
-DB_PATH = os.path.join(BASE_DIR, "data", "chatbot.db")
\ No newline at end of file
+DB_PATH = os.path.join(BASE_DIR, "data", "chatbot.db")
+
+# Escritura diferida de interacciones (commits agrupados)
+WRITE_BATCH_SIZE = 50           # Filas por commit como máximo
+WRITE_FLUSH_INTERVAL_MS = 200   # Espera máxima antes de confirmar un lote
+WRITE_QUEUE_MAXSIZE = 1000      # Filas en cola antes de aplicar contrapresión
+
+# Caché de respuestas del LLM
+RESPONSE_CACHE_ENABLED = os.getenv("RESPONSE_CACHE_ENABLED", "1") == "1"
+RESPONSE_CACHE_MEMORY_ENTRIES = 512     # Entradas en el LRU en memoria
+RESPONSE_CACHE_MAX_ROWS = 20000         # Entradas en la tabla llm_response_cache
+RESPONSE_CACHE_TTL_HOURS = 168          # Vigencia de cada respuesta guardada
+
+# Motor asíncrono: solicitudes simultáneas máximas hacia la API
+ASYNC_MAX_CONCURRENCY = 16
+
+# Precargar las ventanas de chat/admin y el cliente de OpenAI mientras se muestra el onboarding
+PREWARM_ON_STARTUP = os.getenv("PREWARM_ON_STARTUP", "1") == "1"
+
+# Archivo frío de interacciones antiguas (utils/interaction_archive.py)
+ARCHIVE_AFTER_DAYS = int(os.getenv("ARCHIVE_AFTER_DAYS", "180"))   # Antigüedad a partir de la cual se archivan
+ARCHIVE_CHUNK_ROWS = 5000                                           # Filas por segmento y por transacción
+ARCHIVE_ON_STARTUP = os.getenv("ARCHIVE_ON_STARTUP", "0") == "1"   # Archivar en segundo plano al iniciar
+
+# Caché de registros de usuario para las consultas de autenticación
+USER_CACHE_MAX_ENTRIES = 128
+
+# Memoria de la conversación dentro de un escenario
+CONVERSATION_MAX_TOKENS = 1200          # Presupuesto del prompt (sistema + turnos previos + respuesta nueva)
+CONVERSATION_SUMMARY_ENABLED = os.getenv("CONVERSATION_SUMMARY_ENABLED", "1") == "1"
+CONVERSATION_SUMMARY_TOKENS = 200       # Tamaño máximo del resumen de turnos antiguos
+
+# Sesiones de chat (usuario, escenario): contador de turnos, historial y marcas de tiempo
+SESSION_MAX_ENTRIES = 500               # Sesiones en memoria a la vez; se olvidan las menos usadas
+SESSION_IDLE_TTL_SECONDS = 2 * 3600     # Una sesión inactiva por más tiempo se descarta
+SESSION_PERSIST = os.getenv("SESSION_PERSIST", "0") == "1"  # Guardar las sesiones en SQLite
+
+# Instrumentación de llamadas al modelo: precio en USD por millón de tokens (entrada, salida)
+MODEL_PRICING = {
+    "gpt-4o-mini": (0.15, 0.60),
+    "gpt-4o": (2.50, 10.00),
+}
+
+# Resiliencia de las llamadas al modelo
+LLM_TIMEOUT_SECONDS = 20            # Plazo total por respuesta, reintentos incluidos
+LLM_MAX_ATTEMPTS = 3                # Intentos ante 429, 5xx o errores de red
+LLM_BACKOFF_BASE_SECONDS = 0.5      # Retroceso exponencial con jitter
+LLM_BACKOFF_MAX_SECONDS = 8
+CIRCUIT_FAILURE_THRESHOLD = 5       # Fallos seguidos que abren el circuito
+CIRCUIT_RESET_SECONDS = 30          # Tiempo en abierto antes de probar de nuevo
+
+# Calificación local por rúbrica: por encima de este umbral de confianza no se consulta al modelo
+GRADER_ENABLED = os.getenv("GRADER_ENABLED", "1") == "1"
+GRADER_CONFIDENCE_THRESHOLD = 0.75
@@ -1,7 +1,41 @@
-import sqlite3
 import os
+import atexit
 import hashlib
-from config import DB_PATH
+from config import DB_PATH, WRITE_BATCH_SIZE, WRITE_FLUSH_INTERVAL_MS, WRITE_QUEUE_MAXSIZE
+from utils.db import get_connection
+from utils.migrations import Migration, add_column, get_schema_version, migrate
+from utils.batch_writer import BatchWriter
+from utils.scenario_catalog import ScenarioCatalog, ScenarioDeck
+from utils.scenario_ingest import ingest_scenarios, scenario_content_hash
+from department_stats import ALL_DIFFICULTIES, populate_department_rollups
+
+# Escritor en segundo plano para las interacciones del chatbot
+interaction_writer = BatchWriter(
+    "INSERT INTO user_interactions (user_id, scenario_id, user_response, chatbot_feedback, is_correct, grader) "
+    "VALUES (?, ?, ?, ?, ?, ?)",
+    batch_size=WRITE_BATCH_SIZE,
+    flush_interval_ms=WRITE_FLUSH_INTERVAL_MS,
+    max_queue=WRITE_QUEUE_MAXSIZE,
+    name="interaction-writer",
+)
+atexit.register(interaction_writer.close)
+
+# Escritor en segundo plano para las sesiones de chat (solo con SESSION_PERSIST)
+session_writer = BatchWriter(
+    "INSERT INTO chat_sessions (user_id, scenario_id, turn_count, completed, history, created_at, last_active) "
+    "VALUES (?, ?, ?, ?, ?, ?, ?) "
+    "ON CONFLICT(user_id, scenario_id) DO UPDATE SET turn_count = excluded.turn_count, "
+    "completed = excluded.completed, history = excluded.history, created_at = excluded.created_at, "
+    "last_active = excluded.last_active",
+    batch_size=WRITE_BATCH_SIZE,
+    flush_interval_ms=WRITE_FLUSH_INTERVAL_MS,
+    max_queue=WRITE_QUEUE_MAXSIZE,
+    name="session-writer",
+)
+atexit.register(session_writer.close)
+
+# Catálogo de escenarios en memoria compartido por toda la aplicación
+scenario_catalog = ScenarioCatalog()
 
 
 def hash_password(password: str) -> str:
@@ -9,17 +43,9 @@ def hash_password(password: str) -> str:
     return hashlib.sha256(password.encode()).hexdigest()
 
 
-def create_tables():
-    """Crea las tablas necesarias y aplica migraciones para agregar columnas faltantes."""
-    # Asegurar existencia del directorio de datos
-    os.makedirs(os.path.dirname(DB_PATH), exist_ok=True)
-    conn = sqlite3.connect(DB_PATH)
-    # Activar claves foráneas
-    conn.execute("PRAGMA foreign_keys = ON")
-    cursor = conn.cursor()
-
-    # Crear tabla users (sin department en versiones antiguas)
-    cursor.execute('''
+def _create_base_schema(conn):
+    """Versión 1: tablas originales de la aplicación."""
+    conn.execute('''
         CREATE TABLE IF NOT EXISTS users (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
             username TEXT UNIQUE NOT NULL,
@@ -27,17 +53,7 @@ def create_tables():
             role TEXT CHECK(role IN ('admin', 'user')) NOT NULL DEFAULT 'user'
         )
     ''')
-
-    # Migración: agregar columna department si no existe
-    cursor.execute("PRAGMA table_info(users)")
-    cols = [row[1] for row in cursor.fetchall()]
-    if 'department' not in cols:
-        cursor.execute(
-            "ALTER TABLE users ADD COLUMN department TEXT NOT NULL DEFAULT 'General'"
-        )
-
-    # Crear tabla phishing_scenarios
-    cursor.execute('''
+    conn.execute('''
         CREATE TABLE IF NOT EXISTS phishing_scenarios (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
             scenario_text TEXT NOT NULL,
@@ -45,9 +61,7 @@ def create_tables():
             image_path TEXT
         )
     ''')
-
-    # Crear tabla user_interactions
-    cursor.execute('''
+    conn.execute('''
         CREATE TABLE IF NOT EXISTS user_interactions (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
             user_id INTEGER NOT NULL,
@@ -59,9 +73,7 @@ def create_tables():
             FOREIGN KEY(scenario_id) REFERENCES phishing_scenarios(id)
         )
     ''')
-
-    # Crear tabla user_metrics
-    cursor.execute('''
+    conn.execute('''
         CREATE TABLE IF NOT EXISTS user_metrics (
             user_id INTEGER PRIMARY KEY,
             scenarios_completed INTEGER DEFAULT 0,
@@ -71,52 +83,427 @@ def create_tables():
             FOREIGN KEY(user_id) REFERENCES users(id)
         )
     ''')
-
-    # Índices para optimizar
-    cursor.execute(
-        "CREATE INDEX IF NOT EXISTS idx_user_interactions_user ON user_interactions(user_id)"
-    )
-    cursor.execute(
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_user_interactions_user ON user_interactions(user_id)")
+    conn.execute(
         "CREATE INDEX IF NOT EXISTS idx_phishing_scenarios_difficulty ON phishing_scenarios(difficulty_level)"
     )
 
-    # Trigger para actualizar métricas automáticamente
-    cursor.execute('''
-        CREATE TRIGGER IF NOT EXISTS trg_update_user_metrics
+
+def _add_user_department(conn):
+    """Versión 2: departamento de cada usuario."""
+    add_column(conn, "users", "department", "TEXT NOT NULL DEFAULT 'General'")
+
+
+def _add_grading_columns(conn):
+    """Versión 3: rúbrica por escenario y resultado estructurado de la calificación."""
+    add_column(conn, "phishing_scenarios", "rubric", "TEXT")
+    # NULL en las interacciones anteriores a la calificación estructurada
+    add_column(conn, "user_interactions", "is_correct", "INTEGER")
+    add_column(conn, "user_interactions", "grader", "TEXT")
+
+
+def _create_scenario_catalog_meta(conn):
+    """Versión 4: versión del catálogo, que cambia con cada modificación de phishing_scenarios."""
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS scenario_catalog_meta (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            version INTEGER NOT NULL DEFAULT 0
+        )
+    ''')
+    conn.execute("INSERT OR IGNORE INTO scenario_catalog_meta (id, version) VALUES (1, 0)")
+    for event in ("INSERT", "UPDATE", "DELETE"):
+        conn.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS trg_scenario_catalog_{event.lower()}
+            AFTER {event} ON phishing_scenarios
+            BEGIN
+                UPDATE scenario_catalog_meta SET version = version + 1 WHERE id = 1;
+            END;
+        ''')
+
+
+def _create_llm_tables(conn):
+    """Versión 5: caché de respuestas del LLM, registro de llamadas y marcas de exportación."""
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS llm_response_cache (
+            cache_key TEXT PRIMARY KEY,
+            response TEXT NOT NULL,
+            created_at REAL NOT NULL,
+            expires_at REAL NOT NULL
+        )
+    ''')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS export_watermarks (
+            name TEXT PRIMARY KEY,
+            last_interaction_id INTEGER NOT NULL DEFAULT 0,
+            exported_at DATETIME
+        )
+    ''')
+    # Registro de cada llamada al modelo (latencia, tokens y costo)
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS llm_calls (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            created_at REAL NOT NULL,
+            user_id INTEGER,
+            department TEXT,
+            scenario_id INTEGER,
+            model TEXT NOT NULL,
+            stream INTEGER NOT NULL DEFAULT 0,
+            cache_hit INTEGER NOT NULL DEFAULT 0,
+            prompt_tokens INTEGER NOT NULL DEFAULT 0,
+            completion_tokens INTEGER NOT NULL DEFAULT 0,
+            usage_estimated INTEGER NOT NULL DEFAULT 0,
+            cost_usd REAL NOT NULL DEFAULT 0,
+            latency_ms REAL NOT NULL,
+            ttft_ms REAL,
+            error TEXT
+        )
+    ''')
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_llm_response_cache_created ON llm_response_cache(created_at)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_llm_calls_created ON llm_calls(created_at)")
+
+
+def _create_chat_sessions(conn):
+    """Versión 6: sesiones de chat en curso (utils.session_store), si SESSION_PERSIST está activo."""
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS chat_sessions (
+            user_id INTEGER NOT NULL,
+            scenario_id INTEGER NOT NULL,
+            turn_count INTEGER NOT NULL DEFAULT 0,
+            completed INTEGER NOT NULL DEFAULT 0,
+            history TEXT,
+            created_at REAL NOT NULL,
+            last_active REAL NOT NULL,
+            PRIMARY KEY (user_id, scenario_id)
+        ) WITHOUT ROWID
+    ''')
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_chat_sessions_last_active ON chat_sessions(last_active)")
+
+
+def _create_archive_tables(conn):
+    """Versión 7: segmentos del archivo frío de interacciones y sus totales."""
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS interaction_archive_segments (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            file_name TEXT UNIQUE NOT NULL,
+            first_id INTEGER NOT NULL,
+            last_id INTEGER NOT NULL,
+            min_timestamp DATETIME,
+            max_timestamp DATETIME,
+            row_count INTEGER NOT NULL,
+            created_at DATETIME
+        )
+    ''')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS interaction_archive_users (
+            user_id INTEGER NOT NULL,
+            segment_id INTEGER NOT NULL,
+            PRIMARY KEY (user_id, segment_id)
+        ) WITHOUT ROWID
+    ''')
+    # Totales de las interacciones archivadas, para recalcular métricas sin leer el archivo
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS archived_interaction_totals (
+            user_id INTEGER NOT NULL,
+            scenario_id INTEGER NOT NULL,
+            attempts INTEGER NOT NULL DEFAULT 0,
+            correct INTEGER NOT NULL DEFAULT 0,
+            last_active DATETIME,
+            PRIMARY KEY (user_id, scenario_id)
+        ) WITHOUT ROWID
+    ''')
+
+
+def _create_incremental_metrics(conn):
+    """Versión 8: contadores de user_metrics mantenidos con costo constante por inserción."""
+    add_column(conn, "user_metrics", "correct_attempts", "INTEGER NOT NULL DEFAULT 0")
+    add_column(conn, "user_metrics", "last_active", "DATETIME")
+
+    # Escenarios distintos vistos por cada usuario (para contar en O(1) por inserción)
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS user_scenario_seen (
+            user_id INTEGER NOT NULL,
+            scenario_id INTEGER NOT NULL,
+            PRIMARY KEY (user_id, scenario_id),
+            FOREIGN KEY(user_id) REFERENCES users(id),
+            FOREIGN KEY(scenario_id) REFERENCES phishing_scenarios(id)
+        ) WITHOUT ROWID
+    ''')
+
+    # El trigger original recalculaba todo el historial del usuario en cada inserción.
+    # El acierto se toma de is_correct; las interacciones antiguas (NULL) usan el texto.
+    conn.execute("DROP TRIGGER IF EXISTS trg_update_user_metrics")
+    conn.execute("DROP TRIGGER IF EXISTS trg_user_metrics_incremental")
+    conn.execute('''
+        CREATE TRIGGER trg_user_metrics_incremental
         AFTER INSERT ON user_interactions
         BEGIN
-            INSERT OR REPLACE INTO user_metrics (
-                user_id,
-                scenarios_completed,
-                total_attempts,
-                correct_percentage,
-                error_percentage
-            )
-            SELECT
-                ui.user_id,
-                COUNT(DISTINCT ui.scenario_id),
-                COUNT(ui.id),
-                ROUND(
-                    SUM(CASE WHEN ui.chatbot_feedback LIKE '¡Correcto!%' THEN 1 ELSE 0 END) * 100.0 / COUNT(ui.id),
+            INSERT OR IGNORE INTO user_metrics (user_id) VALUES (NEW.user_id);
+
+            UPDATE user_metrics SET
+                scenarios_completed = scenarios_completed + NOT EXISTS (
+                    SELECT 1 FROM user_scenario_seen
+                    WHERE user_id = NEW.user_id AND scenario_id = NEW.scenario_id
+                ),
+                total_attempts = total_attempts + 1,
+                correct_attempts = correct_attempts + COALESCE(NEW.is_correct, NEW.chatbot_feedback LIKE '¡Correcto!%'),
+                correct_percentage = ROUND(
+                    (correct_attempts + COALESCE(NEW.is_correct, NEW.chatbot_feedback LIKE '¡Correcto!%')) * 100.0 / (total_attempts + 1),
                     2
                 ),
-                ROUND(
-                    SUM(CASE WHEN ui.chatbot_feedback NOT LIKE '¡Correcto!%' THEN 1 ELSE 0 END) * 100.0 / COUNT(ui.id),
+                error_percentage = ROUND(
+                    (total_attempts - correct_attempts + (1 - COALESCE(NEW.is_correct, NEW.chatbot_feedback LIKE '¡Correcto!%'))) * 100.0
+                        / (total_attempts + 1),
                     2
-                )
-            FROM user_interactions ui
-            WHERE ui.user_id = NEW.user_id
-            GROUP BY ui.user_id;
+                ),
+                last_active = CASE
+                    WHEN last_active IS NULL OR NEW.timestamp > last_active THEN NEW.timestamp
+                    ELSE last_active
+                END
+            WHERE user_id = NEW.user_id;
+
+            INSERT OR IGNORE INTO user_scenario_seen (user_id, scenario_id)
+            VALUES (NEW.user_id, NEW.scenario_id);
         END;
     ''')
 
-    conn.commit()
-    conn.close()
+    # Las bases existentes necesitan poblar los contadores nuevos una vez
+    _rebuild_user_metrics(conn)
+
+
+def _create_interaction_fts(conn):
+    """Versión 9: índice de texto completo sobre las interacciones.
+
+    Es de contenido externo (no duplica el texto) y lo mantienen al día los
+    triggers; la primera vez se llena con las filas existentes.
+    """
+    fts_exists = conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'user_interactions_fts'").fetchone()
+    conn.execute('''
+        CREATE VIRTUAL TABLE IF NOT EXISTS user_interactions_fts USING fts5(
+            user_response, chatbot_feedback,
+            content='user_interactions', content_rowid='id',
+            tokenize='unicode61 remove_diacritics 2'
+        )
+    ''')
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_user_interactions_fts_insert
+        AFTER INSERT ON user_interactions
+        BEGIN
+            INSERT INTO user_interactions_fts (rowid, user_response, chatbot_feedback)
+            VALUES (NEW.id, NEW.user_response, NEW.chatbot_feedback);
+        END;
+    ''')
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_user_interactions_fts_delete
+        AFTER DELETE ON user_interactions
+        BEGIN
+            INSERT INTO user_interactions_fts (user_interactions_fts, rowid, user_response, chatbot_feedback)
+            VALUES ('delete', OLD.id, OLD.user_response, OLD.chatbot_feedback);
+        END;
+    ''')
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_user_interactions_fts_update
+        AFTER UPDATE OF user_response, chatbot_feedback ON user_interactions
+        BEGIN
+            INSERT INTO user_interactions_fts (user_interactions_fts, rowid, user_response, chatbot_feedback)
+            VALUES ('delete', OLD.id, OLD.user_response, OLD.chatbot_feedback);
+            INSERT INTO user_interactions_fts (rowid, user_response, chatbot_feedback)
+            VALUES (NEW.id, NEW.user_response, NEW.chatbot_feedback);
+        END;
+    ''')
+    if not fts_exists:
+        conn.execute("INSERT INTO user_interactions_fts (user_interactions_fts) VALUES ('rebuild')")
+
+
+def _add_scenario_content_hash(conn):
+    """Versión 10: hash del texto para no duplicar escenarios (utils/scenario_ingest.py).
+
+    Si ya hay duplicados, solo el primero recibe el hash; los demás siguen
+    existiendo porque user_interactions puede referirse a ellos.
+    """
+    if add_column(conn, "phishing_scenarios", "content_hash", "TEXT"):
+        seen = set()
+        hashes = []
+        for scenario_id, text in conn.execute("SELECT id, scenario_text FROM phishing_scenarios ORDER BY id").fetchall():
+            content_hash = scenario_content_hash(text)
+            if content_hash not in seen:
+                seen.add(content_hash)
+                hashes.append((content_hash, scenario_id))
+        conn.executemany("UPDATE phishing_scenarios SET content_hash = ? WHERE id = ?", hashes)
+    conn.execute(
+        "CREATE UNIQUE INDEX IF NOT EXISTS idx_phishing_scenarios_hash ON phishing_scenarios(content_hash)"
+    )
+
+
+def _create_department_indexes(conn):
+    """Versión 11: índices para filtrar por departamento y para las claves foráneas a escenarios."""
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_users_department ON users(department)")
+    # Sin este índice, borrar o cambiar un escenario recorre todas las interacciones
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_user_interactions_scenario ON user_interactions(scenario_id)")
+
+
+def _create_department_rollups(conn):
+    """Versión 12: resúmenes por departamento, día y dificultad (ver department_stats.py)."""
+    # La clave empieza por (day, department, user_id) para saber con una sola búsqueda
+    # si el usuario ya estuvo activo ese día en cualquier dificultad
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS department_daily_user_stats (
+            day TEXT NOT NULL,
+            department TEXT NOT NULL,
+            user_id INTEGER NOT NULL,
+            difficulty TEXT NOT NULL,
+            attempts INTEGER NOT NULL DEFAULT 0,
+            correct INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (day, department, user_id, difficulty)
+        ) WITHOUT ROWID
+    ''')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS department_daily_stats (
+            day TEXT NOT NULL,
+            department TEXT NOT NULL,
+            difficulty TEXT NOT NULL,
+            attempts INTEGER NOT NULL DEFAULT 0,
+            correct INTEGER NOT NULL DEFAULT 0,
+            active_users INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (day, department, difficulty)
+        ) WITHOUT ROWID
+    ''')
+    # Para descontar a un usuario borrado sin recorrer toda la tabla
+    conn.execute(
+        "CREATE INDEX IF NOT EXISTS idx_department_daily_user_stats_user ON department_daily_user_stats(user_id)"
+    )
+
+    # Los usuarios activos se cuentan antes de registrar al usuario en department_daily_user_stats:
+    # primero el grupo ALL_DIFFICULTIES, luego el de la dificultad del escenario.
+    correct = "COALESCE(NEW.is_correct, NEW.chatbot_feedback LIKE '¡Correcto!%')"
+    conn.execute("DROP TRIGGER IF EXISTS trg_department_rollups")
+    conn.execute(f'''
+        CREATE TRIGGER trg_department_rollups
+        AFTER INSERT ON user_interactions
+        BEGIN
+            INSERT INTO department_daily_stats (day, department, difficulty, attempts, correct, active_users)
+            SELECT date(NEW.timestamp), u.department, '{ALL_DIFFICULTIES}', 1, {correct}, NOT EXISTS (
+                SELECT 1 FROM department_daily_user_stats
+                WHERE day = date(NEW.timestamp) AND department = u.department AND user_id = NEW.user_id
+            )
+            FROM users u
+            WHERE u.id = NEW.user_id
+            ON CONFLICT (day, department, difficulty) DO UPDATE SET
+                attempts = attempts + 1,
+                correct = correct + excluded.correct,
+                active_users = active_users + excluded.active_users;
+
+            INSERT INTO department_daily_stats (day, department, difficulty, attempts, correct, active_users)
+            SELECT date(NEW.timestamp), u.department, s.difficulty_level, 1, {correct}, NOT EXISTS (
+                SELECT 1 FROM department_daily_user_stats
+                WHERE day = date(NEW.timestamp) AND department = u.department AND user_id = NEW.user_id
+                  AND difficulty = s.difficulty_level
+            )
+            FROM users u, phishing_scenarios s
+            WHERE u.id = NEW.user_id AND s.id = NEW.scenario_id
+            ON CONFLICT (day, department, difficulty) DO UPDATE SET
+                attempts = attempts + 1,
+                correct = correct + excluded.correct,
+                active_users = active_users + excluded.active_users;
+
+            INSERT INTO department_daily_user_stats (day, department, user_id, difficulty, attempts, correct)
+            SELECT date(NEW.timestamp), u.department, NEW.user_id, s.difficulty_level, 1, {correct}
+            FROM users u, phishing_scenarios s
+            WHERE u.id = NEW.user_id AND s.id = NEW.scenario_id
+            ON CONFLICT (day, department, user_id, difficulty) DO UPDATE SET
+                attempts = attempts + 1,
+                correct = correct + excluded.correct;
+        END;
+    ''')
+
+    populate_department_rollups(conn)
+
+
+# Migraciones en orden. Las bases anteriores a este registro tienen user_version 0
+# y pueden estar en cualquier punto intermedio, por eso cada paso es idempotente.
+# Para cambiar el esquema se agrega un paso al final; nunca se editan los aplicados.
+MIGRATIONS = [
+    Migration(1, "Esquema base", _create_base_schema),
+    Migration(2, "Departamento de usuarios", _add_user_department),
+    Migration(3, "Calificación estructurada", _add_grading_columns),
+    Migration(4, "Versión del catálogo de escenarios", _create_scenario_catalog_meta),
+    Migration(5, "Caché y registro de llamadas al LLM", _create_llm_tables),
+    Migration(6, "Sesiones de chat", _create_chat_sessions),
+    Migration(7, "Archivo frío de interacciones", _create_archive_tables),
+    Migration(8, "Métricas incrementales", _create_incremental_metrics),
+    Migration(9, "Búsqueda de texto completo", _create_interaction_fts),
+    Migration(10, "Hash de contenido de escenarios", _add_scenario_content_hash),
+    Migration(11, "Índices por departamento y escenario", _create_department_indexes),
+    Migration(12, "Resúmenes por departamento", _create_department_rollups),
+]
+SCHEMA_VERSION = MIGRATIONS[-1].version
+
+
+def create_tables():
+    """Lleva la base a la versión de esquema actual aplicando las migraciones pendientes.
+
+    Con la base al día solo se lee PRAGMA user_version, así que es seguro
+    llamarla en cada arranque.
+    """
+    # Asegurar existencia del directorio de datos
+    os.makedirs(os.path.dirname(DB_PATH), exist_ok=True)
+    # La conexión compartida ya tiene activadas las claves foráneas
+    conn = get_connection()
+    if get_schema_version(conn) >= SCHEMA_VERSION:
+        return
+    migrate(conn, MIGRATIONS, log=print)
+
+
+def _rebuild_user_metrics(conn):
+    """Recalcula user_metrics y user_scenario_seen dentro de la transacción en curso."""
+    conn.execute("DELETE FROM user_scenario_seen")
+    conn.execute('''
+        INSERT INTO user_scenario_seen (user_id, scenario_id)
+        SELECT user_id, scenario_id FROM user_interactions
+        UNION
+        SELECT user_id, scenario_id FROM archived_interaction_totals
+    ''')
+    conn.execute("DELETE FROM user_metrics")
+    conn.execute('''
+        INSERT INTO user_metrics (
+            user_id, scenarios_completed, total_attempts, correct_attempts,
+            correct_percentage, error_percentage, last_active
+        )
+        WITH combined AS (
+            SELECT user_id, scenario_id, COUNT(*) AS attempts,
+                   SUM(COALESCE(is_correct, chatbot_feedback LIKE '¡Correcto!%')) AS correct,
+                   MAX(timestamp) AS last_active
+            FROM user_interactions
+            GROUP BY user_id, scenario_id
+            UNION ALL
+            SELECT user_id, scenario_id, attempts, correct, last_active
+            FROM archived_interaction_totals
+        )
+        SELECT
+            user_id,
+            COUNT(DISTINCT scenario_id),
+            SUM(attempts),
+            SUM(correct),
+            ROUND(SUM(correct) * 100.0 / SUM(attempts), 2),
+            ROUND((SUM(attempts) - SUM(correct)) * 100.0 / SUM(attempts), 2),
+            MAX(last_active)
+        FROM combined
+        GROUP BY user_id
+    ''')
+
+
+def rebuild_user_metrics():
+    """Recalcula user_metrics y user_scenario_seen desde cero a partir de user_interactions.
+
+    Las interacciones ya archivadas se cuentan desde archived_interaction_totals.
+    """
+    conn = get_connection()
+    with conn:
+        _rebuild_user_metrics(conn)
 
 
 def insert_default_admin():
     """Inserta un administrador por defecto si no existe."""
-    conn = sqlite3.connect(DB_PATH)
+    conn = get_connection()
     cursor = conn.cursor()
 
     cursor.execute("SELECT * FROM users WHERE username = 'admin'")
@@ -131,107 +518,141 @@ def insert_default_admin():
         print("Administrador ya existe.")
 
     conn.commit()
-    conn.close()
 
 
-def insert_sample_scenarios():
-    """Inserta escenarios de prueba con dificultad e imagen."""
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
+# Escenarios de prueba; para cargar más, ver utils/scenario_ingest.py
+SAMPLE_SCENARIOS = [
+    {
+        "text": "Recibes un correo de tu banco indicando actividad sospechosa en tu cuenta. Te piden hacer clic en un enlace.",
+        "difficulty": "Fácil",
+        "image": "ui/assets/scenario_images/escenario1.png",
+        "rubric": {
+            "safe_keywords": ["llamo al banco", "app del banco", "sitio oficial"],
+            "reference_correct": ["no hago clic y entro al sitio oficial del banco o llamo al banco"],
+            "reference_incorrect": ["hago clic en el enlace para revisar mi cuenta"],
+            "tip": "Los bancos no piden confirmar datos por enlaces en correos; usa su app o sitio oficial.",
+        },
+    },
+    {
+        "text": "Un correo de Recursos Humanos te indica que actualices tu nómina a través de un enlace desconocido.",
+        "difficulty": "Intermedio",
+        "image": "ui/assets/scenario_images/escenario2.png",
+        "rubric": {
+            "safe_keywords": ["recursos humanos", "rrhh", "portal interno", "intranet"],
+            "reference_correct": ["confirmo con recursos humanos por telefono o entro al portal interno"],
+            "reference_incorrect": ["actualizo mi nomina en el enlace del correo"],
+            "tip": "Confirma con Recursos Humanos por un canal conocido y usa solo el portal interno.",
+        },
+    },
+    {
+        "text": "Un alto ejecutivo te solicita transferir dinero a una cuenta desconocida de inmediato.",
+        "difficulty": "Difícil",
+        "image": "ui/assets/scenario_images/escenario3.png",
+        "rubric": {
+            "safe_keywords": ["confirmo con el ejecutivo", "llamo al ejecutivo", "finanzas", "doble autorizacion"],
+            "risky_patterns": [r"(?<!no )\b(hago|haria|realizo) (la )?transferencia\b"],
+            "reference_correct": ["no transfiero y confirmo la solicitud llamando al ejecutivo por un numero conocido"],
+            "reference_incorrect": ["transfiero el dinero porque lo pide el jefe"],
+            "tip": "Las solicitudes urgentes de dinero se confirman siempre por otro canal antes de actuar.",
+        },
+    },
+]
 
-    cursor.executemany('''
-        INSERT INTO phishing_scenarios (scenario_text, difficulty_level, image_path)
-        VALUES (?, ?, ?)
-    ''', [
-        (
-            "Recibes un correo de tu banco indicando actividad sospechosa en tu cuenta. Te piden hacer clic en un enlace.",
-            "Fácil",
-            "ui/assets/scenario_images/escenario1.png"
-        ),
-        (
-            "Un correo de Recursos Humanos te indica que actualices tu nómina a través de un enlace desconocido.",
-            "Intermedio",
-            "ui/assets/scenario_images/escenario2.png"
-        ),
-        (
-            "Un alto ejecutivo te solicita transferir dinero a una cuenta desconocida de inmediato.",
-            "Difícil",
-            "ui/assets/scenario_images/escenario3.png"
-        )
-    ])
 
-    conn.commit()
-    conn.close()
+def insert_sample_scenarios():
+    """Inserta los escenarios de prueba; los que ya existen no se duplican."""
+    report = ingest_scenarios(SAMPLE_SCENARIOS)
+    for origin, error in report.errors:
+        print(f"Escenario de prueba {origin} omitido: {error}")
     print("Escenarios de prueba insertados correctamente.")
 
 
-def get_random_phishing_scenario():
-    """Obtiene un escenario de phishing aleatorio."""
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-    cursor.execute(
-        "SELECT id, scenario_text, difficulty_level, image_path FROM phishing_scenarios ORDER BY RANDOM() LIMIT 1"
-    )
-    scenario = cursor.fetchone()
-    conn.close()
-    return {
-        "id": scenario[0],
-        "text": scenario[1],
-        "difficulty": scenario[2],
-        "image": scenario[3]
-    } if scenario else None
+def get_random_phishing_scenario(difficulty=None):
+    """Obtiene un escenario de phishing aleatorio, opcionalmente de una dificultad."""
+    return scenario_catalog.random(difficulty)
 
 
-def save_user_interaction(user_id, scenario_id, user_response, chatbot_feedback):
-    """Guarda la interacción del usuario."""
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-    cursor.execute(
-        "INSERT INTO user_interactions (user_id, scenario_id, user_response, chatbot_feedback) VALUES (?, ?, ?, ?)",
-        (user_id, scenario_id, user_response, chatbot_feedback)
-    )
-    conn.commit()
-    conn.close()
+def create_scenario_deck(difficulty=None):
+    """Crea una secuencia de escenarios sin repeticiones para una sesión."""
+    return ScenarioDeck(scenario_catalog, difficulty)
 
 
-def get_user_stats(user_id):
-    """Obtiene estadísticas agregadas para un usuario a partir de user_interactions."""
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
+def save_user_interaction(user_id, scenario_id, user_response, chatbot_feedback, is_correct=None, grader=None):
+    """Encola la interacción del usuario; se guarda en el siguiente commit agrupado.
 
-    cursor.execute(
-        '''
-        SELECT
-            COUNT(DISTINCT scenario_id) AS completed,
-            COUNT(*) AS total,
-            SUM(CASE WHEN chatbot_feedback LIKE '¡Correcto!%' THEN 1 ELSE 0 END) AS correct,
-            MAX(timestamp) AS last_active
-        FROM user_interactions
-        WHERE user_id = ?
-        ''',
-        (user_id,)
-    )
+    is_correct y grader registran el resultado de la calificación ('rubric' o 'llm').
+    """
+    interaction_writer.submit((user_id, scenario_id, user_response, chatbot_feedback, is_correct, grader))
 
-    result = cursor.fetchone()
-    conn.close()
 
-    if not result or result[1] == 0:
-        return None
+def flush_interactions(timeout=None) -> bool:
+    """Espera a que todas las interacciones encoladas queden guardadas."""
+    return interaction_writer.flush(timeout)
 
-    completed, total, correct, last_active = result
-    correct = correct or 0
-    accuracy = round((correct / total) * 100, 2) if total else 0.0
 
+def _stats_from_row(completed, total, correct, accuracy, last_active):
     return {
         "completed": completed,
-        "accuracy": accuracy,
+        "accuracy": accuracy or 0.0,
         "last_active": last_active,
         "score": correct,
     }
 
 
+def get_user_stats(user_id):
+    """Obtiene las estadísticas de un usuario desde los contadores de user_metrics."""
+    conn = get_connection()
+    result = conn.execute(
+        '''
+        SELECT scenarios_completed, total_attempts, correct_attempts, correct_percentage, last_active
+        FROM user_metrics
+        WHERE user_id = ?
+        ''',
+        (user_id,)
+    ).fetchone()
+
+    if not result or not result[1]:
+        return None
+
+    return _stats_from_row(*result)
+
+
+def get_all_user_stats():
+    """Devuelve en una sola consulta las estadísticas de todos los usuarios no administradores.
+
+    Retorna un dict {user_id: stats} donde stats incluye username, department,
+    completed, accuracy, last_active y score. Los usuarios sin actividad tienen
+    total 0 y valores vacíos.
+    """
+    conn = get_connection()
+    rows = conn.execute('''
+        SELECT u.id, u.username, u.department,
+               COALESCE(m.scenarios_completed, 0), COALESCE(m.total_attempts, 0),
+               COALESCE(m.correct_attempts, 0), m.correct_percentage, m.last_active
+        FROM users u
+        LEFT JOIN user_metrics m ON m.user_id = u.id
+        WHERE u.role = 'user'
+        ORDER BY u.username
+    ''').fetchall()
+
+    snapshot = {}
+    for user_id, username, department, completed, total, correct, accuracy, last_active in rows:
+        stats = _stats_from_row(completed, total, correct, accuracy, last_active)
+        stats.update({"username": username, "department": department, "total": total})
+        snapshot[user_id] = stats
+    return snapshot
+
+
 # Inicializar base de datos (migración incluida)
 if __name__ == "__main__":
+    import sys
+
+    if "--rebuild-metrics" in sys.argv:
+        create_tables()
+        rebuild_user_metrics()
+        print("Métricas de usuario recalculadas.")
+        sys.exit(0)
+
     create_tables()
     insert_default_admin()
     insert_sample_scenarios()
@@ -0,0 +1,174 @@
+"""Estadísticas de entrenamiento por departamento, día y dificultad.
+
+Un trigger sobre user_interactions mantiene dos tablas de resumen:
+
+- department_daily_user_stats: intentos y aciertos por (día, departamento,
+  usuario, dificultad); sirve para contar usuarios distintos.
+- department_daily_stats: intentos, aciertos y usuarios activos distintos por
+  (día, departamento, dificultad). Es la que leen los tableros.
+
+En department_daily_stats, además de cada dificultad hay una fila con dificultad
+ALL_DIFFICULTIES, para que los usuarios activos de un día no se cuenten dos veces
+al sumar dificultades.
+El día es la fecha UTC del timestamp de la interacción, como en el resto de la
+base. El archivado no toca los resúmenes; borrar un usuario descuenta su aporte.
+"""
+from utils.db import get_connection
+from utils.interaction_archive import iter_archived_interactions
+
+# Dificultad de las filas que suman todas las dificultades
+ALL_DIFFICULTIES = "Todas"
+
+_ROLLUP_KEYS = ("day", "department", "attempts", "correct", "accuracy", "active_users")
+_COMPARISON_KEYS = ("department", "attempts", "correct", "accuracy", "active_users", "active_days")
+
+
+def _since(days):
+    """Primer día incluido en los últimos `days` días (None = todo el historial)."""
+    if days is None:
+        return "0000-00-00"
+    return get_connection().execute("SELECT date('now', ?)", (f"-{int(days) - 1} days",)).fetchone()[0]
+
+
+def get_department_timeseries(department=None, days=30, difficulty=None) -> list:
+    """Serie diaria de los últimos `days` días, de un departamento o de todos.
+
+    Cada fila: day, department, attempts, correct, accuracy (%) y active_users.
+    """
+    conditions = ["day >= ?", "difficulty = ?"]
+    params = [_since(days), difficulty or ALL_DIFFICULTIES]
+    if department is not None:
+        conditions.append("department = ?")
+        params.append(department)
+    rows = get_connection().execute(f'''
+        SELECT day, department, attempts, correct,
+               ROUND(correct * 100.0 / attempts, 2), active_users
+        FROM department_daily_stats
+        WHERE {" AND ".join(conditions)}
+        ORDER BY day, department
+    ''', params).fetchall()
+    return [dict(zip(_ROLLUP_KEYS, row)) for row in rows]
+
+
+def compare_departments(days=30, difficulty=None) -> list:
+    """Totales por departamento en los últimos `days` días, ordenados por porcentaje de aciertos.
+
+    Cada fila: department, attempts, correct, accuracy (%), active_users
+    (usuarios distintos en todo el período) y active_days.
+    """
+    since = _since(days)
+    user_filter = "AND difficulty = ?" if difficulty else ""
+    user_params = (since, difficulty) if difficulty else (since,)
+    rows = get_connection().execute(f'''
+        SELECT t.department, t.attempts, t.correct,
+               ROUND(t.correct * 100.0 / t.attempts, 2), u.active_users, t.active_days
+        FROM (
+            SELECT department, SUM(attempts) AS attempts, SUM(correct) AS correct, COUNT(*) AS active_days
+            FROM department_daily_stats
+            WHERE day >= ? AND difficulty = ?
+            GROUP BY department
+        ) t
+        JOIN (
+            SELECT department, COUNT(DISTINCT user_id) AS active_users
+            FROM department_daily_user_stats
+            WHERE day >= ? {user_filter}
+            GROUP BY department
+        ) u ON u.department = t.department
+        ORDER BY 4 DESC, t.department
+    ''', (since, difficulty or ALL_DIFFICULTIES) + user_params).fetchall()
+    return [dict(zip(_COMPARISON_KEYS, row)) for row in rows]
+
+
+def remove_user_from_rollups(conn, user_id):
+    """Descuenta el aporte de un usuario a los resúmenes (dentro de la transacción en curso)."""
+    conn.execute('''
+        UPDATE department_daily_stats AS r
+        SET attempts = r.attempts - x.attempts,
+            correct = r.correct - x.correct,
+            active_users = r.active_users - 1
+        FROM department_daily_user_stats AS x
+        WHERE x.user_id = ? AND r.day = x.day AND r.department = x.department AND r.difficulty = x.difficulty
+    ''', (user_id,))
+    conn.execute('''
+        UPDATE department_daily_stats AS r
+        SET attempts = r.attempts - x.attempts,
+            correct = r.correct - x.correct,
+            active_users = r.active_users - 1
+        FROM (
+            SELECT day, department, SUM(attempts) AS attempts, SUM(correct) AS correct
+            FROM department_daily_user_stats
+            WHERE user_id = ?
+            GROUP BY day, department
+        ) AS x
+        WHERE r.day = x.day AND r.department = x.department AND r.difficulty = ?
+    ''', (user_id, ALL_DIFFICULTIES))
+    conn.execute("DELETE FROM department_daily_stats WHERE active_users <= 0")
+    conn.execute("DELETE FROM department_daily_user_stats WHERE user_id = ?", (user_id,))
+
+
+def populate_department_rollups(conn):
+    """Recalcula los resúmenes desde las interacciones y el archivo frío (dentro de la transacción en curso).
+
+    El departamento es el actual de cada usuario.
+    """
+    conn.execute("DELETE FROM department_daily_stats")
+    conn.execute("DELETE FROM department_daily_user_stats")
+
+    conn.execute('''
+        CREATE TEMP TABLE IF NOT EXISTS archived_rollup_rows (
+            user_id INTEGER, scenario_id INTEGER, timestamp DATETIME, correct INTEGER
+        )
+    ''')
+    conn.execute("DELETE FROM temp.archived_rollup_rows")
+    conn.executemany(
+        "INSERT INTO temp.archived_rollup_rows VALUES (?, ?, ?, COALESCE(?, ? LIKE '¡Correcto!%'))",
+        ((row["user_id"], row["scenario_id"], row["timestamp"], row["is_correct"], row["chatbot_feedback"])
+         for row in iter_archived_interactions())
+    )
+
+    conn.execute('''
+        INSERT INTO department_daily_user_stats (day, department, user_id, difficulty, attempts, correct)
+        SELECT date(i.timestamp), u.department, i.user_id, s.difficulty_level, COUNT(*), SUM(i.correct)
+        FROM (
+            SELECT user_id, scenario_id, timestamp,
+                   COALESCE(is_correct, chatbot_feedback LIKE '¡Correcto!%') AS correct
+            FROM user_interactions
+            UNION ALL
+            SELECT user_id, scenario_id, timestamp, correct FROM temp.archived_rollup_rows
+        ) i
+        JOIN users u ON u.id = i.user_id
+        JOIN phishing_scenarios s ON s.id = i.scenario_id
+        GROUP BY 1, 2, 3, 4
+    ''')
+    conn.execute(f'''
+        INSERT INTO department_daily_stats (day, department, difficulty, attempts, correct, active_users)
+        SELECT day, department, difficulty, SUM(attempts), SUM(correct), COUNT(*)
+        FROM department_daily_user_stats
+        GROUP BY day, department, difficulty
+        UNION ALL
+        SELECT day, department, '{ALL_DIFFICULTIES}', SUM(attempts), SUM(correct), COUNT(DISTINCT user_id)
+        FROM department_daily_user_stats
+        GROUP BY day, department
+    ''')
+    conn.execute("DROP TABLE temp.archived_rollup_rows")
+
+
+def rebuild_department_rollups():
+    """Recalcula desde cero los resúmenes por departamento."""
+    conn = get_connection()
+    with conn:
+        populate_department_rollups(conn)
+
+
+if __name__ == "__main__":
+    import sys
+
+    from database_setup import create_tables
+
+    create_tables()
+    if "--rebuild" in sys.argv:
+        rebuild_department_rollups()
+        print("Resúmenes por departamento recalculados.")
+    for stats in compare_departments(days=None):
+        print(f"{stats['department']:<20} intentos={stats['attempts']:<8} aciertos={stats['accuracy']}% "
+              f"usuarios={stats['active_users']} días={stats['active_days']}")
@@ -0,0 +1,147 @@
+"""Importación masiva de empleados desde CSV o JSONL.
+
+Cada registro trae username, password y department (CSV con encabezados o un
+objeto JSON por línea). El archivo se lee en streaming; la validación y el hash
+de contraseñas se reparten en bloques en un pool de hilos, los duplicados se
+detectan con un solo conjunto de nombres, USER_LIMIT se aplica una vez y todas
+las filas válidas se insertan con executemany en una sola transacción.
+
+Uso: python employee_import.py empleados.csv
+"""
+import csv
+import json
+import os
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+
+from auth import USER_LIMIT, hash_password, user_cache
+from utils.db import get_connection
+
+# Resultado de una importación: filas insertadas y errores [(línea, usuario, motivo)]
+ImportReport = namedtuple("ImportReport", ["imported", "errors"])
+
+MIN_PASSWORD_LENGTH = 6
+IMPORT_CHUNK_ROWS = 1000
+IMPORT_WORKERS = min(8, os.cpu_count() or 1)
+
+
+def read_employee_file(path):
+    """Recorre el archivo y entrega (línea, dict) sin cargarlo completo en memoria."""
+    with open(path, newline="", encoding="utf-8-sig") as file:
+        if path.lower().endswith((".jsonl", ".ndjson")):
+            for line_number, line in enumerate(file, start=1):
+                if not line.strip():
+                    continue
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    record = None
+                yield line_number, record if isinstance(record, dict) else None
+        else:
+            # La línea 1 es el encabezado
+            for line_number, record in enumerate(csv.DictReader(file), start=2):
+                yield line_number, record
+
+
+def _prepare_chunk(chunk):
+    """Valida y hashea un bloque. Retorna [(línea, usuario, fila o None, error o None)]."""
+    prepared = []
+    for line_number, record in chunk:
+        if record is None:
+            prepared.append((line_number, "", None, "Registro ilegible."))
+            continue
+        username = str(record.get("username") or "").strip()
+        password = str(record.get("password") or "")
+        department = str(record.get("department") or "").strip()
+        if not username or not password or not department:
+            error = "Todos los campos son obligatorios."
+        elif len(password) < MIN_PASSWORD_LENGTH:
+            error = f"La contraseña debe tener al menos {MIN_PASSWORD_LENGTH} caracteres."
+        else:
+            prepared.append((line_number, username, (username, hash_password(password), "user", department), None))
+            continue
+        prepared.append((line_number, username, None, error))
+    return prepared
+
+
+def _chunks(records, size):
+    records = iter(records)
+    while True:
+        chunk = list(islice(records, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def import_employees(source, user_limit=USER_LIMIT, progress=None) -> ImportReport:
+    """Registra en bloque los empleados de `source` (ruta a CSV/JSONL o iterable de (línea, dict)).
+
+    Las filas inválidas, repetidas o que excedan `user_limit` (None = sin límite)
+    no se insertan y quedan en el reporte. progress(filas_leídas) se llama por bloque.
+    """
+    records = read_employee_file(source) if isinstance(source, str) else source
+    errors = []
+    candidates = []
+    read = 0
+
+    def collect(prepared):
+        nonlocal read
+        for line_number, username, row, error in prepared:
+            if error:
+                errors.append((line_number, username, error))
+            else:
+                candidates.append((line_number, row))
+        read += len(prepared)
+        if progress:
+            progress(read)
+
+    with ThreadPoolExecutor(max_workers=IMPORT_WORKERS, thread_name_prefix="employee-import") as pool:
+        # Solo unos pocos bloques en vuelo, recogidos en el orden del archivo: el
+        # archivo se lee a medida que avanzan los hilos y no entero de una vez
+        pending = []
+        for chunk in _chunks(records, IMPORT_CHUNK_ROWS):
+            pending.append(pool.submit(_prepare_chunk, chunk))
+            if len(pending) >= IMPORT_WORKERS:
+                collect(pending.pop(0).result())
+        for future in pending:
+            collect(future.result())
+
+    conn = get_connection()
+    rows = []
+    with conn:
+        # La escritura se reserva antes de leer los nombres: nadie puede registrar entre medio
+        conn.execute("BEGIN IMMEDIATE")
+        taken = {username for (username,) in conn.execute("SELECT username FROM users")}
+        available = None if user_limit is None else max(0, user_limit - len(taken))
+
+        for line_number, row in candidates:
+            if row[0] in taken:
+                errors.append((line_number, row[0], "Este nombre de usuario ya está registrado."))
+            elif available is not None and len(rows) >= available:
+                errors.append((line_number, row[0], "Se ha alcanzado el límite máximo de usuarios permitidos."))
+            else:
+                taken.add(row[0])
+                rows.append(row)
+
+        conn.executemany(
+            "INSERT INTO users (username, password_hash, role, department) VALUES (?, ?, ?, ?)", rows
+        )
+
+    # Los conteos y registros en caché ya no son válidos
+    user_cache.clear()
+    errors.sort()
+    return ImportReport(len(rows), errors)
+
+
+if __name__ == "__main__":
+    import sys
+
+    if len(sys.argv) != 2:
+        print(__doc__)
+        sys.exit(1)
+
+    report = import_employees(sys.argv[1])
+    print(f"Empleados importados: {report.imported}")
+    for line_number, username, error in report.errors:
+        print(f"  línea {line_number} ({username or '-'}): {error}")
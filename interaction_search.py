@@ -0,0 +1,106 @@
+import re
+from collections import namedtuple
+
+from utils.db import get_connection
+
+# Una página de resultados y el cursor para pedir la siguiente (None si no hay más)
+SearchPage = namedtuple("SearchPage", ["rows", "next_cursor"])
+
+# Orden de los resultados: relevancia (bm25) o más recientes primero
+SEARCH_ORDERS = ("rank", "recent")
+
+# Peso de cada columna en bm25: la respuesta del usuario pesa más que la retroalimentación
+RESPONSE_WEIGHT = 2.0
+FEEDBACK_WEIGHT = 1.0
+
+_WORD = re.compile(r"\w+")
+
+
+def build_match_query(text):
+    """Convierte el texto del buscador en una consulta FTS5 segura.
+
+    Cada palabra se cita (los operadores de FTS5 no se interpretan) y se busca
+    como prefijo; todas deben aparecer. Retorna None si no hay palabras.
+    """
+    words = _WORD.findall(text or "")
+    if not words:
+        return None
+    return " ".join(f'"{word}"*' for word in words)
+
+
+def search_interactions(text, user_id=None, department=None, scenario_id=None, since=None, until=None,
+                        order="rank", limit=50, cursor=None, highlight=("[", "]")) -> SearchPage:
+    """Busca en las respuestas de los usuarios y la retroalimentación del chatbot.
+
+    Filtros opcionales: usuario, departamento, escenario y rango de fechas
+    (`since`/`until` como 'AAAA-MM-DD', ambos inclusive). La paginación es por
+    cursor: se pasa el `next_cursor` de la página anterior, de modo que cada
+    página cuesta lo mismo sin importar cuán profunda sea.
+    Cada fila trae id, timestamp, username, department, scenario_id, is_correct,
+    score y los fragmentos con las coincidencias marcadas con `highlight`.
+    """
+    if order not in SEARCH_ORDERS:
+        raise ValueError(f"Orden no válido: {order}")
+    match = build_match_query(text)
+    if match is None:
+        return SearchPage([], None)
+
+    conditions = ["user_interactions_fts MATCH ?"]
+    params = [match]
+    for column, value in (("i.user_id", user_id), ("u.department", department), ("i.scenario_id", scenario_id)):
+        if value is not None:
+            conditions.append(f"{column} = ?")
+            params.append(value)
+    if since:
+        conditions.append("i.timestamp >= ?")
+        params.append(since)
+    if until:
+        conditions.append("i.timestamp < date(?, '+1 day')")
+        params.append(until)
+
+    # Keyset: continuar justo después de la última fila de la página anterior
+    if cursor is not None:
+        if order == "rank":
+            conditions.append("(score > ? OR (score = ? AND i.id > ?))")
+            params.extend((cursor[0], cursor[0], cursor[1]))
+        else:
+            conditions.append("user_interactions_fts.rowid < ?")
+            params.append(cursor)
+    # Por fecha, FTS5 recorre el índice en orden de rowid y se detiene al llenar la página;
+    # por relevancia debe puntuar todas las coincidencias antes de ordenar.
+    order_by = "score, i.id" if order == "rank" else "user_interactions_fts.rowid DESC"
+
+    start, end = highlight
+    rows = get_connection().execute(f'''
+        SELECT i.id, i.timestamp, u.username, u.department, i.scenario_id, i.is_correct,
+               bm25(user_interactions_fts, {RESPONSE_WEIGHT}, {FEEDBACK_WEIGHT}) AS score,
+               snippet(user_interactions_fts, 0, ?, ?, '…', 12),
+               snippet(user_interactions_fts, 1, ?, ?, '…', 12)
+        FROM user_interactions_fts
+        JOIN user_interactions i ON i.id = user_interactions_fts.rowid
+        JOIN users u ON u.id = i.user_id
+        WHERE {" AND ".join(conditions)}
+        ORDER BY {order_by}
+        LIMIT ?
+    ''', (start, end, start, end, *params, limit + 1)).fetchall()
+
+    has_more = len(rows) > limit
+    keys = ("id", "timestamp", "username", "department", "scenario_id", "is_correct", "score",
+            "user_response", "chatbot_feedback")
+    results = [dict(zip(keys, row)) for row in rows[:limit]]
+    if not results:
+        return SearchPage([], None)
+
+    last = results[-1]
+    next_cursor = None
+    if has_more:
+        next_cursor = (last["score"], last["id"]) if order == "rank" else last["id"]
+    return SearchPage(results, next_cursor)
+
+
+def get_departments() -> list:
+    """Departamentos con al menos un usuario, para los filtros del buscador."""
+    rows = get_connection().execute(
+        "SELECT DISTINCT department FROM users WHERE department IS NOT NULL ORDER BY department"
+    ).fetchall()
+    return [row[0] for row in rows]
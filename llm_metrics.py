@@ -0,0 +1,142 @@
+import atexit
+import time
+
+from config import MODEL_PRICING, WRITE_BATCH_SIZE, WRITE_FLUSH_INTERVAL_MS, WRITE_QUEUE_MAXSIZE
+from utils.batch_writer import BatchWriter
+from utils.conversation_memory import count_tokens, message_tokens
+from utils.db import get_connection
+
+# Las mediciones se guardan por lotes, igual que las interacciones
+llm_call_writer = BatchWriter(
+    "INSERT INTO llm_calls (created_at, user_id, department, scenario_id, model, stream, cache_hit, "
+    "prompt_tokens, completion_tokens, usage_estimated, cost_usd, latency_ms, ttft_ms, error) "
+    "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+    batch_size=WRITE_BATCH_SIZE,
+    flush_interval_ms=WRITE_FLUSH_INTERVAL_MS,
+    max_queue=WRITE_QUEUE_MAXSIZE,
+    name="llm-call-writer",
+)
+atexit.register(llm_call_writer.close)
+
+# Agrupaciones disponibles en get_llm_usage()
+USAGE_GROUPS = {
+    "day": ("date(created_at, 'unixepoch', 'localtime')", "DESC"),
+    "department": ("COALESCE(department, 'Sin departamento')", "ASC"),
+}
+
+
+def estimate_cost(model, prompt_tokens, completion_tokens) -> float:
+    """Costo en USD según MODEL_PRICING; 0 si el modelo no tiene precio configurado."""
+    prompt_price, completion_price = MODEL_PRICING.get(model, (0.0, 0.0))
+    return (prompt_tokens * prompt_price + completion_tokens * completion_price) / 1_000_000
+
+
+def _department(user_id):
+    if user_id is None:
+        return None
+    try:
+        from auth import user_cache
+        user = user_cache.get_by_id(user_id)
+    except Exception:
+        return None
+    return user.department if user else None
+
+
+class LLMCall:
+    """Mediciones de una llamada al modelo, completadas mientras se ejecuta.
+
+    Se crea justo antes de la llamada; el código que llama a la API informa el
+    primer fragmento y el uso de tokens, y record() encola la fila al terminar.
+    """
+    __slots__ = ("model", "user_id", "scenario_id", "stream", "started", "first_token_at",
+                 "prompt_tokens", "completion_tokens")
+
+    def __init__(self, model, user_id=None, scenario_id=None, stream=False):
+        self.model = model
+        self.user_id = user_id
+        self.scenario_id = scenario_id
+        self.stream = stream
+        self.started = time.perf_counter()
+        self.first_token_at = None
+        self.prompt_tokens = None
+        self.completion_tokens = None
+
+    def mark_first_token(self):
+        if self.first_token_at is None:
+            self.first_token_at = time.perf_counter()
+
+    def set_usage(self, usage):
+        """Toma los tokens de `response.usage` (o del último fragmento en streaming)."""
+        if usage is not None:
+            self.prompt_tokens = usage.prompt_tokens
+            self.completion_tokens = usage.completion_tokens
+
+    def record(self, conversation_history=None, response_text=None, cache_hit=False, error=None):
+        """Encola la medición. Nunca lanza: la instrumentación no debe romper el chat."""
+        latency_ms = (time.perf_counter() - self.started) * 1000
+        ttft_ms = (self.first_token_at - self.started) * 1000 if self.first_token_at is not None else None
+
+        prompt_tokens, completion_tokens = self.prompt_tokens, self.completion_tokens
+        estimated = False
+        if cache_hit or (error is not None and prompt_tokens is None):
+            # Sin llamada facturada: respuesta de la caché o error sin uso informado
+            prompt_tokens = completion_tokens = 0
+        elif prompt_tokens is None:
+            # El proveedor no informó el uso: estimarlo localmente
+            estimated = True
+            prompt_tokens = sum(message_tokens(m) for m in conversation_history or [])
+            completion_tokens = count_tokens(response_text or "")
+
+        try:
+            llm_call_writer.submit((
+                time.time(), self.user_id, _department(self.user_id), self.scenario_id, self.model,
+                int(self.stream), int(cache_hit), prompt_tokens, completion_tokens, int(estimated),
+                estimate_cost(self.model, prompt_tokens, completion_tokens),
+                round(latency_ms, 3), round(ttft_ms, 3) if ttft_ms is not None else None,
+                type(error).__name__ if error is not None else None,
+            ))
+        except RuntimeError as e:
+            print(f"No se pudo registrar la llamada al modelo: {e}")
+
+
+def flush_llm_calls(timeout=None) -> bool:
+    """Espera a que todas las mediciones encoladas queden guardadas."""
+    return llm_call_writer.flush(timeout)
+
+
+def get_llm_usage(group_by="day", days=30) -> list:
+    """Resumen de llamadas al modelo por día o por departamento en los últimos `days` días.
+
+    Cada fila incluye llamadas, aciertos de caché, errores, percentiles de latencia
+    (p50/p95/p99, solo llamadas reales a la API sin error), tiempo medio al primer
+    fragmento, tokens y costo.
+    """
+    group_expr, order = USAGE_GROUPS[group_by]
+    since = time.time() - days * 86400
+    rows = get_connection().execute(f'''
+        WITH calls AS (
+            SELECT {group_expr} AS grp, latency_ms, ttft_ms, cache_hit, error,
+                   prompt_tokens, completion_tokens, cost_usd,
+                   CASE WHEN cache_hit = 0 AND error IS NULL THEN 1 ELSE 0 END AS api_ok
+            FROM llm_calls
+            WHERE created_at >= ?
+        ), ranked AS (
+            SELECT *,
+                   ROW_NUMBER() OVER (PARTITION BY grp, api_ok ORDER BY latency_ms) AS rn,
+                   SUM(api_ok) OVER (PARTITION BY grp) AS n
+            FROM calls
+        )
+        SELECT grp, COUNT(*), SUM(cache_hit), SUM(error IS NOT NULL),
+               MIN(CASE WHEN api_ok AND rn * 100 >= 50 * n THEN latency_ms END),
+               MIN(CASE WHEN api_ok AND rn * 100 >= 95 * n THEN latency_ms END),
+               MIN(CASE WHEN api_ok AND rn * 100 >= 99 * n THEN latency_ms END),
+               AVG(CASE WHEN api_ok THEN ttft_ms END),
+               SUM(prompt_tokens), SUM(completion_tokens), SUM(cost_usd)
+        FROM ranked
+        GROUP BY grp
+        ORDER BY grp {order}
+    ''', (since,)).fetchall()
+
+    keys = ("group", "calls", "cache_hits", "errors", "p50_ms", "p95_ms", "p99_ms", "avg_ttft_ms",
+            "prompt_tokens", "completion_tokens", "cost_usd")
+    return [dict(zip(keys, row)) for row in rows]
@@ -1,16 +1,56 @@
+import time
+
+# Marca de inicio para medir el tiempo hasta la primera ventana
+_START = time.perf_counter()
+
 import sys
 import os
+import threading
 
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
 from PyQt6.QtWidgets import QApplication
+from PyQt6.QtCore import QTimer
 from ui.onboarding_window import OnboardingWindow
 from ui.login_window import LoginWindow
-from ui.main_window import ChatWindow
-from ui.admin_window import AdminWindow
+from utils.db import close_all_connections
+from database_setup import create_tables, interaction_writer, session_writer
+from llm_metrics import llm_call_writer
+from config import PREWARM_ON_STARTUP, ARCHIVE_ON_STARTUP
+
+def prewarm():
+    """Carga en segundo plano las ventanas de chat y admin y el cliente de OpenAI."""
+    try:
+        import ui.main_window
+        import ui.admin_window
+        import chatbot
+        chatbot.get_client()
+    except Exception as e:
+        # Si algo falla, se volverá a intentar (y reportar) cuando se necesite
+        print(f"Precarga omitida: {e}")
+
+def archive_in_background():
+    """Mueve al archivo frío las interacciones antiguas sin bloquear la interfaz."""
+    try:
+        from utils.interaction_archive import archive_old_interactions
+        archived = archive_old_interactions()
+        if archived:
+            print(f"Interacciones archivadas: {archived}")
+    except Exception as e:
+        # Se volverá a intentar en el próximo inicio
+        print(f"Archivado omitido: {e}")
 
 def main():
+    # Las ventanas consultan la base desde el primer momento: aplicar migraciones pendientes
+    # (con la base al día es una sola lectura de PRAGMA user_version)
+    create_tables()
+
     app = QApplication(sys.argv)
+    # Guardar las interacciones pendientes y cerrar las conexiones al salir
+    app.aboutToQuit.connect(interaction_writer.close)
+    app.aboutToQuit.connect(llm_call_writer.close)
+    app.aboutToQuit.connect(session_writer.close)
+    app.aboutToQuit.connect(close_all_connections)
 
     # Lista para mantener vivas las ventanas
     windows = []
@@ -29,10 +69,12 @@ def main():
             # Ocultar login
             login_win.hide()
 
-            # Abrir ventana según rol
+            # Abrir ventana según rol (importadas al necesitarlas)
             if role == "admin":
+                from ui.admin_window import AdminWindow
                 win = AdminWindow()
             else:
+                from ui.main_window import ChatWindow
                 win = ChatWindow(username)
             windows.append(win)
             win.show()
@@ -45,6 +87,23 @@ def main():
     onboarding.start_clicked.connect(on_start)
     onboarding.show()
 
+    # Con el onboarding ya en pantalla, precargar lo pesado en segundo plano
+    if PREWARM_ON_STARTUP:
+        QTimer.singleShot(0, lambda: threading.Thread(target=prewarm, name="prewarm", daemon=True).start())
+
+    # Archivar el historial antiguo en segundo plano, por bloques
+    if ARCHIVE_ON_STARTUP:
+        QTimer.singleShot(0, lambda: threading.Thread(
+            target=archive_in_background, name="archiver", daemon=True
+        ).start())
+
+    # Modo de medición (benchmarks/startup_report.py): salir al mostrar la primera ventana
+    if os.getenv("CHATBOT_STARTUP_PROBE"):
+        def report_first_window():
+            print(f"first_window_ms={(time.perf_counter() - _START) * 1000:.1f}", flush=True)
+            app.quit()
+        QTimer.singleShot(0, report_first_window)
+
     sys.exit(app.exec())
 
 if __name__ == "__main__":
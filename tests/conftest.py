@@ -0,0 +1,21 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+
+@pytest.fixture
+def db_path(tmp_path, monkeypatch):
+    """Ruta de una base temporal, activa como config.DB_PATH durante la prueba."""
+    import config
+    import database_setup
+    from utils.db import close_connection
+
+    (tmp_path / "data").mkdir()
+    path = str(tmp_path / "data" / "test.db")
+    monkeypatch.setattr(config, "DB_PATH", path)
+    monkeypatch.setattr(database_setup, "DB_PATH", path)
+    yield path
+    close_connection(path)
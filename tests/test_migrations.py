@@ -0,0 +1,107 @@
+"""Migraciones de esquema: base antigua, base nueva y pasos fallidos."""
+import pytest
+
+import database_setup
+from benchmarks.legacy_schema import LEGACY_SCENARIOS, build_legacy_db, legacy_feedback
+from utils.db import get_connection
+from utils.migrations import Migration, column_names, get_schema_version, migrate
+
+INTERACTIONS = 300
+USERS = 10
+
+NEW_OBJECTS = {
+    "trg_user_metrics_incremental", "idx_users_department", "idx_user_interactions_scenario",
+    "idx_phishing_scenarios_hash", "user_interactions_fts", "chat_sessions", "llm_response_cache",
+    "llm_calls", "interaction_archive_segments", "archived_interaction_totals",
+    "department_daily_stats", "department_daily_user_stats",
+}
+
+
+def schema_objects(conn):
+    return {name for (name,) in conn.execute("SELECT name FROM sqlite_master")}
+
+
+def test_legacy_database_migrates_to_current_version(db_path):
+    build_legacy_db(db_path, INTERACTIONS, users=USERS)
+    database_setup.create_tables()
+    conn = get_connection()
+
+    assert get_schema_version(conn) == database_setup.SCHEMA_VERSION
+    assert {"department"} <= column_names(conn, "users")
+    assert {"rubric", "content_hash"} <= column_names(conn, "phishing_scenarios")
+    assert {"is_correct", "grader"} <= column_names(conn, "user_interactions")
+    objects = schema_objects(conn)
+    assert NEW_OBJECTS <= objects
+    assert "trg_update_user_metrics" not in objects
+
+
+def test_legacy_rows_survive_migration(db_path):
+    build_legacy_db(db_path, INTERACTIONS, users=USERS)
+    database_setup.create_tables()
+    conn = get_connection()
+
+    rows = conn.execute(
+        "SELECT user_id, scenario_id, user_response, chatbot_feedback, is_correct FROM user_interactions ORDER BY id"
+    ).fetchall()
+    assert rows == [(i % USERS + 1, i % LEGACY_SCENARIOS + 1, f"respuesta {i}", legacy_feedback(i), None)
+                    for i in range(INTERACTIONS)]
+    assert conn.execute("SELECT COUNT(*) FROM users WHERE department = 'General'").fetchone()[0] == USERS
+    assert conn.execute("SELECT COUNT(*) FROM phishing_scenarios WHERE content_hash IS NULL").fetchone()[0] == 0
+
+    # Las métricas y los índices derivados se reconstruyen desde el historial
+    total, correct = conn.execute("SELECT SUM(total_attempts), SUM(correct_attempts) FROM user_metrics").fetchone()
+    assert (total, correct) == (INTERACTIONS, sum(1 for i in range(INTERACTIONS) if i % 3))
+    assert conn.execute(
+        "SELECT COUNT(*) FROM user_interactions_fts WHERE user_interactions_fts MATCH 'respuesta'"
+    ).fetchone()[0] == INTERACTIONS
+
+
+def test_migrated_database_accepts_new_interactions(db_path):
+    build_legacy_db(db_path, INTERACTIONS, users=USERS)
+    database_setup.create_tables()
+    conn = get_connection()
+
+    with conn:
+        conn.execute(
+            "INSERT INTO user_interactions (user_id, scenario_id, user_response, chatbot_feedback, is_correct, grader) "
+            "VALUES (1, 1, 'no hago clic', '¡Correcto!', 1, 'rubric')"
+        )
+    assert conn.execute("SELECT total_attempts FROM user_metrics WHERE user_id = 1").fetchone()[0] \
+        == INTERACTIONS // USERS + 1
+
+
+def test_create_tables_is_idempotent(db_path):
+    database_setup.create_tables()
+    conn = get_connection()
+    objects = schema_objects(conn)
+
+    database_setup.create_tables()
+    assert get_schema_version(conn) == database_setup.SCHEMA_VERSION
+    assert schema_objects(conn) == objects
+    assert NEW_OBJECTS <= objects
+
+
+def test_new_database_uses_incremental_vacuum(db_path):
+    database_setup.create_tables()
+    assert get_connection().execute("PRAGMA auto_vacuum").fetchone()[0] == 2
+
+
+def test_failed_migration_rolls_back(db_path):
+    def broken(conn):
+        conn.execute("CREATE TABLE parcial (id INTEGER)")
+        raise RuntimeError("fallo simulado")
+
+    conn = get_connection()
+    migrations = [Migration(1, "ok", lambda c: c.execute("CREATE TABLE base (id INTEGER)")),
+                  Migration(2, "falla", broken)]
+    with pytest.raises(RuntimeError):
+        migrate(conn, migrations)
+
+    tables = {name for (name,) in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+    assert get_schema_version(conn) == 1
+    assert tables == {"base"}
+
+    # La siguiente ejecución retoma desde la versión guardada
+    migrations[1] = Migration(2, "corregida", lambda c: c.execute("CREATE TABLE parcial (id INTEGER)"))
+    assert migrate(conn, migrations) == [2]
+    assert get_schema_version(conn) == 2
@@ -6,14 +6,21 @@ sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 from PyQt6.QtWidgets import (
     QApplication, QWidget, QVBoxLayout, QLabel, QPushButton,
     QComboBox, QMessageBox, QHBoxLayout, QGroupBox, QDialog,
-    QLineEdit, QFormLayout
+    QLineEdit, QFormLayout, QCheckBox, QTableWidget, QTableWidgetItem,
+    QHeaderView, QAbstractItemView, QFileDialog
 )
 from PyQt6.QtGui import QFont
-from PyQt6.QtCore import Qt
-
-from auth import get_all_users, delete_user, register_user
-from utils.csv_exporter import export_user_stats_to_csv
-from database_setup import get_user_stats
+from PyQt6.QtCore import Qt, QThreadPool
+
+from auth import delete_user, register_user
+from utils.csv_exporter import export_user_stats_to_csv, export_interactions_to_csv
+from ui.workers import Worker
+from database_setup import get_all_user_stats
+from llm_metrics import get_llm_usage
+from interaction_search import search_interactions, get_departments
+from employee_import import import_employees
+from department_stats import compare_departments, get_department_timeseries
+from utils.scenario_ingest import DIFFICULTY_LEVELS
 
 class RegisterEmployeeDialog(QDialog):
     def __init__(self, parent=None):
@@ -67,11 +74,269 @@ class RegisterEmployeeDialog(QDialog):
         else:
             QMessageBox.warning(self, "Error", result)
 
+class LLMUsageDialog(QDialog):
+    """Latencia, tokens y costo de las llamadas al modelo por día o por departamento."""
+
+    HEADERS = ["Grupo", "Llamadas", "Caché", "Errores", "p50 (ms)", "p95 (ms)", "p99 (ms)",
+               "1er fragmento (ms)", "Tokens entrada", "Tokens salida", "Costo (USD)"]
+    GROUPS = [("Por día", "day"), ("Por departamento", "department")]
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle("Uso del modelo")
+        self.setGeometry(350, 250, 900, 400)
+
+        layout = QVBoxLayout(self)
+        self.group_selector = QComboBox()
+        for label, key in self.GROUPS:
+            self.group_selector.addItem(label, key)
+        self.group_selector.currentIndexChanged.connect(self.load_usage)
+        layout.addWidget(self.group_selector)
+
+        self.table = QTableWidget(0, len(self.HEADERS))
+        self.table.setHorizontalHeaderLabels(self.HEADERS)
+        self.table.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeMode.ResizeToContents)
+        self.table.verticalHeader().setVisible(False)
+        self.table.setEditTriggers(QAbstractItemView.EditTrigger.NoEditTriggers)
+        layout.addWidget(self.table)
+
+        self.load_usage()
+
+    def load_usage(self):
+        rows = get_llm_usage(self.group_selector.currentData())
+        self.table.setSortingEnabled(False)
+        self.table.setRowCount(len(rows))
+        for row, usage in enumerate(rows):
+            values = [
+                usage["group"], usage["calls"], usage["cache_hits"], usage["errors"],
+                usage["p50_ms"], usage["p95_ms"], usage["p99_ms"], usage["avg_ttft_ms"],
+                usage["prompt_tokens"], usage["completion_tokens"], usage["cost_usd"],
+            ]
+            for column, value in enumerate(values):
+                if isinstance(value, float):
+                    value = round(value, 4 if column == len(values) - 1 else 1)
+                item = QTableWidgetItem()
+                item.setData(Qt.ItemDataRole.DisplayRole, value if value is not None else "-")
+                self.table.setItem(row, column, item)
+        self.table.setSortingEnabled(True)
+
+class DepartmentStatsDialog(QDialog):
+    """Comparación de departamentos y su evolución diaria, leída de los resúmenes por departamento."""
+
+    COMPARISON_HEADERS = ["Departamento", "Intentos", "Aciertos", "Aciertos (%)", "Usuarios activos", "Días con actividad"]
+    SERIES_HEADERS = ["Día", "Intentos", "Aciertos", "Aciertos (%)", "Usuarios activos"]
+    PERIODS = [("Últimos 7 días", 7), ("Últimos 30 días", 30), ("Últimos 90 días", 90), ("Todo el historial", None)]
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle("Comparar departamentos")
+        self.setGeometry(350, 200, 800, 600)
+
+        layout = QVBoxLayout(self)
+        filters = QHBoxLayout()
+        self.period_selector = QComboBox()
+        for label, days in self.PERIODS:
+            self.period_selector.addItem(label, days)
+        self.period_selector.setCurrentIndex(1)
+        self.period_selector.currentIndexChanged.connect(self.load_comparison)
+        filters.addWidget(self.period_selector)
+
+        self.difficulty_selector = QComboBox()
+        self.difficulty_selector.addItem("Todas las dificultades", None)
+        for difficulty in DIFFICULTY_LEVELS:
+            self.difficulty_selector.addItem(difficulty, difficulty)
+        self.difficulty_selector.currentIndexChanged.connect(self.load_comparison)
+        filters.addWidget(self.difficulty_selector)
+        layout.addLayout(filters)
+
+        self.comparison_table = self._make_table(self.COMPARISON_HEADERS)
+        self.comparison_table.setSelectionBehavior(QAbstractItemView.SelectionBehavior.SelectRows)
+        self.comparison_table.setSelectionMode(QAbstractItemView.SelectionMode.SingleSelection)
+        self.comparison_table.cellClicked.connect(self.load_series)
+        layout.addWidget(self.comparison_table)
+
+        self.series_label = QLabel("Selecciona un departamento para ver su evolución diaria")
+        layout.addWidget(self.series_label)
+        self.series_table = self._make_table(self.SERIES_HEADERS)
+        layout.addWidget(self.series_table)
+
+        self.load_comparison()
+
+    @staticmethod
+    def _make_table(headers):
+        table = QTableWidget(0, len(headers))
+        table.setHorizontalHeaderLabels(headers)
+        table.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeMode.Stretch)
+        table.verticalHeader().setVisible(False)
+        table.setEditTriggers(QAbstractItemView.EditTrigger.NoEditTriggers)
+        return table
+
+    @staticmethod
+    def _fill_table(table, rows):
+        table.setSortingEnabled(False)
+        table.setRowCount(len(rows))
+        for row, values in enumerate(rows):
+            for column, value in enumerate(values):
+                item = QTableWidgetItem()
+                item.setData(Qt.ItemDataRole.DisplayRole, value)
+                table.setItem(row, column, item)
+        table.setSortingEnabled(True)
+
+    def load_comparison(self):
+        rows = compare_departments(self.period_selector.currentData(), self.difficulty_selector.currentData())
+        self._fill_table(self.comparison_table, [
+            [stats["department"], stats["attempts"], stats["correct"], stats["accuracy"],
+             stats["active_users"], stats["active_days"]]
+            for stats in rows
+        ])
+        if rows:
+            self.comparison_table.selectRow(0)
+            self.load_series(0, 0)
+        else:
+            self.series_label.setText("Sin actividad en el período seleccionado")
+            self.series_table.setRowCount(0)
+
+    def load_series(self, row, column):
+        department = self.comparison_table.item(row, 0).text()
+        rows = get_department_timeseries(
+            department, self.period_selector.currentData(), self.difficulty_selector.currentData()
+        )
+        self.series_label.setText(f"Evolución diaria: {department}")
+        self._fill_table(self.series_table, [
+            [stats["day"], stats["attempts"], stats["correct"], stats["accuracy"], stats["active_users"]]
+            for stats in reversed(rows)
+        ])
+
+class InteractionSearchDialog(QDialog):
+    """Búsqueda de texto completo en las respuestas y la retroalimentación, página por página."""
+
+    HEADERS = ["Fecha", "Usuario", "Departamento", "Escenario", "Respuesta", "Retroalimentación"]
+    ORDERS = [("Más recientes", "recent"), ("Relevancia", "rank")]
+    PAGE_SIZE = 50
+
+    def __init__(self, query="", user_id=None, username=None, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle("Buscar interacciones")
+        self.setGeometry(300, 200, 1000, 550)
+        self.user_id = user_id
+        self.next_cursor = None
+        self.search_worker = None
+
+        layout = QVBoxLayout(self)
+        filters = QHBoxLayout()
+        self.query_input = QLineEdit(query)
+        self.query_input.setPlaceholderText("Palabras a buscar")
+        self.query_input.returnPressed.connect(self.new_search)
+        filters.addWidget(self.query_input, 2)
+
+        self.department_selector = QComboBox()
+        self.department_selector.addItem("Todos los departamentos", None)
+        for department in get_departments():
+            self.department_selector.addItem(department, department)
+        filters.addWidget(self.department_selector)
+
+        self.since_input = QLineEdit()
+        self.since_input.setPlaceholderText("Desde (AAAA-MM-DD)")
+        filters.addWidget(self.since_input)
+        self.until_input = QLineEdit()
+        self.until_input.setPlaceholderText("Hasta (AAAA-MM-DD)")
+        filters.addWidget(self.until_input)
+
+        self.order_selector = QComboBox()
+        for label, key in self.ORDERS:
+            self.order_selector.addItem(label, key)
+        filters.addWidget(self.order_selector)
+        layout.addLayout(filters)
+
+        self.only_user_checkbox = QCheckBox(f"Solo {username}" if username else "Solo el usuario seleccionado")
+        self.only_user_checkbox.setEnabled(user_id is not None)
+        layout.addWidget(self.only_user_checkbox)
+
+        self.table = QTableWidget(0, len(self.HEADERS))
+        self.table.setHorizontalHeaderLabels(self.HEADERS)
+        header = self.table.horizontalHeader()
+        header.setSectionResizeMode(QHeaderView.ResizeMode.ResizeToContents)
+        header.setSectionResizeMode(4, QHeaderView.ResizeMode.Stretch)
+        header.setSectionResizeMode(5, QHeaderView.ResizeMode.Stretch)
+        self.table.verticalHeader().setVisible(False)
+        self.table.setEditTriggers(QAbstractItemView.EditTrigger.NoEditTriggers)
+        self.table.setWordWrap(True)
+        layout.addWidget(self.table)
+
+        buttons = QHBoxLayout()
+        self.status_label = QLabel("")
+        buttons.addWidget(self.status_label, 1)
+        self.search_button = QPushButton("Buscar")
+        self.search_button.clicked.connect(self.new_search)
+        buttons.addWidget(self.search_button)
+        self.more_button = QPushButton("Cargar más")
+        self.more_button.setEnabled(False)
+        self.more_button.clicked.connect(self.load_page)
+        buttons.addWidget(self.more_button)
+        layout.addLayout(buttons)
+
+        if query:
+            self.new_search()
+
+    def new_search(self):
+        self.table.setRowCount(0)
+        self.next_cursor = None
+        self.load_page()
+
+    def load_page(self):
+        """Pide la siguiente página en el pool de hilos para no bloquear la ventana."""
+        if self.search_worker is not None:
+            return
+        worker = Worker(
+            search_interactions,
+            self.query_input.text(),
+            user_id=self.user_id if self.only_user_checkbox.isChecked() else None,
+            department=self.department_selector.currentData(),
+            since=self.since_input.text().strip() or None,
+            until=self.until_input.text().strip() or None,
+            order=self.order_selector.currentData(),
+            limit=self.PAGE_SIZE,
+            cursor=self.next_cursor,
+        )
+        worker.signals.result.connect(self.append_results)
+        worker.signals.error.connect(lambda message: QMessageBox.warning(self, "Error", f"Error al buscar: {message}"))
+        worker.signals.finished.connect(self.on_search_finished)
+        self.search_worker = worker
+        self.search_button.setEnabled(False)
+        self.more_button.setEnabled(False)
+        self.status_label.setText("Buscando...")
+        QThreadPool.globalInstance().start(worker)
+
+    def append_results(self, page):
+        first_row = self.table.rowCount()
+        self.table.setRowCount(first_row + len(page.rows))
+        for offset, result in enumerate(page.rows):
+            values = [
+                result["timestamp"], result["username"], result["department"] or "",
+                result["scenario_id"], result["user_response"], result["chatbot_feedback"],
+            ]
+            for column, value in enumerate(values):
+                item = QTableWidgetItem()
+                item.setData(Qt.ItemDataRole.DisplayRole, value)
+                self.table.setItem(first_row + offset, column, item)
+        self.table.resizeRowsToContents()
+        self.next_cursor = page.next_cursor
+
+    def on_search_finished(self):
+        self.search_worker = None
+        self.search_button.setEnabled(True)
+        self.more_button.setEnabled(self.next_cursor is not None)
+        self.status_label.setText(f"{self.table.rowCount()} resultados" + (" (hay más)" if self.next_cursor else ""))
+
 class AdminWindow(QWidget):
+    TABLE_HEADERS = ["Usuario", "Departamento", "Completados", "Aciertos (%)", "Puntaje", "Última actividad"]
+
     def __init__(self):
         super().__init__()
         self.setWindowTitle("Panel del Administrador")
-        self.setGeometry(300, 200, 500, 450)
+        self.setGeometry(300, 200, 760, 600)
+        # Estadísticas de todos los usuarios, cargadas en una sola consulta
+        self.stats_snapshot = {}
 
         self.setStyleSheet("""
             QWidget {
@@ -113,7 +378,6 @@ class AdminWindow(QWidget):
         layout.addWidget(title)
 
         self.user_selector = QComboBox()
-        self.refresh_user_list()
         self.user_selector.currentIndexChanged.connect(self.display_user_stats)
         layout.addWidget(self.user_selector)
 
@@ -123,7 +387,9 @@ class AdminWindow(QWidget):
         self.accuracy_label = QLabel("Porcentaje de aciertos: ")
         self.last_active_label = QLabel("Última actividad: ")
         self.score_label = QLabel("Puntaje acumulado: ")
+        self.department_label = QLabel("Departamento: ")
 
+        stats_layout.addWidget(self.department_label)
         stats_layout.addWidget(self.completed_label)
         stats_layout.addWidget(self.accuracy_label)
         stats_layout.addWidget(self.last_active_label)
@@ -131,12 +397,42 @@ class AdminWindow(QWidget):
         self.stats_box.setLayout(stats_layout)
         layout.addWidget(self.stats_box)
 
+        # Tabla con todos los usuarios, ordenable por columna
+        self.stats_table = QTableWidget(0, len(self.TABLE_HEADERS))
+        self.stats_table.setHorizontalHeaderLabels(self.TABLE_HEADERS)
+        self.stats_table.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeMode.Stretch)
+        self.stats_table.verticalHeader().setVisible(False)
+        self.stats_table.setEditTriggers(QAbstractItemView.EditTrigger.NoEditTriggers)
+        self.stats_table.setSelectionBehavior(QAbstractItemView.SelectionBehavior.SelectRows)
+        self.stats_table.setSelectionMode(QAbstractItemView.SelectionMode.SingleSelection)
+        self.stats_table.cellClicked.connect(self.select_user_from_table)
+        layout.addWidget(self.stats_table)
+
+        # Búsqueda de texto completo en las interacciones
+        search_layout = QHBoxLayout()
+        self.search_input = QLineEdit()
+        self.search_input.setPlaceholderText("Buscar en las respuestas y la retroalimentación...")
+        self.search_input.returnPressed.connect(self.open_search_dialog)
+        search_layout.addWidget(self.search_input)
+        self.search_button = QPushButton("Buscar")
+        self.search_button.clicked.connect(self.open_search_dialog)
+        search_layout.addWidget(self.search_button)
+        layout.addLayout(search_layout)
+
         buttons_layout = QHBoxLayout()
 
+        self.refresh_button = QPushButton("Actualizar")
+        self.refresh_button.clicked.connect(self.refresh_user_list)
+        buttons_layout.addWidget(self.refresh_button)
+
         self.add_button = QPushButton("Agregar empleado")
         self.add_button.clicked.connect(self.open_register_dialog)
         buttons_layout.addWidget(self.add_button)
 
+        self.import_button = QPushButton("Importar empleados")
+        self.import_button.clicked.connect(self.import_employees_file)
+        buttons_layout.addWidget(self.import_button)
+
         self.export_button = QPushButton("Exportar CSV")
         self.export_button.clicked.connect(self.export_csv)
         buttons_layout.addWidget(self.export_button)
@@ -145,38 +441,188 @@ class AdminWindow(QWidget):
         self.delete_button.clicked.connect(self.confirm_delete)
         buttons_layout.addWidget(self.delete_button)
 
+        self.usage_button = QPushButton("Uso del modelo")
+        self.usage_button.clicked.connect(self.open_usage_dialog)
+        buttons_layout.addWidget(self.usage_button)
+
+        self.departments_button = QPushButton("Comparar departamentos")
+        self.departments_button.clicked.connect(self.open_departments_dialog)
+        buttons_layout.addWidget(self.departments_button)
+
         layout.addLayout(buttons_layout)
+
+        # Exportaciones en segundo plano
+        export_layout = QHBoxLayout()
+
+        self.export_new_button = QPushButton("Exportar interacciones nuevas")
+        self.export_new_button.clicked.connect(self.export_new_interactions)
+        export_layout.addWidget(self.export_new_button)
+
+        self.gzip_checkbox = QCheckBox("Comprimir (gzip)")
+        export_layout.addWidget(self.gzip_checkbox)
+
+        layout.addLayout(export_layout)
+
+        self.export_status = QLabel("")
+        layout.addWidget(self.export_status)
+
+        self.export_worker = None
+        self.import_worker = None
+        self.delete_worker = None
         self.setLayout(layout)
 
-        if self.user_selector.count() > 0:
-            self.display_user_stats()
+        self.refresh_user_list()
 
     def refresh_user_list(self):
+        """Recarga el resumen de todos los usuarios y rellena el selector y la tabla."""
+        current = self.user_selector.currentData()
+        self.stats_snapshot = get_all_user_stats()
+
+        self.user_selector.blockSignals(True)
         self.user_selector.clear()
-        users = get_all_users()
-        for user in users:
-            self.user_selector.addItem(user[1], user[0])
+        for user_id, stats in self.stats_snapshot.items():
+            self.user_selector.addItem(stats["username"], user_id)
+        index = self.user_selector.findData(current)
+        self.user_selector.setCurrentIndex(index if index >= 0 else 0)
+        self.user_selector.blockSignals(False)
+
+        self.fill_stats_table()
+        self.display_user_stats()
+
+    def fill_stats_table(self):
+        table = self.stats_table
+        # Desactivar el orden mientras se rellena para que las filas no se reordenen a medias
+        table.setSortingEnabled(False)
+        table.setRowCount(len(self.stats_snapshot))
+        for row, (user_id, stats) in enumerate(self.stats_snapshot.items()):
+            values = [
+                stats["username"],
+                stats["department"] or "",
+                stats["completed"],
+                stats["accuracy"],
+                stats["score"],
+                stats["last_active"] or "",
+            ]
+            for column, value in enumerate(values):
+                item = QTableWidgetItem()
+                # Guardar números como tales para que el orden sea numérico
+                item.setData(Qt.ItemDataRole.DisplayRole, value)
+                item.setData(Qt.ItemDataRole.UserRole, user_id)
+                table.setItem(row, column, item)
+        table.setSortingEnabled(True)
+
+    def select_user_from_table(self, row, column):
+        user_id = self.stats_table.item(row, column).data(Qt.ItemDataRole.UserRole)
+        index = self.user_selector.findData(user_id)
+        if index >= 0:
+            self.user_selector.setCurrentIndex(index)
 
     def display_user_stats(self):
-        user_id = self.user_selector.currentData()
-        if user_id:
-            stats = get_user_stats(user_id)
-            if stats:
-                self.completed_label.setText(f"Escenarios completados: {stats['completed']}")
-                self.accuracy_label.setText(f"Porcentaje de aciertos: {stats['accuracy']}%")
-                self.last_active_label.setText(f"Última actividad: {stats['last_active']}")
-                self.score_label.setText(f"Puntaje acumulado: {stats['score']}")
-            else:
-                self.completed_label.setText("No hay datos disponibles para este usuario.")
+        stats = self.stats_snapshot.get(self.user_selector.currentData())
+        if stats is None:
+            return
+        self.department_label.setText(f"Departamento: {stats['department'] or '-'}")
+        if stats["total"]:
+            self.completed_label.setText(f"Escenarios completados: {stats['completed']}")
+            self.accuracy_label.setText(f"Porcentaje de aciertos: {stats['accuracy']}%")
+            self.last_active_label.setText(f"Última actividad: {stats['last_active']}")
+            self.score_label.setText(f"Puntaje acumulado: {stats['score']}")
+        else:
+            self.completed_label.setText("No hay datos disponibles para este usuario.")
+            self.accuracy_label.setText("Porcentaje de aciertos: ")
+            self.last_active_label.setText("Última actividad: ")
+            self.score_label.setText("Puntaje acumulado: ")
 
     def open_register_dialog(self):
         dialog = RegisterEmployeeDialog(self)
         if dialog.exec():
             self.refresh_user_list()
 
+    def import_employees_file(self):
+        """Importa un CSV/JSONL de empleados en el pool de hilos y muestra el reporte."""
+        path, _ = QFileDialog.getOpenFileName(
+            self, "Importar empleados", "", "Empleados (*.csv *.jsonl *.ndjson)"
+        )
+        if not path:
+            return
+        worker = Worker(import_employees, path)
+        worker.kwargs["progress"] = worker.report_progress
+        worker.signals.progress.connect(lambda rows: self.export_status.setText(f"Importando... {rows} filas"))
+        worker.signals.result.connect(self.on_import_done)
+        worker.signals.error.connect(lambda message: QMessageBox.warning(self, "Error", f"Error al importar: {message}"))
+        worker.signals.finished.connect(self.on_import_finished)
+        self.import_worker = worker
+        self.import_button.setEnabled(False)
+        self.export_status.setText("Importando...")
+        QThreadPool.globalInstance().start(worker)
+
+    def on_import_done(self, report):
+        box = QMessageBox(self)
+        box.setWindowTitle("Importar empleados")
+        box.setText(f"Empleados importados: {report.imported}. Filas con errores: {len(report.errors)}.")
+        if report.errors:
+            box.setDetailedText("\n".join(
+                f"Línea {line_number} ({username or '-'}): {error}" for line_number, username, error in report.errors
+            ))
+        box.exec()
+        self.refresh_user_list()
+
+    def on_import_finished(self):
+        self.import_worker = None
+        self.import_button.setEnabled(True)
+        self.export_status.setText("")
+
+    def open_usage_dialog(self):
+        LLMUsageDialog(self).exec()
+
+    def open_departments_dialog(self):
+        DepartmentStatsDialog(self).exec()
+
+    def open_search_dialog(self):
+        InteractionSearchDialog(
+            self.search_input.text().strip(),
+            user_id=self.user_selector.currentData(),
+            username=self.user_selector.currentText(),
+            parent=self,
+        ).exec()
+
     def export_csv(self):
-        export_user_stats_to_csv()
-        QMessageBox.information(self, "Éxito", "Datos exportados correctamente.")
+        self.start_export(export_user_stats_to_csv, compress=self.gzip_checkbox.isChecked())
+
+    def export_new_interactions(self):
+        self.start_export(export_interactions_to_csv, incremental=True, compress=self.gzip_checkbox.isChecked())
+
+    def start_export(self, export_fn, **kwargs):
+        """Ejecuta una exportación en el pool de hilos, informando el avance."""
+        if self.export_worker is not None:
+            return
+        worker = Worker(export_fn, **kwargs)
+        worker.kwargs["progress"] = worker.report_progress
+        worker.signals.progress.connect(lambda rows: self.export_status.setText(f"Exportando... {rows} filas"))
+        worker.signals.result.connect(self.on_export_done)
+        worker.signals.error.connect(self.on_export_error)
+        worker.signals.finished.connect(self.on_export_finished)
+        self.export_worker = worker
+        self.export_button.setEnabled(False)
+        self.export_new_button.setEnabled(False)
+        self.export_status.setText("Exportando...")
+        QThreadPool.globalInstance().start(worker)
+
+    def on_export_done(self, result):
+        filename = result[0] if isinstance(result, tuple) else result
+        if filename is None:
+            QMessageBox.information(self, "Exportar", "No hay interacciones nuevas para exportar.")
+        else:
+            QMessageBox.information(self, "Éxito", f"Datos exportados correctamente en {filename}.")
+
+    def on_export_error(self, message):
+        QMessageBox.warning(self, "Error", f"Error al exportar CSV: {message}")
+
+    def on_export_finished(self):
+        self.export_worker = None
+        self.export_status.setText("")
+        self.export_button.setEnabled(True)
+        self.export_new_button.setEnabled(True)
 
     def confirm_delete(self):
         user_id = self.user_selector.currentData()
@@ -189,9 +635,30 @@ class AdminWindow(QWidget):
                 QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No
             )
             if confirm == QMessageBox.StandardButton.Yes:
-                delete_user(user_id)
-                QMessageBox.information(self, "Usuario eliminado", f"'{username}' ha sido eliminado.")
-                self.refresh_user_list()
+                self.start_delete(user_id, username)
+
+    def start_delete(self, user_id, username):
+        """Elimina al usuario en el pool de hilos: quitarlo del archivo frío reescribe segmentos."""
+        worker = Worker(delete_user, user_id)
+        worker.signals.result.connect(lambda deleted: self.on_delete_done(username, deleted))
+        worker.signals.error.connect(lambda message: QMessageBox.warning(self, "Error", f"Error al eliminar: {message}"))
+        worker.signals.finished.connect(self.on_delete_finished)
+        self.delete_worker = worker
+        self.delete_button.setEnabled(False)
+        self.export_status.setText(f"Eliminando a '{username}'...")
+        QThreadPool.globalInstance().start(worker)
+
+    def on_delete_done(self, username, deleted):
+        if deleted:
+            QMessageBox.information(self, "Usuario eliminado", f"'{username}' ha sido eliminado.")
+        else:
+            QMessageBox.warning(self, "Error", f"No se encontró al usuario '{username}'.")
+
+    def on_delete_finished(self):
+        self.delete_worker = None
+        self.delete_button.setEnabled(True)
+        self.export_status.setText("")
+        self.refresh_user_list()
 
 if __name__ == "__main__":
     app = QApplication(sys.argv)
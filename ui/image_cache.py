@@ -0,0 +1,114 @@
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+
+from PyQt6.QtCore import Qt
+from PyQt6.QtGui import QImage, QPixmap
+
+from config import BASE_DIR
+
+# Miniaturas ya escaladas, una por contenido de imagen y ancho
+THUMBNAIL_DIR = os.path.join(BASE_DIR, "data", "thumbnails")
+
+
+def resolve_image_path(path):
+    """Resuelve rutas relativas a la raíz del proyecto, como las guardadas en phishing_scenarios."""
+    if not path or os.path.isabs(path) or os.path.exists(path):
+        return path
+    return os.path.join(BASE_DIR, path)
+
+
+class ScenarioImageCache:
+    """Caché de imágenes de escenarios en dos niveles.
+
+    En disco guarda miniaturas pre-escaladas con nombre `<hash del contenido>_<ancho>.png`,
+    de modo que una imagen solo se decodifica y escala a tamaño completo una vez.
+    En memoria mantiene un LRU de QPixmap listos para mostrar.
+
+    load_image() trabaja con QImage y puede llamarse desde cualquier hilo;
+    pixmap() y store() deben usarse en el hilo de la interfaz.
+    """
+
+    def __init__(self, max_entries=16, thumbnail_dir=THUMBNAIL_DIR):
+        self.max_entries = max_entries
+        self.thumbnail_dir = thumbnail_dir
+        self._pixmaps = OrderedDict()
+        self._hashes = {}
+        self._lock = threading.Lock()
+
+    def content_hash(self, path) -> str:
+        """Hash del contenido del archivo, recalculado solo si cambia su tamaño o fecha."""
+        stat = os.stat(path)
+        signature = (stat.st_mtime_ns, stat.st_size)
+        with self._lock:
+            cached = self._hashes.get(path)
+        if cached and cached[0] == signature:
+            return cached[1]
+
+        digest = hashlib.sha1()
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(65536), b""):
+                digest.update(block)
+        value = digest.hexdigest()
+        with self._lock:
+            self._hashes[path] = (signature, value)
+        return value
+
+    def thumbnail_path(self, path, width) -> str:
+        return os.path.join(self.thumbnail_dir, f"{self.content_hash(path)}_{width}.png")
+
+    def load_image(self, path, width) -> QImage:
+        """Devuelve la imagen escalada a `width`, generando la miniatura en disco si falta."""
+        path = resolve_image_path(path)
+        if not path or not os.path.exists(path):
+            return QImage()
+
+        thumb = self.thumbnail_path(path, width)
+        if os.path.exists(thumb):
+            image = QImage(thumb)
+            if not image.isNull():
+                return image
+
+        image = QImage(path)
+        if image.isNull():
+            return image
+        image = image.scaledToWidth(width, Qt.TransformationMode.SmoothTransformation)
+        os.makedirs(self.thumbnail_dir, exist_ok=True)
+        # Escribir a un temporal y renombrar para no dejar miniaturas a medias
+        tmp_path = f"{thumb}.{threading.get_ident()}.tmp"
+        if image.save(tmp_path, "PNG"):
+            os.replace(tmp_path, thumb)
+        return image
+
+    def cached_keys(self) -> frozenset:
+        """Claves (ruta, ancho) en memoria; permite a los workers omitir decodificaciones."""
+        return frozenset(self._pixmaps)
+
+    def cached_pixmap(self, path, width):
+        """QPixmap en memoria o None, sin tocar el disco."""
+        key = (path, width)
+        pixmap = self._pixmaps.get(key)
+        if pixmap is not None:
+            self._pixmaps.move_to_end(key)
+        return pixmap
+
+    def store(self, path, width, image: QImage) -> QPixmap:
+        """Convierte una imagen cargada en segundo plano y la guarda en el LRU."""
+        pixmap = QPixmap.fromImage(image)
+        self._pixmaps[(path, width)] = pixmap
+        self._pixmaps.move_to_end((path, width))
+        while len(self._pixmaps) > self.max_entries:
+            self._pixmaps.popitem(last=False)
+        return pixmap
+
+    def pixmap(self, path, width) -> QPixmap:
+        """QPixmap listo para mostrar; si no está en memoria lo carga en este hilo."""
+        pixmap = self.cached_pixmap(path, width)
+        if pixmap is None:
+            pixmap = self.store(path, width, self.load_image(path, width))
+        return pixmap
+
+
+# Caché compartida por las ventanas de chat
+scenario_images = ScenarioImageCache()
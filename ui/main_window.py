@@ -7,41 +7,55 @@ from PyQt6.QtWidgets import (
     QApplication, QWidget, QLabel, QPushButton,
     QVBoxLayout, QHBoxLayout, QTextEdit, QLineEdit, QMessageBox, QScrollArea
 )
-from PyQt6.QtGui import QPixmap, QFont
-from PyQt6.QtCore import Qt
+from PyQt6.QtGui import QFont, QTextCursor, QTextCharFormat
+from PyQt6.QtCore import Qt, QThreadPool
+from collections import deque
 
 from chatbot import get_chatbot_response, get_new_scenario
 from auth import get_user_id
+from database_setup import create_scenario_deck
+from ui.workers import Worker
+from ui.image_cache import scenario_images
 
 # ----- Configuración base -----
 COLOR_PRIMARY = "#47436B"
 TEXT_COLOR = "#FFFFFF"
 MAX_INTERACTIONS_PER_SCENARIO = 3
+SCENARIO_IMAGE_WIDTH = 600
 
 class ChatWindow(QWidget):
     def __init__(self, username):
         super().__init__()
         self.username = username
-        self.user_id = get_user_id(username)
+        self.user_id = None
         self.interaction_count = 0
-        self.scenario = get_new_scenario()
+        self.scenario = None
+        # Escenarios de la sesión, sin repeticiones
+        self.scenario_deck = create_scenario_deck()
+        # Trabajo en segundo plano: solicitud activa y mensajes en espera
+        self.thread_pool = QThreadPool.globalInstance()
+        self.current_worker = None
+        self.scenario_worker = None
+        self.prefetch_worker = None
+        self.pending_messages = deque()
+        # Posición en el documento donde comienza la respuesta en streaming
+        self.stream_position = None
         self.init_ui()
+        self.load_session()
 
     def init_ui(self):
         self.setWindowTitle("Chat de Capacitación en Phishing")
         self.setStyleSheet(f"background-color: {COLOR_PRIMARY}; color: {TEXT_COLOR};")
         self.setMinimumSize(850, 650)
 
-        # Escenario
-        self.scenario_label = QLabel(self.scenario['text'])
+        # Escenario (se completa cuando termina la carga en segundo plano)
+        self.scenario_label = QLabel("Cargando escenario...")
         self.scenario_label.setWordWrap(True)
         self.scenario_label.setFont(QFont("Arial", 12, QFont.Weight.Bold))
         self.scenario_label.setStyleSheet("margin-bottom: 10px;")
 
         # Imagen del escenario
         self.image_label = QLabel()
-        pixmap = QPixmap(self.scenario['image'])
-        self.image_label.setPixmap(pixmap.scaledToWidth(600, Qt.TransformationMode.SmoothTransformation))
         self.image_label.setAlignment(Qt.AlignmentFlag.AlignCenter)
 
         # Área de conversación
@@ -58,47 +72,240 @@ class ChatWindow(QWidget):
         self.send_button = QPushButton("Enviar")
         self.send_button.clicked.connect(self.handle_send)
 
+        # Botón para cancelar la solicitud en curso
+        self.cancel_button = QPushButton("Cancelar")
+        self.cancel_button.setEnabled(False)
+        self.cancel_button.clicked.connect(self.cancel_request)
+
+        # Indicador de solicitud pendiente
+        self.status_label = QLabel("")
+        self.status_label.setStyleSheet("font-style: italic;")
+
         # Layouts
         main_layout = QVBoxLayout()
         main_layout.addWidget(self.scenario_label)
         main_layout.addWidget(self.image_label)
         main_layout.addWidget(self.chat_area)
+        main_layout.addWidget(self.status_label)
 
         input_layout = QHBoxLayout()
         input_layout.addWidget(self.input_line)
         input_layout.addWidget(self.send_button)
+        input_layout.addWidget(self.cancel_button)
 
         main_layout.addLayout(input_layout)
         self.setLayout(main_layout)
 
+    def load_session(self):
+        """Obtiene el ID del usuario y el primer escenario sin bloquear la interfaz."""
+        self.set_input_enabled(False)
+
+        cached_images = scenario_images.cached_keys()
+
+        def fetch():
+            user_id = get_user_id(self.username)
+            scenario = get_new_scenario(self.scenario_deck, user_id)
+            return user_id, scenario, self.fetch_image(scenario, cached_images)
+
+        worker = Worker(fetch)
+        worker.signals.result.connect(self.on_session_loaded)
+        worker.signals.error.connect(self.on_worker_error)
+        self.scenario_worker = worker
+        self.thread_pool.start(worker)
+
+    def on_session_loaded(self, result):
+        self.user_id, scenario, image = result
+        self.show_scenario(scenario, image)
+
+    @staticmethod
+    def fetch_image(scenario, cached_images):
+        """Decodifica la imagen del escenario en segundo plano si no está ya en memoria."""
+        if not scenario or (scenario['image'], SCENARIO_IMAGE_WIDTH) in cached_images:
+            return None
+        return scenario_images.load_image(scenario['image'], SCENARIO_IMAGE_WIDTH)
+
     def handle_send(self):
         user_text = self.input_line.text().strip()
-        if not user_text:
+        if not user_text or not self.scenario:
             return
 
         self.chat_area.append(f"<b>Tú:</b> {user_text}")
         self.input_line.clear()
 
-        # Obtener respuesta del chatbot
-        bot_response = get_chatbot_response(self.user_id, self.scenario, user_text)
-        self.chat_area.append(f"<b>Chatbot:</b> {bot_response}")
+        # Si hay una solicitud en curso, la respuesta queda en cola
+        if self.current_worker is not None:
+            self.pending_messages.append(user_text)
+            self.update_status()
+            return
+
+        self.dispatch(user_text)
+
+    def dispatch(self, user_text):
+        """Envía el mensaje al chatbot en un hilo del pool."""
+        worker = Worker(get_chatbot_response, self.user_id, self.scenario, user_text)
+        worker.kwargs["on_delta"] = worker.report_progress
+        worker.kwargs["check_cancelled"] = worker.check_cancelled
+        worker.signals.progress.connect(lambda delta, w=worker: self.on_delta(w, delta))
+        worker.signals.result.connect(lambda response, w=worker: self.on_response(w, response))
+        worker.signals.error.connect(self.on_worker_error)
+        worker.signals.finished.connect(lambda w=worker: self.on_request_finished(w))
+        self.current_worker = worker
+        self.cancel_button.setEnabled(True)
+        self.update_status()
+        self.thread_pool.start(worker)
+
+    def on_delta(self, worker, delta):
+        """Agrega un fragmento de la respuesta en streaming al final del chat."""
+        if worker is not self.current_worker or worker.cancelled:
+            return
+
+        if self.stream_position is None:
+            self.chat_area.append("<b>Chatbot:</b> ")
+            self.stream_position = self.chat_area.document().lastBlock().position()
+
+        cursor = self.chat_area.textCursor()
+        cursor.movePosition(QTextCursor.MoveOperation.End)
+        cursor.insertText(delta, QTextCharFormat())
+        self.chat_area.setTextCursor(cursor)
+        self.chat_area.ensureCursorVisible()
+
+    def on_response(self, worker, bot_response):
+        if worker is not self.current_worker or worker.cancelled:
+            return
+
+        if self.stream_position is None:
+            self.chat_area.append(f"<b>Chatbot:</b> {bot_response}")
+        else:
+            # Reemplazar el texto transmitido por la respuesta final procesada
+            cursor = QTextCursor(self.chat_area.document())
+            cursor.setPosition(self.stream_position)
+            cursor.movePosition(QTextCursor.MoveOperation.End, QTextCursor.MoveMode.KeepAnchor)
+            cursor.removeSelectedText()
+            cursor.insertHtml(f"<b>Chatbot:</b> {bot_response}")
+            self.stream_position = None
 
         self.interaction_count += 1
         if self.interaction_count >= MAX_INTERACTIONS_PER_SCENARIO or "Has completado este escenario" in bot_response:
             self.load_new_scenario()
 
+    def on_request_finished(self, worker):
+        if worker is not self.current_worker:
+            return
+        self.current_worker = None
+        self.stream_position = None
+        self.cancel_button.setEnabled(False)
+        self.dispatch_next()
+
+    def dispatch_next(self):
+        """Envía el siguiente mensaje en cola, si lo hay."""
+        if self.pending_messages and self.scenario and self.current_worker is None:
+            self.dispatch(self.pending_messages.popleft())
+        else:
+            self.update_status()
+
+    def cancel_request(self):
+        """Cancela la solicitud en curso y descarta su respuesta."""
+        if self.current_worker is None or self.current_worker.cancelled:
+            return
+        self.current_worker.cancel()
+        self.stream_position = None
+        self.cancel_button.setEnabled(False)
+        self.chat_area.append("<i>Solicitud cancelada.</i>")
+        # El trabajo sigue hasta su próximo punto de control; la siguiente respuesta
+        # en cola se envía cuando termine (on_request_finished), nunca en paralelo
+        self.update_status()
+
+    def on_worker_error(self, message):
+        self.chat_area.append(f"<i>Error inesperado: {message}</i>")
+
+    def update_status(self):
+        if self.current_worker is None:
+            self.status_label.setText("")
+            return
+        text = "⏳ Cancelando la solicitud..." if self.current_worker.cancelled else "⏳ El chatbot está respondiendo..."
+        if self.pending_messages:
+            text += f" ({len(self.pending_messages)} en cola)"
+        self.status_label.setText(text)
+
+    def set_input_enabled(self, enabled):
+        self.input_line.setEnabled(enabled)
+        self.send_button.setEnabled(enabled)
+
     def load_new_scenario(self):
         self.interaction_count = 0
-        self.scenario = get_new_scenario()
+        self.scenario = None
+        self.set_input_enabled(False)
+
+        # Las respuestas en cola pertenecían al escenario anterior
+        if self.pending_messages:
+            self.pending_messages.clear()
+            self.chat_area.append("<i>Se descartaron las respuestas en cola del escenario anterior.</i>")
+
+        cached_images = scenario_images.cached_keys()
+
+        user_id = self.user_id
+
+        def fetch():
+            scenario = get_new_scenario(self.scenario_deck, user_id)
+            return scenario, self.fetch_image(scenario, cached_images)
+
+        worker = Worker(fetch)
+        worker.signals.result.connect(self.on_new_scenario)
+        worker.signals.error.connect(self.on_worker_error)
+        self.scenario_worker = worker
+        self.thread_pool.start(worker)
+
+    def on_new_scenario(self, result):
+        if self.show_scenario(*result):
+            self.chat_area.append("<i>Nuevo escenario cargado.</i>")
+
+    def show_scenario(self, scenario, image=None):
+        """Muestra el escenario recibido. Retorna False si no hay escenarios."""
+        self.scenario = scenario
         if not self.scenario:
             QMessageBox.information(self, "Fin", "No hay más escenarios disponibles.")
             self.close()
-            return
+            return False
 
         self.scenario_label.setText(self.scenario['text'])
-        pixmap = QPixmap(self.scenario['image'])
-        self.image_label.setPixmap(pixmap.scaledToWidth(600, Qt.TransformationMode.SmoothTransformation))
-        self.chat_area.append("<i>Nuevo escenario cargado.</i>")
+        path = self.scenario['image']
+        pixmap = scenario_images.cached_pixmap(path, SCENARIO_IMAGE_WIDTH)
+        if pixmap is None:
+            if image is None:
+                # Caso raro: la imagen salió del LRU entre el envío y la respuesta del worker
+                pixmap = scenario_images.pixmap(path, SCENARIO_IMAGE_WIDTH)
+            else:
+                pixmap = scenario_images.store(path, SCENARIO_IMAGE_WIDTH, image)
+        self.image_label.setPixmap(pixmap)
+        self.set_input_enabled(True)
+        self.prefetch_next_image()
+        return True
+
+    def prefetch_next_image(self):
+        """Decodifica en segundo plano la imagen del próximo escenario de la sesión."""
+        def fetch():
+            scenario = self.scenario_deck.peek()
+            if not scenario:
+                return None
+            return scenario['image'], scenario_images.load_image(scenario['image'], SCENARIO_IMAGE_WIDTH)
+
+        worker = Worker(fetch)
+        worker.signals.result.connect(self.on_image_prefetched)
+        self.prefetch_worker = worker
+        self.thread_pool.start(worker)
+
+    def on_image_prefetched(self, result):
+        if result is None:
+            return
+        path, image = result
+        if not image.isNull() and scenario_images.cached_pixmap(path, SCENARIO_IMAGE_WIDTH) is None:
+            scenario_images.store(path, SCENARIO_IMAGE_WIDTH, image)
+
+    def closeEvent(self, event):
+        if self.current_worker is not None:
+            self.current_worker.cancel()
+        self.pending_messages.clear()
+        super().closeEvent(event)
 
 # ----------- Ejecución -----------
 if __name__ == "__main__":
@@ -0,0 +1,63 @@
+import threading
+
+from PyQt6.QtCore import QObject, QRunnable, pyqtSignal, pyqtSlot
+
+
+class WorkerCancelled(Exception):
+    """Se lanza dentro del trabajo cuando el usuario lo canceló."""
+
+
+class WorkerSignals(QObject):
+    """Señales que un Worker emite hacia el hilo de la interfaz."""
+    result = pyqtSignal(object)
+    error = pyqtSignal(str)
+    progress = pyqtSignal(object)
+    finished = pyqtSignal()
+
+
+class Worker(QRunnable):
+    """Ejecuta una función en el pool de hilos de Qt y entrega el resultado por señales.
+
+    La cancelación es cooperativa: la función sigue ejecutándose, pero el
+    resultado se descarta y no se emite ninguna señal de resultado o error.
+    """
+
+    def __init__(self, fn, *args, **kwargs):
+        super().__init__()
+        self.fn = fn
+        self.args = args
+        self.kwargs = kwargs
+        self.signals = WorkerSignals()
+        self._cancelled = threading.Event()
+
+    def cancel(self):
+        """Marca el trabajo como cancelado."""
+        self._cancelled.set()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancelled.is_set()
+
+    def check_cancelled(self):
+        """Interrumpe el trabajo si fue cancelado."""
+        if self.cancelled:
+            raise WorkerCancelled()
+
+    def report_progress(self, value):
+        """Emite un avance parcial. Interrumpe el trabajo si fue cancelado."""
+        self.check_cancelled()
+        self.signals.progress.emit(value)
+
+    @pyqtSlot()
+    def run(self):
+        try:
+            result = self.fn(*self.args, **self.kwargs)
+        except Exception as e:
+            if not self.cancelled:
+                self.signals.error.emit(str(e))
+        else:
+            if not self.cancelled:
+                self.signals.result.emit(result)
+        finally:
+            self.signals.finished.emit()
+
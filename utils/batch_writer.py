@@ -0,0 +1,194 @@
+import logging
+import queue
+import sqlite3
+import threading
+import time
+
+from utils.db import get_connection, close_connection
+
+logger = logging.getLogger(__name__)
+
+_ROW = "row"
+_FLUSH = "flush"
+_STOP = "stop"
+
+# Espera máxima entre reintentos de un lote bloqueado
+MAX_RETRY_BACKOFF = 2.0
+# Cada cuánto se comprueba que el hilo siga vivo mientras se espera un flush
+_WAIT_POLL_SECONDS = 0.1
+
+
+def is_transient_error(error) -> bool:
+    """True si el error se debe a que otra conexión tiene la base bloqueada."""
+    message = str(error).lower()
+    return isinstance(error, sqlite3.OperationalError) and ("locked" in message or "busy" in message)
+
+
+class BatchWriter:
+    """Escritor en segundo plano que agrupa inserciones en commits por lotes.
+
+    Las filas se encolan con submit() y un hilo dedicado las confirma con
+    executemany cuando se juntan `batch_size` filas o pasan `flush_interval_ms`
+    desde la primera fila pendiente. Si la cola está llena, submit() bloquea
+    al productor (contrapresión) hasta `put_timeout` segundos.
+
+    Si la base está bloqueada, el lote completo se conserva y se reintenta con
+    espera creciente; solo se descartan filas que fallan por sí mismas (por
+    ejemplo, una clave foránea inválida).
+    """
+
+    def __init__(self, sql, batch_size=50, flush_interval_ms=200, max_queue=1000, put_timeout=5.0,
+                 name="batch-writer", max_retries=5, retry_backoff=0.1):
+        self.sql = sql
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval_ms / 1000.0
+        self.put_timeout = put_timeout
+        self.name = name
+        self.max_retries = max_retries
+        self.retry_backoff = retry_backoff
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._thread = None
+        self._lock = threading.Lock()
+        self._closed = False
+
+    def _ensure_started(self):
+        with self._lock:
+            if self._closed:
+                raise RuntimeError(f"{self.name} ya fue cerrado.")
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+                self._thread.start()
+            elif not self._thread.is_alive():
+                raise RuntimeError(f"El hilo de {self.name} se detuvo; las filas no se pueden guardar.")
+
+    def submit(self, params):
+        """Encola una fila para insertarla en el próximo lote."""
+        self._ensure_started()
+        try:
+            self._queue.put((_ROW, params), timeout=self.put_timeout)
+        except queue.Full:
+            raise RuntimeError("La cola de escritura está llena; la base de datos no responde.") from None
+
+    def _wait(self, done, timeout) -> bool:
+        """Espera el evento sin colgarse si el hilo del escritor terminó."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while not done.wait(_WAIT_POLL_SECONDS if deadline is None
+                            else max(0.0, min(_WAIT_POLL_SECONDS, deadline - time.monotonic()))):
+            if not self._thread.is_alive():
+                logger.error("%s: el hilo terminó con filas pendientes sin guardar.", self.name)
+                return False
+            if deadline is not None and time.monotonic() >= deadline:
+                return False
+        return True
+
+    def flush(self, timeout=None) -> bool:
+        """Confirma todas las filas encoladas hasta ahora. Retorna False si se agotó el tiempo o falló."""
+        if self._thread is None or self._closed:
+            return True
+        done = threading.Event()
+        try:
+            self._queue.put((_FLUSH, done), timeout=timeout)
+        except queue.Full:
+            return False
+        return self._wait(done, timeout)
+
+    def close(self, timeout=None) -> bool:
+        """Confirma lo pendiente, hace checkpoint del WAL y detiene el hilo."""
+        with self._lock:
+            if self._closed:
+                return True
+            self._closed = True
+            thread = self._thread
+        if thread is None:
+            return True
+        if not thread.is_alive():
+            logger.error("%s: el hilo ya había terminado; no se pudo confirmar lo pendiente.", self.name)
+            return False
+        done = threading.Event()
+        try:
+            self._queue.put((_STOP, done), timeout=timeout)
+        except queue.Full:
+            return False
+        ok = self._wait(done, timeout)
+        thread.join(timeout)
+        return ok
+
+    def _write(self, conn, batch) -> bool:
+        """Confirma el lote. Retorna False si la base siguió bloqueada y el lote quedó pendiente."""
+        if not batch:
+            return True
+        for attempt in range(self.max_retries + 1):
+            try:
+                with conn:
+                    conn.executemany(self.sql, batch)
+            except sqlite3.Error as e:
+                if not is_transient_error(e):
+                    break
+                if attempt == self.max_retries:
+                    logger.warning("%s: base bloqueada; %d filas quedan pendientes para reintentar.",
+                                   self.name, len(batch))
+                    return False
+                time.sleep(min(self.retry_backoff * 2 ** attempt, MAX_RETRY_BACKOFF))
+            else:
+                batch.clear()
+                return True
+
+        # Un error propio de alguna fila: guardar una por una y descartar solo las inválidas
+        pending = []
+        for params in batch:
+            try:
+                with conn:
+                    conn.execute(self.sql, params)
+            except sqlite3.Error as e:
+                if is_transient_error(e):
+                    pending.append(params)
+                else:
+                    logger.error("%s: fila descartada %r: %s", self.name, params, e)
+        batch[:] = pending
+        return not pending
+
+    def _run(self):
+        conn = get_connection()
+        batch = []
+        deadline = None
+        # Flush a la espera de que el lote bloqueado se confirme
+        waiters = []
+        try:
+            while True:
+                timeout = None if deadline is None else max(0.0, deadline - time.monotonic())
+                try:
+                    kind, payload = self._queue.get(timeout=timeout)
+                except queue.Empty:
+                    kind, payload = None, None
+
+                if kind == _ROW:
+                    batch.append(payload)
+                    if deadline is None:
+                        deadline = time.monotonic() + self.flush_interval
+                    if len(batch) < self.batch_size:
+                        continue
+                elif kind == _FLUSH:
+                    waiters.append(payload)
+
+                written = self._write(conn, batch)
+                if written:
+                    deadline = None
+                    for waiter in waiters:
+                        waiter.set()
+                    waiters.clear()
+                else:
+                    # Reintentar más tarde sin perder el lote
+                    deadline = time.monotonic() + MAX_RETRY_BACKOFF
+
+                if kind == _STOP:
+                    if not written:
+                        logger.error("%s: %d filas no se pudieron guardar al cerrar (base bloqueada).",
+                                     self.name, len(batch))
+                    conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+                    payload.set()
+                    break
+        except Exception:
+            logger.exception("%s: el hilo de escritura se detuvo por un error inesperado.", self.name)
+            raise
+        finally:
+            close_connection()
@@ -0,0 +1,118 @@
+import math
+import re
+
+# Tokens extra que la API cuenta por cada mensaje (rol y separadores)
+MESSAGE_OVERHEAD_TOKENS = 4
+
+_TOKEN_PATTERN = re.compile(r"\w+|[^\w\s]")
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s")
+_encoding = None
+
+
+def count_tokens(text: str) -> int:
+    """Cuenta tokens localmente, sin llamar a la API.
+
+    Usa tiktoken si está instalado; si no, una estimación conservadora
+    (el mayor entre palabras + signos y caracteres / 4).
+    """
+    global _encoding
+    if not text:
+        return 0
+    if _encoding is None:
+        try:
+            import tiktoken
+            _encoding = tiktoken.get_encoding("cl100k_base")
+        except Exception:
+            _encoding = False
+    if _encoding:
+        return len(_encoding.encode(text))
+    return max(len(_TOKEN_PATTERN.findall(text)), math.ceil(len(text) / 4))
+
+
+def message_tokens(message) -> int:
+    return count_tokens(message["content"]) + MESSAGE_OVERHEAD_TOKENS
+
+
+def summarize_turn(user_input, bot_response, max_chars=160) -> str:
+    """Resumen local de un turno: la respuesta del usuario y la primera oración del bot."""
+    def shorten(text):
+        text = " ".join(text.split())
+        return text if len(text) <= max_chars else text[:max_chars - 1].rstrip() + "…"
+
+    first_sentence = _SENTENCE_END.split(bot_response.strip(), maxsplit=1)[0]
+    return f"- Usuario: {shorten(user_input)} / Asistente: {shorten(first_sentence)}"
+
+
+class ConversationMemory:
+    """Historial de turnos de una sesión (ver utils.session_store) con presupuesto de tokens.
+
+    build_messages() arma el prompt con el mensaje de sistema, los turnos previos
+    más recientes que quepan en `max_tokens` y la nueva respuesta del usuario.
+    Los turnos que ya no caben se descartan o, con `summarize`, se condensan en
+    un resumen acumulado que ocupa como máximo `summary_tokens`.
+    La sesión se recibe ya bloqueada por el SessionStore, que decide cuánto vive.
+    """
+
+    def __init__(self, max_tokens=1200, summarize=True, summary_tokens=200):
+        self.max_tokens = max_tokens
+        self.summarize = summarize
+        self.summary_tokens = summary_tokens
+
+    def build_messages(self, session, system_message, user_input) -> list:
+        """Mensajes para la API dentro del presupuesto de tokens."""
+        system = {"role": "system", "content": system_message}
+        user = {"role": "user", "content": user_input}
+        if not session.turns and not session.summary:
+            return [system, user]
+
+        base_budget = self.max_tokens - message_tokens(system) - message_tokens(user)
+        while True:
+            summary = self._summary_message(session)
+            budget = base_budget - (message_tokens(summary) if summary is not None else 0)
+
+            # Conservar los turnos más recientes que quepan
+            keep = 0
+            for _, _, tokens in reversed(session.turns):
+                if tokens > budget:
+                    break
+                budget -= tokens
+                keep += 1
+
+            dropped = session.turns[:len(session.turns) - keep]
+            if not dropped:
+                break
+            del session.turns[:len(dropped)]
+            if not self.summarize:
+                break
+            # El resumen crece con los turnos descartados; volver a comprobar el presupuesto
+            session.summary.extend(summarize_turn(u, a) for u, a, _ in dropped)
+            self._trim_summary(session)
+
+        messages = [system]
+        if summary is not None:
+            messages.append(summary)
+        for user_text, bot_text, _ in session.turns:
+            messages.append({"role": "user", "content": user_text})
+            messages.append({"role": "assistant", "content": bot_text})
+        messages.append(user)
+        return messages
+
+    def _summary_message(self, session):
+        if not session.summary:
+            return None
+        return {"role": "system", "content": "Resumen de los turnos anteriores:\n" + "\n".join(session.summary)}
+
+    def _trim_summary(self, session):
+        # Un resumen acotado: primero se olvidan las líneas más antiguas
+        while session.summary and count_tokens("\n".join(session.summary)) > self.summary_tokens:
+            session.summary.pop(0)
+
+    def record(self, session, user_input, bot_response):
+        """Agrega un turno completado a la sesión."""
+        tokens = count_tokens(user_input) + count_tokens(bot_response) + 2 * MESSAGE_OVERHEAD_TOKENS
+        session.turns.append((user_input, bot_response, tokens))
+
+    def reset(self, session):
+        """Olvida los turnos y el resumen de la sesión."""
+        session.turns.clear()
+        session.summary.clear()
@@ -1,37 +1,139 @@
-import sqlite3
 import csv
+import gzip
+import itertools
 import os
 from datetime import datetime
 
-from config import DB_PATH
+from utils.db import get_connection
+from utils.interaction_archive import iter_archived_interactions
 
-def export_user_stats_to_csv():
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
+# Filas leídas del cursor por bloque; la memoria usada no depende del total
+EXPORT_CHUNK_SIZE = 500
 
-    cursor.execute('''
-        SELECT 
+
+def open_export_file(path, compress=False):
+    """Abre el archivo de salida como texto, comprimido con gzip si se pide."""
+    if compress:
+        return gzip.open(path, mode="wt", newline="", encoding="utf-8")
+    return open(path, mode="w", newline="", encoding="utf-8")
+
+
+def export_path(prefix, compress=False, export_dir="exports"):
+    """Ruta con marca de tiempo dentro de la carpeta de exportaciones."""
+    os.makedirs(export_dir, exist_ok=True)
+    suffix = ".csv.gz" if compress else ".csv"
+    return os.path.join(export_dir, f"{prefix}_{datetime.now().strftime('%Y%m%d_%H%M%S')}{suffix}")
+
+
+def write_cursor_to_csv(cursor, file_path, headers, compress=False, progress=None, chunk_size=EXPORT_CHUNK_SIZE):
+    """Escribe por bloques las filas del cursor (o de cualquier iterable). Retorna las filas escritas.
+
+    Se escribe a un archivo temporal que se renombra al terminar, para no dejar
+    exportaciones incompletas. progress(filas_escritas) se llama tras cada bloque.
+    """
+    rows_iter = iter(cursor)
+    tmp_path = f"{file_path}.part"
+    written = 0
+    try:
+        with open_export_file(tmp_path, compress) as file:
+            writer = csv.writer(file)
+            writer.writerow(headers)
+            while True:
+                rows = list(itertools.islice(rows_iter, chunk_size))
+                if not rows:
+                    break
+                writer.writerows(rows)
+                written += len(rows)
+                if progress:
+                    progress(written)
+        os.replace(tmp_path, file_path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    return written
+
+
+def export_user_stats_to_csv(compress=False, progress=None, export_dir="exports"):
+    """Exporta el resumen por usuario leyendo los contadores de user_metrics."""
+    conn = get_connection()
+    cursor = conn.execute('''
+        SELECT
             u.username,
-            COUNT(ui.id) as total_respondidos,
-            SUM(CASE WHEN ui.chatbot_feedback LIKE '¡Correcto!%' THEN 1 ELSE 0 END) as respuestas_correctas,
-            ROUND(100.0 * SUM(CASE WHEN ui.chatbot_feedback LIKE '¡Correcto!%' THEN 1 ELSE 0 END) / COUNT(ui.id), 2) as porcentaje_aciertos
+            COALESCE(m.total_attempts, 0) as total_respondidos,
+            m.correct_attempts as respuestas_correctas,
+            m.correct_percentage as porcentaje_aciertos
         FROM users u
-        LEFT JOIN user_interactions ui ON u.id = ui.user_id
-        GROUP BY u.id
+        LEFT JOIN user_metrics m ON u.id = m.user_id
+        ORDER BY u.id
     ''')
 
-    rows = cursor.fetchall()
-    conn.close()
+    filename = export_path("estadisticas_usuarios", compress, export_dir)
+    write_cursor_to_csv(
+        cursor, filename,
+        ["Usuario", "Escenarios respondidos", "Respuestas correctas", "Porcentaje de aciertos (%)"],
+        compress=compress, progress=progress
+    )
+    return filename
 
-    # Asegurar carpeta de exportaciones
-    export_dir = "exports"
-    os.makedirs(export_dir, exist_ok=True)
 
-    filename = os.path.join(export_dir, f"estadisticas_usuarios_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv")
+def get_export_watermark(name: str) -> int:
+    """Último ID de interacción exportado para la exportación indicada."""
+    row = get_connection().execute(
+        "SELECT last_interaction_id FROM export_watermarks WHERE name = ?", (name,)
+    ).fetchone()
+    return row[0] if row else 0
 
-    with open(filename, mode="w", newline="", encoding="utf-8") as file:
-        writer = csv.writer(file)
-        writer.writerow(["Usuario", "Escenarios respondidos", "Respuestas correctas", "Porcentaje de aciertos (%)"])
-        writer.writerows(rows)
 
-    return filename
+def export_interactions_to_csv(incremental=True, compress=False, progress=None, export_dir="exports",
+                               name="interacciones"):
+    """Exporta user_interactions; en modo incremental, solo las posteriores a la última exportación.
+
+    Incluye las interacciones ya archivadas que aún no se habían exportado.
+    Retorna (ruta, filas) o (None, 0) si no había interacciones nuevas.
+    """
+    conn = get_connection()
+    since_id = get_export_watermark(name) if incremental else 0
+    last_id = conn.execute(
+        "SELECT MAX(COALESCE((SELECT MAX(id) FROM user_interactions), 0), "
+        "COALESCE((SELECT MAX(last_id) FROM interaction_archive_segments), 0))"
+    ).fetchone()[0]
+    if last_id <= since_id:
+        return None, 0
+
+    cursor = conn.execute('''
+        SELECT ui.id, u.username, u.department, ui.scenario_id,
+               ui.user_response, ui.chatbot_feedback, ui.timestamp
+        FROM user_interactions ui
+        JOIN users u ON u.id = ui.user_id
+        WHERE ui.id > ? AND ui.id <= ?
+        ORDER BY ui.id
+    ''', (since_id, last_id))
+
+    # Las archivadas tienen ids menores que las que siguen en la base: van primero
+    users = {user_id: (username, department)
+             for user_id, username, department in conn.execute("SELECT id, username, department FROM users")}
+    archived = (
+        (row["id"], *users[row["user_id"]], row["scenario_id"],
+         row["user_response"], row["chatbot_feedback"], row["timestamp"])
+        for row in iter_archived_interactions(after_id=since_id)
+        if row["user_id"] in users
+    )
+
+    filename = export_path(name, compress, export_dir)
+    written = write_cursor_to_csv(
+        itertools.chain(archived, cursor), filename,
+        ["ID", "Usuario", "Departamento", "Escenario", "Respuesta", "Retroalimentación", "Fecha"],
+        compress=compress, progress=progress
+    )
+
+    # La marca de agua avanza solo cuando el archivo quedó completo
+    with conn:
+        conn.execute(
+            "INSERT INTO export_watermarks (name, last_interaction_id, exported_at) "
+            "VALUES (?, ?, CURRENT_TIMESTAMP) "
+            "ON CONFLICT(name) DO UPDATE SET last_interaction_id = excluded.last_interaction_id, "
+            "exported_at = excluded.exported_at",
+            (name, last_id)
+        )
+    return filename, written
@@ -0,0 +1,84 @@
+import os
+import sqlite3
+import threading
+
+import config
+
+# Pragmas que solo se aplican al crear la base: deben ir antes de WAL y de la primera tabla.
+# En una base existente auto_vacuum se activa una vez con
+# python -m utils.interaction_archive --enable-incremental-vacuum
+NEW_DATABASE_PRAGMAS = (
+    "PRAGMA auto_vacuum = INCREMENTAL",
+)
+
+# Pragmas que se aplican una sola vez al abrir cada conexión
+CONNECTION_PRAGMAS = (
+    "PRAGMA journal_mode = WAL",
+    "PRAGMA synchronous = NORMAL",
+    "PRAGMA cache_size = -8000",
+    "PRAGMA foreign_keys = ON",
+)
+
+# Sentencias preparadas que sqlite3 conserva por conexión
+STATEMENT_CACHE_SIZE = 128
+
+_local = threading.local()
+_registry_lock = threading.Lock()
+_open_connections = []
+
+
+def open_connection(db_path: str) -> sqlite3.Connection:
+    """Abre una conexión nueva con los pragmas del proyecto aplicados."""
+    is_new = not os.path.exists(db_path) or os.path.getsize(db_path) == 0
+    conn = sqlite3.connect(db_path, cached_statements=STATEMENT_CACHE_SIZE)
+    for pragma in (NEW_DATABASE_PRAGMAS + CONNECTION_PRAGMAS if is_new else CONNECTION_PRAGMAS):
+        conn.execute(pragma)
+    return conn
+
+
+def get_connection(db_path: str = None) -> sqlite3.Connection:
+    """Devuelve la conexión del hilo actual para la base de datos, creándola si hace falta.
+
+    Cada hilo reutiliza su propia conexión, de modo que las sentencias preparadas
+    y los pragmas se conservan entre llamadas. Usa `with conn:` para confirmar
+    o revertir las escrituras.
+    """
+    db_path = db_path or config.DB_PATH
+    connections = getattr(_local, "connections", None)
+    if connections is None:
+        connections = _local.connections = {}
+
+    conn = connections.get(db_path)
+    if conn is None:
+        conn = open_connection(db_path)
+        connections[db_path] = conn
+        with _registry_lock:
+            _open_connections.append(conn)
+    return conn
+
+
+def close_connection(db_path: str = None):
+    """Cierra la conexión del hilo actual para la base de datos indicada."""
+    db_path = db_path or config.DB_PATH
+    connections = getattr(_local, "connections", {})
+    conn = connections.pop(db_path, None)
+    if conn is not None:
+        with _registry_lock:
+            if conn in _open_connections:
+                _open_connections.remove(conn)
+        conn.close()
+
+
+def close_all_connections():
+    """Cierra todas las conexiones abiertas por cualquier hilo (al salir de la aplicación)."""
+    with _registry_lock:
+        connections = list(_open_connections)
+        _open_connections.clear()
+    for conn in connections:
+        try:
+            conn.close()
+        except sqlite3.ProgrammingError:
+            # La conexión pertenece a otro hilo que ya terminó
+            pass
+    if hasattr(_local, "connections"):
+        _local.connections.clear()
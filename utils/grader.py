@@ -0,0 +1,168 @@
+import json
+import math
+import re
+from collections import Counter, namedtuple
+from functools import lru_cache
+
+from utils.response_cache import normalize_answer
+
+# Resultado de calificar una respuesta: correcta o no, confianza en [0, 1] y puntaje bruto
+Grade = namedtuple("Grade", ["correct", "confidence", "score"])
+
+# Rúbrica general; la de cada escenario (columna phishing_scenarios.rubric) se suma a esta.
+# Los textos se escriben ya normalizados: minúsculas y sin acentos.
+DEFAULT_RUBRIC = {
+    "safe_keywords": [
+        "report", "reportar", "reporto", "verificar", "verifico", "elimino", "borro", "ignoro",
+        "bloqueo", "sospechoso", "phishing", "fraude", "equipo de ti", "seguridad", "contacto",
+        "llamo", "confirmo", "remitente",
+    ],
+    "risky_keywords": [
+        "ingreso mis datos", "doy mis datos", "pongo mi contrasena", "descargo el archivo",
+        "transfiero", "pago", "actualizo mis datos",
+    ],
+    "safe_patterns": [
+        r"\b(no|nunca|jamas|tampoco|ni) (hago|haria|daria|doy) clic\b",
+        r"\b(no|nunca|jamas|tampoco|ni) (abro|abriria|descargo|descargaria|respondo|responderia)\b",
+        r"\b(no|nunca|jamas|tampoco|ni) (ingreso|ingresaria|escribo|doy|transfiero|transferiria|pago)\b",
+        r"\b(lo|la) (reporto|reportaria|elimino|eliminaria|borro|ignoro)\b",
+        r"\bverific\w* (el|la|al|con) (remitente|banco|fuente|persona|jefe|ejecutivo)\b",
+    ],
+    # Una coincidencia riesgosa no cuenta si hay una negación en las palabras previas (ver _negated)
+    "risky_patterns": [
+        r"\b(hago|haria|doy) clic\b",
+        r"\b(abro|abriria|descargo) (el|la|los|las)? ?(enlace|link|adjunto|archivo)\b",
+        r"\b(transfiero|transferiria|envio el dinero|pago)\b",
+        r"\b(ingreso|ingresaria|escribo) (mis|mi) (datos|contrasena|clave|credenciales)\b",
+    ],
+    "reference_correct": [
+        "no hago clic en el enlace y reporto el correo al equipo de ti",
+        "verifico el remitente y lo reporto como phishing",
+        "no abro el adjunto y elimino el correo",
+        "confirmo la solicitud por otro medio antes de hacer algo",
+    ],
+    "reference_incorrect": [
+        "hago clic en el enlace para revisar",
+        "ingreso mis datos en la pagina",
+        "descargo el archivo adjunto",
+        "hago la transferencia de inmediato",
+    ],
+}
+
+# Peso de cada señal en el puntaje; un puntaje de ±CONFIDENCE_SCALE equivale a confianza 1
+KEYWORD_WEIGHT = 1.0
+PATTERN_WEIGHT = 2.0
+SIMILARITY_WEIGHT = 3.0
+CONFIDENCE_SCALE = 3.0
+
+_WORD = re.compile(r"[a-z0-9]+")
+
+# Negaciones que anulan una acción riesgosa si aparecen en las NEGATION_WINDOW palabras previas
+NEGATIONS = frozenset({"no", "nunca", "jamas", "ni", "tampoco"})
+NEGATION_WINDOW = 3
+
+
+def _negated(text, start) -> bool:
+    """True si alguna de las palabras que preceden a la posición `start` es una negación."""
+    return not NEGATIONS.isdisjoint(_WORD.findall(text[:start])[-NEGATION_WINDOW:])
+
+
+def _affirmed_phrase(padded, phrase) -> bool:
+    """True si la frase aparece al menos una vez sin negación delante."""
+    start = padded.find(phrase)
+    while start != -1:
+        if not _negated(padded, start):
+            return True
+        start = padded.find(phrase, start + 1)
+    return False
+
+
+def _terms(text):
+    """Unigramas y bigramas de un texto normalizado (los bigramas capturan negaciones)."""
+    words = _WORD.findall(text)
+    return words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+
+
+class _TfidfIndex:
+    """Vectores TF-IDF dispersos y normalizados de las respuestas de referencia."""
+
+    def __init__(self, documents):
+        doc_terms = [Counter(_terms(doc)) for doc in documents]
+        df = Counter(term for terms in doc_terms for term in terms)
+        n = len(documents)
+        self.idf = {term: math.log((1 + n) / (1 + count)) + 1 for term, count in df.items()}
+        self.vectors = [self._normalize(terms) for terms in doc_terms]
+
+    def _normalize(self, counts):
+        vector = {term: tf * self.idf.get(term, 0.0) for term, tf in counts.items()}
+        norm = math.sqrt(sum(w * w for w in vector.values()))
+        return {term: w / norm for term, w in vector.items()} if norm else {}
+
+    def similarities(self, text):
+        query = self._normalize(Counter(_terms(text)))
+        return [sum(w * vector.get(term, 0.0) for term, w in query.items()) for vector in self.vectors]
+
+
+class Rubric:
+    """Rúbrica compilada: palabras clave, expresiones regulares y referencias TF-IDF."""
+
+    def __init__(self, spec):
+        def merged(key):
+            return [normalize_answer(item) if not key.endswith("patterns") else item
+                    for item in DEFAULT_RUBRIC[key] + list(spec.get(key, []))]
+
+        self.safe_keywords = merged("safe_keywords")
+        self.risky_keywords = merged("risky_keywords")
+        self.safe_patterns = [re.compile(p) for p in merged("safe_patterns")]
+        self.risky_patterns = [re.compile(p) for p in merged("risky_patterns")]
+        correct = merged("reference_correct")
+        incorrect = merged("reference_incorrect")
+        self.tip = spec.get("tip")
+        self._index = _TfidfIndex(correct + incorrect)
+        self._n_correct = len(correct)
+
+    def grade(self, answer) -> Grade:
+        text = normalize_answer(answer)
+        padded = f" {text} "
+        score = 0.0
+        score += KEYWORD_WEIGHT * sum(f" {k} " in padded for k in self.safe_keywords)
+        score -= KEYWORD_WEIGHT * sum(_affirmed_phrase(padded, f" {k} ") for k in self.risky_keywords)
+        score += PATTERN_WEIGHT * sum(bool(p.search(text)) for p in self.safe_patterns)
+        score -= PATTERN_WEIGHT * sum(any(not _negated(text, m.start()) for m in p.finditer(text))
+                                      for p in self.risky_patterns)
+
+        similarities = self._index.similarities(text)
+        best_correct = max(similarities[:self._n_correct], default=0.0)
+        best_incorrect = max(similarities[self._n_correct:], default=0.0)
+        score += SIMILARITY_WEIGHT * (best_correct - best_incorrect)
+
+        return Grade(score > 0, min(1.0, abs(score) / CONFIDENCE_SCALE), round(score, 3))
+
+
+@lru_cache(maxsize=256)
+def compile_rubric(rubric_json=None) -> Rubric:
+    """Compila (una sola vez por contenido) la rúbrica JSON de un escenario."""
+    spec = {}
+    if rubric_json:
+        try:
+            spec = json.loads(rubric_json)
+        except ValueError:
+            spec = {}
+    return Rubric(spec)
+
+
+def grade_answer(scenario, answer) -> Grade:
+    """Califica localmente la respuesta del usuario a un escenario."""
+    return compile_rubric(scenario.get("rubric")).grade(answer)
+
+
+def parse_outcome(feedback):
+    """Lee el resultado al inicio de la retroalimentación: True, False o None si no lo indica."""
+    words = normalize_answer(feedback[:40]).split()
+    if not words:
+        return None
+    if words[0] == "correcto":
+        return True
+    if words[0] == "incorrecto":
+        return False
+    return None
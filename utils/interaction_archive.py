@@ -0,0 +1,239 @@
+"""Archivo frío de user_interactions.
+
+Las interacciones más antiguas que ARCHIVE_AFTER_DAYS salen de la base de datos
+hacia segmentos JSONL comprimidos con zlib (data/archive/), por bloques y en
+transacciones cortas. Cada segmento queda registrado en interaction_archive_segments
+y sus totales por usuario y escenario se suman a archived_interaction_totals, de
+modo que rebuild_user_metrics sigue contando el historial completo.
+
+El archivado solo reduce el archivo de la base si auto_vacuum es incremental,
+como en las bases creadas por la aplicación. Una base anterior se convierte una
+vez, con la aplicación cerrada, mediante --enable-incremental-vacuum (hace un
+VACUUM completo); el archivado nunca lo ejecuta por su cuenta.
+
+Uso: python -m utils.interaction_archive [--days 180] [--enable-incremental-vacuum]
+"""
+import json
+import os
+import time
+import zlib
+
+import config
+from config import ARCHIVE_AFTER_DAYS, ARCHIVE_CHUNK_ROWS
+from utils.db import get_connection
+
+# Columnas guardadas en cada línea del segmento, en este orden
+ARCHIVE_COLUMNS = ("id", "user_id", "scenario_id", "user_response", "chatbot_feedback", "timestamp",
+                   "is_correct", "grader")
+
+# Espera entre bloques para no acaparar la base de datos frente a las escrituras del chat
+CHUNK_PAUSE_SECONDS = 0.05
+
+
+def archive_dir() -> str:
+    """Carpeta de los segmentos, junto al archivo de la base de datos."""
+    return os.path.join(os.path.dirname(config.DB_PATH), "archive")
+
+
+def _write_segment(path, rows):
+    """Escribe el segmento comprimido de forma atómica (archivo temporal + rename)."""
+    lines = "".join(json.dumps(dict(zip(ARCHIVE_COLUMNS, row)), ensure_ascii=False) + "\n" for row in rows)
+    tmp_path = f"{path}.part"
+    with open(tmp_path, "wb") as file:
+        file.write(zlib.compress(lines.encode("utf-8"), 6))
+        file.flush()
+        os.fsync(file.fileno())
+    os.replace(tmp_path, path)
+
+
+def read_segment(path) -> list:
+    """Filas (dicts) de un segmento."""
+    with open(path, "rb") as file:
+        data = zlib.decompress(file.read()).decode("utf-8")
+    return [json.loads(line) for line in data.splitlines() if line]
+
+
+def incremental_vacuum_enabled(conn) -> bool:
+    """True si la base tiene auto_vacuum incremental (PRAGMA auto_vacuum = 2)."""
+    return conn.execute("PRAGMA auto_vacuum").fetchone()[0] == 2
+
+
+def enable_incremental_vacuum(conn) -> bool:
+    """Activa auto_vacuum incremental con un VACUUM completo. Retorna False si ya estaba activo.
+
+    El VACUUM reescribe la base y la bloquea mientras dura: ejecutarlo con la aplicación cerrada.
+    """
+    if incremental_vacuum_enabled(conn):
+        return False
+    conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+    conn.execute("VACUUM")
+    return True
+
+
+def archive_old_interactions(max_age_days=ARCHIVE_AFTER_DAYS, chunk_rows=ARCHIVE_CHUNK_ROWS,
+                             pause=CHUNK_PAUSE_SECONDS, progress=None) -> int:
+    """Mueve al archivo las interacciones anteriores a `max_age_days`. Retorna las filas archivadas.
+
+    Cada bloque de `chunk_rows` filas se escribe primero al segmento y luego, en
+    una sola transacción, se registra el segmento, se suman sus totales y se
+    borran las filas; si algo falla, las filas siguen en la base y el bloque se
+    repite en la próxima ejecución. Tras cada bloque se liberan las páginas
+    vacías con incremental_vacuum, si la base lo tiene activo; si no, quedan
+    libres para reutilizarse. progress(filas_archivadas) se llama por bloque.
+    """
+    conn = get_connection()
+    vacuum = incremental_vacuum_enabled(conn)
+    os.makedirs(archive_dir(), exist_ok=True)
+    cutoff = conn.execute("SELECT datetime('now', ?)", (f"-{max_age_days} days",)).fetchone()[0]
+
+    archived = 0
+    while True:
+        # Los IDs crecen con el tiempo: las filas viejas están al principio del recorrido por id
+        rows = conn.execute(f'''
+            SELECT {", ".join(ARCHIVE_COLUMNS)}
+            FROM user_interactions
+            WHERE timestamp < ?
+            ORDER BY id
+            LIMIT ?
+        ''', (cutoff, chunk_rows)).fetchall()
+        if not rows:
+            break
+
+        first_id, last_id = rows[0][0], rows[-1][0]
+        timestamps = [row[5] for row in rows]
+        path = os.path.join(archive_dir(), f"interactions_{first_id:012d}_{last_id:012d}.jsonl.z")
+        _write_segment(path, rows)
+
+        with conn:
+            segment_id = conn.execute('''
+                INSERT INTO interaction_archive_segments
+                    (file_name, first_id, last_id, min_timestamp, max_timestamp, row_count, created_at)
+                VALUES (?, ?, ?, ?, ?, ?, CURRENT_TIMESTAMP)
+            ''', (os.path.basename(path), first_id, last_id, min(timestamps), max(timestamps), len(rows))).lastrowid
+            conn.executemany(
+                "INSERT OR IGNORE INTO interaction_archive_users (user_id, segment_id) VALUES (?, ?)",
+                [(user_id, segment_id) for user_id in {row[1] for row in rows}]
+            )
+            conn.execute('''
+                INSERT INTO archived_interaction_totals (user_id, scenario_id, attempts, correct, last_active)
+                SELECT user_id, scenario_id, COUNT(*),
+                       SUM(COALESCE(is_correct, chatbot_feedback LIKE '¡Correcto!%')), MAX(timestamp)
+                FROM user_interactions
+                WHERE id BETWEEN ? AND ? AND timestamp < ?
+                GROUP BY user_id, scenario_id
+                ON CONFLICT(user_id, scenario_id) DO UPDATE SET
+                    attempts = attempts + excluded.attempts,
+                    correct = correct + excluded.correct,
+                    last_active = MAX(last_active, excluded.last_active)
+            ''', (first_id, last_id, cutoff))
+            conn.execute(
+                "DELETE FROM user_interactions WHERE id BETWEEN ? AND ? AND timestamp < ?",
+                (first_id, last_id, cutoff)
+            )
+        if vacuum:
+            # execute() solo avanza un paso del pragma (una página); executescript lo completa
+            conn.executescript("PRAGMA incremental_vacuum;")
+
+        archived += len(rows)
+        if progress:
+            progress(archived)
+        if len(rows) < chunk_rows:
+            break
+        time.sleep(pause)
+    if archived and not vacuum:
+        print("auto_vacuum incremental no está activo: el archivo de la base no se reduce. "
+              "Actívalo con la aplicación cerrada: python -m utils.interaction_archive --enable-incremental-vacuum")
+    return archived
+
+
+def iter_archived_interactions(user_id=None, since=None, until=None, after_id=0):
+    """Recorre en orden de id las interacciones archivadas, con filtros opcionales.
+
+    Filtra por usuario, rango de fechas (`since`/`until` como 'AAAA-MM-DD',
+    ambos inclusive) e id mayor que `after_id`. Solo se descomprimen los
+    segmentos que pueden contener filas del filtro.
+    """
+    conditions = ["last_id > ?"]
+    params = [after_id]
+    if user_id is not None:
+        conditions.append("id IN (SELECT segment_id FROM interaction_archive_users WHERE user_id = ?)")
+        params.append(user_id)
+    if since:
+        conditions.append("max_timestamp >= ?")
+        params.append(since)
+    if until:
+        conditions.append("min_timestamp < date(?, '+1 day')")
+        params.append(until)
+    segments = get_connection().execute(
+        f"SELECT file_name FROM interaction_archive_segments WHERE {' AND '.join(conditions)} ORDER BY first_id",
+        params
+    ).fetchall()
+
+    until_exclusive = None
+    if until:
+        until_exclusive = get_connection().execute("SELECT date(?, '+1 day')", (until,)).fetchone()[0]
+    for (file_name,) in segments:
+        for row in read_segment(os.path.join(archive_dir(), file_name)):
+            if row["id"] <= after_id:
+                continue
+            if user_id is not None and row["user_id"] != user_id:
+                continue
+            if since and row["timestamp"] < since:
+                continue
+            if until_exclusive and row["timestamp"] >= until_exclusive:
+                continue
+            yield row
+
+
+def purge_user_from_archive(user_id):
+    """Elimina del archivo las interacciones de un usuario (al borrar su cuenta)."""
+    conn = get_connection()
+    segments = conn.execute('''
+        SELECT s.id, s.file_name
+        FROM interaction_archive_segments s
+        JOIN interaction_archive_users au ON au.segment_id = s.id
+        WHERE au.user_id = ?
+    ''', (user_id,)).fetchall()
+
+    for segment_id, file_name in segments:
+        path = os.path.join(archive_dir(), file_name)
+        remaining = [row for row in read_segment(path) if row["user_id"] != user_id]
+        if remaining:
+            _write_segment(path, [tuple(row[column] for column in ARCHIVE_COLUMNS) for row in remaining])
+        with conn:
+            if remaining:
+                conn.execute(
+                    "UPDATE interaction_archive_segments SET row_count = ? WHERE id = ?",
+                    (len(remaining), segment_id)
+                )
+            else:
+                conn.execute("DELETE FROM interaction_archive_users WHERE segment_id = ?", (segment_id,))
+                conn.execute("DELETE FROM interaction_archive_segments WHERE id = ?", (segment_id,))
+        if not remaining:
+            os.remove(path)
+
+    with conn:
+        conn.execute("DELETE FROM interaction_archive_users WHERE user_id = ?", (user_id,))
+        conn.execute("DELETE FROM archived_interaction_totals WHERE user_id = ?", (user_id,))
+
+
+if __name__ == "__main__":
+    import argparse
+
+    from database_setup import create_tables
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--days", type=int, default=ARCHIVE_AFTER_DAYS, help="antigüedad mínima en días")
+    parser.add_argument("--enable-incremental-vacuum", action="store_true",
+                        help="activar auto_vacuum incremental con un VACUUM completo (con la aplicación cerrada)")
+    args = parser.parse_args()
+
+    create_tables()
+    if args.enable_incremental_vacuum:
+        if enable_incremental_vacuum(get_connection()):
+            print("auto_vacuum incremental activado.")
+        else:
+            print("auto_vacuum incremental ya estaba activo.")
+        raise SystemExit(0)
+    total = archive_old_interactions(args.days, progress=lambda rows: print(f"Archivadas {rows} filas..."))
+    print(f"Interacciones archivadas: {total}")
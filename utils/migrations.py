@@ -0,0 +1,61 @@
+"""Migraciones de esquema versionadas con PRAGMA user_version.
+
+Cada migración tiene un número de versión creciente y una función apply(conn)
+que recibe la conexión ya dentro de una transacción. La migración y el nuevo
+user_version se confirman juntos: si algo falla, la base queda en la versión
+anterior y la siguiente ejecución vuelve a intentarlo desde ese punto.
+
+Las funciones apply no deben llamar a commit(), `with conn:` ni executescript(),
+porque confirmarían la transacción a medias.
+"""
+import sqlite3
+from collections import namedtuple
+
+# version: entero creciente; description: texto para los registros; apply: función(conn)
+Migration = namedtuple("Migration", ["version", "description", "apply"])
+
+
+def get_schema_version(conn: sqlite3.Connection) -> int:
+    """Versión del esquema guardada en la cabecera de la base (0 si nunca se migró)."""
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+
+def column_names(conn: sqlite3.Connection, table: str) -> set:
+    """Columnas actuales de una tabla (vacío si no existe)."""
+    return {row[1] for row in conn.execute(f"PRAGMA table_info({table})")}
+
+
+def add_column(conn: sqlite3.Connection, table: str, column: str, definition: str) -> bool:
+    """Agrega la columna si falta. Retorna True si se agregó."""
+    if column in column_names(conn, table):
+        return False
+    conn.execute(f"ALTER TABLE {table} ADD COLUMN {column} {definition}")
+    return True
+
+
+def migrate(conn: sqlite3.Connection, migrations, log=None) -> list:
+    """Aplica en orden las migraciones pendientes, cada una en su propia transacción.
+
+    La versión se vuelve a leer después de reservar la escritura, de modo que
+    dos procesos que arrancan a la vez no aplican la misma migración dos veces.
+    Retorna las versiones aplicadas.
+    """
+    applied = []
+    for migration in sorted(migrations, key=lambda m: m.version):
+        if get_schema_version(conn) >= migration.version:
+            continue
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            if get_schema_version(conn) >= migration.version:
+                conn.rollback()
+                continue
+            migration.apply(conn)
+            conn.execute(f"PRAGMA user_version = {int(migration.version)}")
+            conn.commit()
+        except BaseException:
+            conn.rollback()
+            raise
+        applied.append(migration.version)
+        if log:
+            log(f"Migración {migration.version} aplicada: {migration.description}")
+    return applied
@@ -0,0 +1,230 @@
+"""Servidor local compatible con /v1/chat/completions para pruebas y benchmarks.
+
+Simula latencia, streaming (SSE) e inyección de errores sin llamar a la API real.
+
+Uso: python -m utils.mock_openai_server [--port 8001] [--latency-ms 300] [--error-rate 0.1]
+y luego OPENAI_BASE_URL=http://127.0.0.1:8001/v1 en el .env.
+"""
+import argparse
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+DEFAULT_RESPONSE = (
+    "Correcto, no debes hacer clic en el enlace. Verifica el remitente y reporta el correo al área de TI. "
+    "¿Qué harías si el mensaje parece venir de tu jefe?"
+)
+
+
+class _MockHTTPServer(ThreadingHTTPServer):
+    """ThreadingHTTPServer con una cola de conexiones amplia.
+
+    Con el valor por defecto (5), las ráfagas de los benchmarks concurrentes
+    desbordan el listen() y el cliente recibe conexiones reiniciadas.
+    """
+
+    request_queue_size = 256
+    daemon_threads = True
+
+
+class MockOpenAIServer:
+    """Imitación local del endpoint de chat completions de OpenAI.
+
+    latency_ms: espera antes de responder (± jitter_ms).
+    chunk_delay_ms: espera entre fragmentos cuando se pide stream=True.
+    error_rate: fracción de solicitudes que fallan con error_status.
+    retry_after: valor del encabezado Retry-After en las respuestas de error.
+    """
+
+    def __init__(self, host="127.0.0.1", port=0, latency_ms=0, jitter_ms=0, chunk_delay_ms=0,
+                 error_rate=0.0, error_status=500, retry_after=None, response_text=DEFAULT_RESPONSE):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.chunk_delay_ms = chunk_delay_ms
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.retry_after = retry_after
+        self.response_text = response_text
+        self.request_count = 0
+        self.error_count = 0
+        self._lock = threading.Lock()
+        self._server = _MockHTTPServer((host, port), self._make_handler())
+        self._thread = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, name="mock-openai", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def _sleep_latency(self):
+        delay = self.latency_ms + random.uniform(-self.jitter_ms, self.jitter_ms)
+        if delay > 0:
+            time.sleep(delay / 1000)
+
+    def _should_fail(self) -> bool:
+        with self._lock:
+            self.request_count += 1
+            failed = random.random() < self.error_rate
+            if failed:
+                self.error_count += 1
+            return failed
+
+    def _make_handler(self):
+        mock = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            disable_nagle_algorithm = True
+
+            def handle(self):
+                try:
+                    super().handle()
+                except (BrokenPipeError, ConnectionResetError):
+                    # El cliente cortó la conexión (p. ej. al vencer su plazo)
+                    pass
+
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+                if not self.path.rstrip("/").endswith("/chat/completions"):
+                    self._send_json(404, {"error": {"message": "Ruta no encontrada", "type": "invalid_request_error"}})
+                    return
+                try:
+                    request = json.loads(body or b"{}")
+                except ValueError:
+                    self._send_json(400, {"error": {"message": "JSON inválido", "type": "invalid_request_error"}})
+                    return
+
+                mock._sleep_latency()
+                if mock._should_fail():
+                    headers = {}
+                    if mock.retry_after is not None:
+                        headers["Retry-After"] = str(mock.retry_after)
+                    self._send_json(mock.error_status, {
+                        "error": {"message": "Error simulado", "type": "server_error", "code": mock.error_status}
+                    }, headers)
+                    return
+
+                if request.get("stream"):
+                    self._send_stream(request)
+                else:
+                    self._send_json(200, mock_completion(request, mock.response_text))
+
+            def _send_json(self, status, payload, headers=None):
+                data = json.dumps(payload).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(data)
+
+            def _send_stream(self, request):
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.send_header("Cache-Control", "no-cache")
+                self.send_header("Connection", "close")
+                self.end_headers()
+                for chunk in mock_stream_chunks(request, mock.response_text):
+                    self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode())
+                    self.wfile.flush()
+                    if mock.chunk_delay_ms:
+                        time.sleep(mock.chunk_delay_ms / 1000)
+                self.wfile.write(b"data: [DONE]\n\n")
+                self.wfile.flush()
+                self.close_connection = True
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
+
+
+def _usage(request, text):
+    prompt_tokens = sum(len(str(m.get("content", "")).split()) for m in request.get("messages", []))
+    completion_tokens = len(text.split())
+    return {
+        "prompt_tokens": prompt_tokens,
+        "completion_tokens": completion_tokens,
+        "total_tokens": prompt_tokens + completion_tokens,
+    }
+
+
+def mock_completion(request, text):
+    """Respuesta no streaming con la forma de la API de OpenAI."""
+    return {
+        "id": "chatcmpl-mock",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": request.get("model", "mock"),
+        "choices": [{
+            "index": 0,
+            "message": {"role": "assistant", "content": text},
+            "finish_reason": "stop",
+        }],
+        "usage": _usage(request, text),
+    }
+
+
+def mock_stream_chunks(request, text):
+    """Fragmentos SSE palabra por palabra con la forma de la API de OpenAI."""
+    base = {
+        "id": "chatcmpl-mock",
+        "object": "chat.completion.chunk",
+        "created": int(time.time()),
+        "model": request.get("model", "mock"),
+    }
+    words = text.split(" ")
+    for i, word in enumerate(words):
+        content = word if i == 0 else " " + word
+        yield {**base, "choices": [{"index": 0, "delta": {"content": content}, "finish_reason": None}]}
+    yield {**base, "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}]}
+    if (request.get("stream_options") or {}).get("include_usage"):
+        yield {**base, "choices": [], "usage": _usage(request, text)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8001)
+    parser.add_argument("--latency-ms", type=float, default=300)
+    parser.add_argument("--jitter-ms", type=float, default=0)
+    parser.add_argument("--chunk-delay-ms", type=float, default=20)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--error-status", type=int, default=500)
+    parser.add_argument("--retry-after", type=float, default=None)
+    args = parser.parse_args()
+
+    server = MockOpenAIServer(
+        host=args.host, port=args.port, latency_ms=args.latency_ms, jitter_ms=args.jitter_ms,
+        chunk_delay_ms=args.chunk_delay_ms, error_rate=args.error_rate,
+        error_status=args.error_status, retry_after=args.retry_after,
+    )
+    print(f"Servidor simulado de OpenAI en {server.base_url}")
+    try:
+        server._server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server._server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,182 @@
+import asyncio
+import random
+import threading
+import time
+
+
+class UpstreamUnavailable(Exception):
+    """El proveedor no respondió a tiempo: circuito abierto, reintentos agotados o plazo vencido."""
+
+
+class RetryPolicy:
+    """Reintentos con retroceso exponencial y jitter completo.
+
+    El intento n espera un tiempo aleatorio entre 0 y min(max_delay, base_delay * 2**n).
+    Si el proveedor indica Retry-After, se espera al menos ese tiempo.
+    """
+
+    def __init__(self, max_attempts=3, base_delay=0.5, max_delay=8.0):
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+    def delay(self, attempt, retry_after=None) -> float:
+        backoff = random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+        if retry_after is not None:
+            return max(retry_after, backoff)
+        return backoff
+
+
+class CircuitBreaker:
+    """Corta las llamadas tras `failure_threshold` fallos seguidos.
+
+    Abierto, rechaza todo durante `reset_timeout` segundos; después deja pasar
+    una única llamada de prueba (semiabierto) que lo cierra si tiene éxito o lo
+    vuelve a abrir si falla. Si la prueba se cancela o termina en un error que
+    no indica caída del proveedor, solo se libera para la siguiente llamada.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold=5, reset_timeout=30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+        self._lock = threading.Lock()
+        self.trips = 0
+        self.rejected = 0
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            return self._state
+
+    def allow(self) -> bool:
+        """Indica si se puede intentar una llamada ahora."""
+        with self._lock:
+            if self._state == self.CLOSED:
+                return True
+            if self._state == self.OPEN and time.monotonic() - self._opened_at >= self.reset_timeout:
+                self._state = self.HALF_OPEN
+                self._probe_in_flight = False
+            if self._state == self.HALF_OPEN and not self._probe_in_flight:
+                self._probe_in_flight = True
+                return True
+            self.rejected += 1
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self._state = self.CLOSED
+            self._failures = 0
+            self._probe_in_flight = False
+
+    def release(self):
+        """Libera la llamada de prueba sin cambiar el estado del disyuntor."""
+        with self._lock:
+            self._probe_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._state == self.HALF_OPEN or self._failures >= self.failure_threshold:
+                if self._state != self.OPEN:
+                    self.trips += 1
+                self._state = self.OPEN
+                self._opened_at = time.monotonic()
+                self._probe_in_flight = False
+
+
+class ResilientCaller:
+    """Ejecuta llamadas al proveedor con plazo total, reintentos y disyuntor.
+
+    fn(timeout) recibe los segundos que quedan del plazo para pasarlos al cliente HTTP.
+    classify(exc) retorna (reintentable, retry_after_segundos_o_None). Los errores
+    no reintentables se relanzan tal cual; los demás terminan en UpstreamUnavailable
+    cuando se agotan los intentos o el plazo.
+    """
+
+    def __init__(self, classify, deadline_seconds=20.0, policy=None, breaker=None):
+        self.classify = classify
+        self.deadline_seconds = deadline_seconds
+        self.policy = policy or RetryPolicy()
+        self.breaker = breaker or CircuitBreaker()
+
+    def _before_attempt(self, deadline):
+        if not self.breaker.allow():
+            raise UpstreamUnavailable("Circuito abierto: el proveedor falló repetidamente.")
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            raise UpstreamUnavailable("Se agotó el plazo de la solicitud.")
+        return remaining
+
+    def _after_failure(self, error, attempt, deadline):
+        """Retorna la espera antes del próximo intento o relanza el error."""
+        retryable, retry_after = self.classify(error)
+        if not retryable:
+            # El fallo no indica si el proveedor está caído (p. ej. un 4xx o una cancelación)
+            self.breaker.release()
+            raise error
+        self.breaker.record_failure()
+        if attempt + 1 >= self.policy.max_attempts:
+            raise UpstreamUnavailable(f"Reintentos agotados: {error}") from error
+        delay = self.policy.delay(attempt, retry_after)
+        if time.monotonic() + delay >= deadline:
+            raise UpstreamUnavailable(f"No hay tiempo para reintentar: {error}") from error
+        return delay
+
+    def call(self, fn):
+        deadline = time.monotonic() + self.deadline_seconds
+        attempt = 0
+        while True:
+            remaining = self._before_attempt(deadline)
+            try:
+                result = fn(remaining)
+            except Exception as e:
+                time.sleep(self._after_failure(e, attempt, deadline))
+                attempt += 1
+                continue
+            except BaseException:
+                self.breaker.release()
+                raise
+            self.breaker.record_success()
+            return result
+
+    async def acall(self, fn):
+        """Versión asíncrona de call(); fn(timeout) debe devolver una corrutina."""
+        deadline = time.monotonic() + self.deadline_seconds
+        attempt = 0
+        while True:
+            remaining = self._before_attempt(deadline)
+            try:
+                result = await fn(remaining)
+            except Exception as e:
+                await asyncio.sleep(self._after_failure(e, attempt, deadline))
+                attempt += 1
+                continue
+            except BaseException:
+                # asyncio.CancelledError no deriva de Exception
+                self.breaker.release()
+                raise
+            self.breaker.record_success()
+            return result
+
+
+def parse_retry_after(value):
+    """Segundos indicados por el encabezado Retry-After (número o fecha HTTP), o None."""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    from email.utils import parsedate_to_datetime
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
@@ -0,0 +1,200 @@
+import hashlib
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+
+from utils.db import get_connection
+
+_NON_WORD = re.compile(r"[^a-z0-9]+")
+
+
+def normalize_answer(text: str) -> str:
+    """Normaliza una respuesta para que variantes triviales compartan la misma clave.
+
+    Pasa a minúsculas, elimina acentos y signos de puntuación y colapsa espacios:
+    "No hago clic." y "no  hago CLIC" producen "no hago clic".
+    """
+    text = unicodedata.normalize("NFKD", text.lower())
+    text = "".join(ch for ch in text if not unicodedata.combining(ch))
+    return _NON_WORD.sub(" ", text).strip()
+
+
+def make_cache_key(scenario_id, user_input, model, temperature, prompt_version, context="") -> str:
+    """Clave de caché a partir del escenario, la respuesta normalizada y la configuración del modelo.
+
+    `context` identifica los turnos previos enviados con la solicitud; vacío en el primer turno.
+    """
+    temperature_bucket = f"{round(float(temperature), 1):.1f}"
+    parts = [str(scenario_id), normalize_answer(user_input), model, temperature_bucket, str(prompt_version)]
+    if context:
+        parts.append(hashlib.sha256(context.encode("utf-8")).hexdigest())
+    raw = "\x1f".join(parts)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class _Flight:
+    """Llamada en curso compartida por las solicitudes idénticas concurrentes."""
+    __slots__ = ("event", "value", "error")
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.value = None
+        self.error = None
+
+
+class ResponseCache:
+    """Caché de respuestas del LLM en dos niveles: LRU en memoria y tabla SQLite.
+
+    Las entradas expiran tras `ttl_seconds`. La tabla se recorta a `max_rows`
+    entradas (las más antiguas primero) cada `prune_every` escrituras.
+    get_or_compute() agrupa las solicitudes concurrentes con la misma clave
+    para que compartan una única llamada al proveedor.
+    """
+
+    def __init__(self, max_memory_entries=512, max_rows=20000, ttl_seconds=7 * 24 * 3600, prune_every=100):
+        self.max_memory_entries = max_memory_entries
+        self.max_rows = max_rows
+        self.ttl_seconds = ttl_seconds
+        self.prune_every = prune_every
+        self._memory = OrderedDict()
+        self._inflight = {}
+        self._lock = threading.Lock()
+        self._writes = 0
+        self.memory_hits = 0
+        self.db_hits = 0
+        self.misses = 0
+        self.coalesced = 0
+
+    def get(self, key):
+        """Devuelve la respuesta guardada o None."""
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                value, expires_at = entry
+                if expires_at > now:
+                    self._memory.move_to_end(key)
+                    self.memory_hits += 1
+                    return value
+                del self._memory[key]
+
+        try:
+            row = get_connection().execute(
+                "SELECT response, expires_at FROM llm_response_cache WHERE cache_key = ? AND expires_at > ?",
+                (key, now)
+            ).fetchone()
+        except sqlite3.Error:
+            row = None
+        with self._lock:
+            if row is None:
+                self.misses += 1
+                return None
+            self.db_hits += 1
+            self._remember(key, row[0], row[1])
+        return row[0]
+
+    def put(self, key, value):
+        """Guarda una respuesta en ambos niveles."""
+        now = time.time()
+        expires_at = now + self.ttl_seconds
+        with self._lock:
+            self._remember(key, value, expires_at)
+            self._writes += 1
+            prune = self._writes % self.prune_every == 0
+
+        try:
+            conn = get_connection()
+            with conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO llm_response_cache (cache_key, response, created_at, expires_at) "
+                    "VALUES (?, ?, ?, ?)",
+                    (key, value, now, expires_at)
+                )
+            if prune:
+                self.prune()
+        except sqlite3.Error as e:
+            # La respuesta ya está en memoria; no perderla por un fallo del nivel persistente
+            print(f"No se pudo guardar la respuesta en caché: {e}")
+
+    def _remember(self, key, value, expires_at):
+        self._memory[key] = (value, expires_at)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_memory_entries:
+            self._memory.popitem(last=False)
+
+    def prune(self):
+        """Elimina entradas expiradas y recorta la tabla a max_rows."""
+        conn = get_connection()
+        with conn:
+            conn.execute("DELETE FROM llm_response_cache WHERE expires_at <= ?", (time.time(),))
+            conn.execute(
+                "DELETE FROM llm_response_cache WHERE cache_key IN ("
+                "SELECT cache_key FROM llm_response_cache ORDER BY created_at DESC LIMIT -1 OFFSET ?)",
+                (self.max_rows,)
+            )
+
+    def get_or_compute(self, key, compute, share_error=None):
+        """Devuelve (respuesta, desde_cache). Solo una llamada a compute() por clave a la vez.
+
+        share_error(exc) indica si un error de compute() se entrega también a las
+        solicitudes que esperaban la misma clave (por defecto, todos). Si no, por
+        ejemplo porque quien llamaba canceló, una de ellas repite compute().
+        """
+        value = self.get(key)
+        if value is not None:
+            return value, True
+
+        while True:
+            with self._lock:
+                # Otra solicitud pudo completar la misma clave mientras consultábamos la tabla
+                entry = self._memory.get(key)
+                if entry is not None and entry[1] > time.time():
+                    return entry[0], True
+
+                flight = self._inflight.get(key)
+                leader = flight is None
+                if leader:
+                    flight = self._inflight[key] = _Flight()
+                else:
+                    self.coalesced += 1
+
+            if leader:
+                break
+            flight.event.wait()
+            if flight.error is None:
+                return flight.value, True
+            if share_error is None or share_error(flight.error):
+                raise flight.error
+
+        try:
+            flight.value = compute()
+            self.put(key, flight.value)
+            return flight.value, False
+        except Exception as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._inflight[key]
+            flight.event.set()
+
+    def clear_memory(self):
+        with self._lock:
+            self._memory.clear()
+
+    def stats(self) -> dict:
+        """Contadores de aciertos y fallos de la caché."""
+        with self._lock:
+            hits = self.memory_hits + self.db_hits
+            lookups = hits + self.misses
+            return {
+                "memory_hits": self.memory_hits,
+                "db_hits": self.db_hits,
+                "misses": self.misses,
+                "coalesced": self.coalesced,
+                "hit_rate": round(hits / lookups * 100, 2) if lookups else 0.0,
+                "memory_entries": len(self._memory),
+            }
@@ -0,0 +1,160 @@
+import random
+import threading
+
+from utils.db import get_connection
+
+
+class Scenario:
+    """Escenario de phishing inmutable y compacto.
+
+    Admite acceso por clave (`scenario["text"]`) para conservar la interfaz
+    de diccionario que usan el chatbot y las ventanas.
+    """
+    __slots__ = ("id", "text", "difficulty", "image", "rubric")
+
+    def __init__(self, id, text, difficulty, image, rubric=None):
+        self.id = id
+        self.text = text
+        self.difficulty = difficulty
+        self.image = image
+        self.rubric = rubric
+
+    def __getitem__(self, key):
+        if key not in Scenario.__slots__:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def get(self, key, default=None):
+        return getattr(self, key) if key in Scenario.__slots__ else default
+
+    def __repr__(self):
+        return f"Scenario(id={self.id!r}, difficulty={self.difficulty!r})"
+
+
+class ScenarioCatalog:
+    """Catálogo en memoria de phishing_scenarios con selección aleatoria en O(1).
+
+    Se recarga solo cuando cambia la versión registrada en scenario_catalog_meta.
+    Para no consultarla en cada selección se usa PRAGMA data_version (cambios de
+    otras conexiones) junto con total_changes (cambios de la propia conexión).
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._stamps = threading.local()
+        # (por id, todos los ids, ids por dificultad); se reemplaza completo al recargar
+        self._state = ({}, [], {})
+        self.version = None
+
+    def _load(self, conn, version):
+        rows = conn.execute(
+            "SELECT id, scenario_text, difficulty_level, image_path, rubric FROM phishing_scenarios ORDER BY id"
+        ).fetchall()
+        by_id = {}
+        by_difficulty = {}
+        for row in rows:
+            scenario = Scenario(*row)
+            by_id[scenario.id] = scenario
+            by_difficulty.setdefault(scenario.difficulty, []).append(scenario.id)
+        self._state = (by_id, list(by_id), by_difficulty)
+        self.version = version
+
+    def refresh(self):
+        """Recarga el catálogo si la tabla cambió desde la última lectura."""
+        conn = get_connection()
+        stamp = (conn.execute("PRAGMA data_version").fetchone()[0], conn.total_changes)
+        if self.version is not None and getattr(self._stamps, "value", None) == stamp:
+            return
+
+        version = conn.execute("SELECT version FROM scenario_catalog_meta WHERE id = 1").fetchone()[0]
+        with self._lock:
+            if version != self.version:
+                self._load(conn, version)
+        self._stamps.value = stamp
+
+    def invalidate(self):
+        """Fuerza la recarga en el próximo acceso."""
+        with self._lock:
+            self.version = None
+
+    def ids(self, difficulty=None) -> list:
+        """IDs de escenarios, opcionalmente filtrados por dificultad (lista compartida, no modificar)."""
+        self.refresh()
+        _, all_ids, by_difficulty = self._state
+        if difficulty is None:
+            return all_ids
+        return by_difficulty.get(difficulty, [])
+
+    def get(self, scenario_id):
+        self.refresh()
+        return self._state[0].get(scenario_id)
+
+    def random(self, difficulty=None):
+        """Devuelve un escenario aleatorio o None si no hay ninguno."""
+        self.refresh()
+        by_id, all_ids, by_difficulty = self._state
+        ids = all_ids if difficulty is None else by_difficulty.get(difficulty, [])
+        if not ids:
+            return None
+        return by_id[random.choice(ids)]
+
+    def __len__(self):
+        self.refresh()
+        return len(self._state[1])
+
+
+class ScenarioDeck:
+    """Secuencia aleatoria sin repeticiones para una sesión de entrenamiento.
+
+    Usa Fisher-Yates perezoso: cada extracción cuesta O(1) y solo guarda los
+    intercambios realizados, sin copiar la lista de IDs del catálogo. Cuando
+    se agotan los escenarios, o el catálogo cambia, comienza una nueva ronda.
+    """
+
+    def __init__(self, catalog, difficulty=None):
+        self.catalog = catalog
+        self.difficulty = difficulty
+        self._lock = threading.Lock()
+        self._ids = []
+        self._swaps = {}
+        self._remaining = 0
+        self._next_index = None
+        self._version = None
+
+    def _reset(self):
+        self._ids = self.catalog.ids(self.difficulty)
+        self._swaps = {}
+        self._remaining = len(self._ids)
+        self._next_index = None
+        self._version = self.catalog.version
+
+    def _prepare(self):
+        self.catalog.refresh()
+        if self._version != self.catalog.version or self._remaining == 0:
+            self._reset()
+
+    def peek(self):
+        """Devuelve el escenario que entregará el próximo draw(), sin extraerlo."""
+        with self._lock:
+            self._prepare()
+            if self._remaining == 0:
+                return None
+            if self._next_index is None:
+                self._next_index = random.randrange(self._remaining)
+            position = self._swaps.get(self._next_index, self._next_index)
+            return self.catalog.get(self._ids[position])
+
+    def draw(self):
+        """Extrae el siguiente escenario de la sesión o None si el catálogo está vacío."""
+        with self._lock:
+            self._prepare()
+            if self._remaining == 0:
+                return None
+
+            index = self._next_index if self._next_index is not None else random.randrange(self._remaining)
+            self._next_index = None
+            last = self._remaining - 1
+            position = self._swaps.get(index, index)
+            self._swaps[index] = self._swaps.pop(last, last)
+            self._remaining -= 1
+            return self.catalog.get(self._ids[position])
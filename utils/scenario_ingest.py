@@ -0,0 +1,232 @@
+"""Ingesta de paquetes de escenarios de phishing.
+
+Un paquete es una carpeta con archivos .json (lista de objetos), .jsonl (un
+objeto por línea) o .csv (con encabezados), más sus imágenes. Cada escenario
+trae `text`, `difficulty` y opcionalmente `image` (relativa a la carpeta del
+paquete o a la raíz del proyecto) y `rubric` (objeto o texto JSON).
+
+Los escenarios se identifican por el hash de su texto: volver a cargar un
+paquete no los duplica, y uno cuyo texto ya existe solo se actualiza si cambió
+su dificultad, imagen o rúbrica. Cada cambio sube la versión del catálogo
+(scenario_catalog_meta), que es la que usan ScenarioCatalog y las cachés.
+
+Uso: python -m utils.scenario_ingest carpeta_o_archivo [...]
+"""
+import csv
+import hashlib
+import json
+import os
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+
+from config import BASE_DIR
+from utils.db import get_connection
+
+DIFFICULTY_LEVELS = ("Fácil", "Intermedio", "Difícil")
+INGEST_CHUNK_ROWS = 1000
+INGEST_WORKERS = min(8, (os.cpu_count() or 1) * 2)
+
+# Resultado de una ingesta: escenarios nuevos, actualizados, sin cambios y errores [(origen, motivo)]
+IngestReport = namedtuple("IngestReport", ["inserted", "updated", "unchanged", "errors"])
+
+_EXTENSIONS = (".json", ".jsonl", ".csv")
+
+
+def scenario_content_hash(text) -> str:
+    """Hash del texto del escenario con los espacios normalizados."""
+    return hashlib.sha256(" ".join(text.split()).encode("utf-8")).hexdigest()
+
+
+def iter_pack_records(path):
+    """Recorre en streaming los registros de un archivo o carpeta: (origen, carpeta base, dict)."""
+    if os.path.isdir(path):
+        for name in sorted(os.listdir(path)):
+            if name.lower().endswith(_EXTENSIONS):
+                yield from iter_pack_records(os.path.join(path, name))
+        return
+
+    base_dir = os.path.dirname(os.path.abspath(path))
+    name = os.path.basename(path)
+    lower = name.lower()
+    with open(path, newline="", encoding="utf-8-sig") as file:
+        if lower.endswith(".jsonl"):
+            for line_number, line in enumerate(file, start=1):
+                if line.strip():
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        record = None
+                    yield f"{name}:{line_number}", base_dir, record
+        elif lower.endswith(".csv"):
+            for line_number, record in enumerate(csv.DictReader(file), start=2):
+                yield f"{name}:{line_number}", base_dir, record
+        else:
+            records = json.load(file)
+            for index, record in enumerate(records if isinstance(records, list) else [records], start=1):
+                yield f"{name}#{index}", base_dir, record
+
+
+def _store_image_path(image, base_dir):
+    """Ruta a guardar para la imagen: relativa a la raíz del proyecto si está dentro. None si no existe."""
+    candidates = [image] if os.path.isabs(image) else [os.path.join(base_dir, image), os.path.join(BASE_DIR, image)]
+    for candidate in candidates:
+        if os.path.isfile(candidate):
+            candidate = os.path.abspath(candidate)
+            relative = os.path.relpath(candidate, BASE_DIR)
+            return candidate if relative.startswith("..") else relative.replace(os.sep, "/")
+    return None
+
+
+def _prepare_chunk(chunk):
+    """Valida un bloque de registros. Retorna [(origen, fila o None, error o None)].
+
+    La fila es (texto, dificultad, imagen, rúbrica JSON, hash). La comprobación
+    de imágenes en disco es lo que se reparte entre hilos.
+    """
+    prepared = []
+    for origin, base_dir, record in chunk:
+        if not isinstance(record, dict):
+            prepared.append((origin, None, "Registro ilegible."))
+            continue
+        text = " ".join(str(record.get("text") or "").split())
+        difficulty = str(record.get("difficulty") or "").strip()
+        image = str(record.get("image") or "").strip() or None
+        rubric = record.get("rubric") or None
+
+        if not text:
+            prepared.append((origin, None, "El escenario no tiene texto."))
+            continue
+        if difficulty not in DIFFICULTY_LEVELS:
+            prepared.append((origin, None, f"Dificultad no válida: {difficulty or '-'}."))
+            continue
+        if isinstance(rubric, str):
+            try:
+                rubric = json.loads(rubric)
+            except ValueError:
+                prepared.append((origin, None, "La rúbrica no es JSON válido."))
+                continue
+        if rubric is not None and not isinstance(rubric, dict):
+            prepared.append((origin, None, "La rúbrica debe ser un objeto JSON."))
+            continue
+        if image is not None:
+            stored = _store_image_path(image, base_dir)
+            if stored is None:
+                prepared.append((origin, None, f"No se encontró la imagen: {image}."))
+                continue
+            image = stored
+
+        rubric_json = json.dumps(rubric, ensure_ascii=False, sort_keys=True) if rubric is not None else None
+        prepared.append((origin, (text, difficulty, image, rubric_json, scenario_content_hash(text)), None))
+    return prepared
+
+
+def _chunks(records, size):
+    records = iter(records)
+    while True:
+        chunk = list(islice(records, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def upsert_scenarios(rows, conn=None):
+    """Inserta o actualiza filas (texto, dificultad, imagen, rúbrica, hash) en una transacción.
+
+    Retorna (nuevas, actualizadas, sin cambios). Las filas idénticas a las
+    guardadas no se escriben, de modo que repetir una ingesta no cambia la versión.
+    """
+    conn = conn or get_connection()
+    # Un mismo texto repetido en el lote: gana la última aparición
+    rows = list({row[4]: row for row in rows}.values())
+    existing = {}
+    for start in range(0, len(rows), 500):
+        hashes = [row[4] for row in rows[start:start + 500]]
+        existing.update(
+            (content_hash, (difficulty, image, rubric))
+            for content_hash, difficulty, image, rubric in conn.execute(
+                "SELECT content_hash, difficulty_level, image_path, rubric FROM phishing_scenarios "
+                f"WHERE content_hash IN ({', '.join('?' * len(hashes))})", hashes
+            )
+        )
+
+    changed = [row for row in rows if existing.get(row[4]) != row[1:4]]
+    inserted = sum(1 for row in changed if row[4] not in existing)
+    if changed:
+        with conn:
+            conn.executemany('''
+                INSERT INTO phishing_scenarios (scenario_text, difficulty_level, image_path, rubric, content_hash)
+                VALUES (?, ?, ?, ?, ?)
+                ON CONFLICT(content_hash) DO UPDATE SET
+                    difficulty_level = excluded.difficulty_level,
+                    image_path = excluded.image_path,
+                    rubric = excluded.rubric
+            ''', changed)
+    return inserted, len(changed) - inserted, len(rows) - len(changed)
+
+
+def ingest_scenarios(sources, chunk_rows=INGEST_CHUNK_ROWS, progress=None) -> IngestReport:
+    """Carga uno o varios paquetes (rutas) o un iterable de dicts de escenarios.
+
+    Los registros se validan por bloques en un pool de hilos y cada bloque
+    válido se guarda en su propia transacción. Si un texto se repite, vale su
+    primera aparición. progress(registros_leídos) se llama por bloque.
+    """
+    if isinstance(sources, str):
+        sources = [sources]
+    sources = list(sources)
+    if all(isinstance(source, str) for source in sources):
+        records = (record for source in sources for record in iter_pack_records(source))
+    else:
+        records = ((f"#{index}", BASE_DIR, record) for index, record in enumerate(sources, start=1))
+
+    totals = [0, 0, 0]
+    errors = []
+    read = 0
+    # Hashes ya vistos en esta ingesta: un texto repetido con otros datos no debe alternar entre cargas
+    seen = set()
+    conn = get_connection()
+
+    def store(prepared):
+        nonlocal read
+        rows = []
+        for origin, row, error in prepared:
+            if error is None and row[4] in seen:
+                error = "Escenario repetido en el paquete."
+            if error:
+                errors.append((origin, error))
+            else:
+                seen.add(row[4])
+                rows.append(row)
+        for index, count in enumerate(upsert_scenarios(rows, conn)):
+            totals[index] += count
+        read += len(prepared)
+        if progress:
+            progress(read)
+
+    with ThreadPoolExecutor(max_workers=INGEST_WORKERS, thread_name_prefix="scenario-ingest") as pool:
+        # Solo unos pocos bloques en vuelo: la memoria no depende del tamaño del paquete
+        pending = []
+        for chunk in _chunks(records, chunk_rows):
+            pending.append(pool.submit(_prepare_chunk, chunk))
+            if len(pending) >= INGEST_WORKERS:
+                store(pending.pop(0).result())
+        for future in pending:
+            store(future.result())
+    return IngestReport(*totals, errors)
+
+
+if __name__ == "__main__":
+    import sys
+
+    from database_setup import create_tables
+
+    if len(sys.argv) < 2:
+        print(__doc__)
+        sys.exit(1)
+
+    create_tables()
+    report = ingest_scenarios(sys.argv[1:], progress=lambda rows: print(f"Leídos {rows} registros..."))
+    print(f"Escenarios nuevos: {report.inserted}, actualizados: {report.updated}, sin cambios: {report.unchanged}")
+    for origin, error in report.errors:
+        print(f"  {origin}: {error}")
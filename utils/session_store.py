@@ -0,0 +1,159 @@
+import json
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+
+from utils.db import get_connection
+
+
+class SessionState:
+    """Estado de una sesión de chat (usuario + escenario), compacto y serializable.
+
+    `turns` guarda (respuesta del usuario, respuesta del asistente, tokens) y
+    `summary` las líneas del resumen de turnos antiguos (ver ConversationMemory).
+    """
+    __slots__ = ("user_id", "scenario_id", "turn_count", "completed", "turns", "summary",
+                 "created_at", "last_active")
+
+    def __init__(self, user_id, scenario_id, turn_count=0, completed=False, turns=None, summary=None,
+                 created_at=None, last_active=None):
+        now = time.time()
+        self.user_id = user_id
+        self.scenario_id = scenario_id
+        self.turn_count = turn_count
+        self.completed = completed
+        self.turns = turns if turns is not None else []
+        self.summary = summary if summary is not None else []
+        self.created_at = created_at or now
+        self.last_active = last_active or now
+
+    def to_row(self):
+        history = json.dumps({"turns": self.turns, "summary": self.summary}, ensure_ascii=False)
+        return (self.user_id, self.scenario_id, self.turn_count, int(self.completed), history,
+                self.created_at, self.last_active)
+
+    @classmethod
+    def from_row(cls, row):
+        user_id, scenario_id, turn_count, completed, history, created_at, last_active = row
+        data = json.loads(history or "{}")
+        turns = [tuple(turn) for turn in data.get("turns", [])]
+        return cls(user_id, scenario_id, turn_count, bool(completed), turns, data.get("summary", []),
+                   created_at, last_active)
+
+    def __repr__(self):
+        return (f"SessionState(user_id={self.user_id!r}, scenario_id={self.scenario_id!r}, "
+                f"turn_count={self.turn_count}, completed={self.completed})")
+
+
+class SessionStore:
+    """Sesiones de chat en memoria con expiración por inactividad y tamaño máximo.
+
+    Las sesiones se ordenan por último uso; al acceder se descartan las que
+    superan `idle_ttl_seconds` sin actividad y las más antiguas si hay más de
+    `max_sessions`. Con `writer` (un BatchWriter sobre chat_sessions) cada cambio
+    se guarda en segundo plano y una sesión que no está en memoria se busca en
+    SQLite, de modo que sobrevive a un reinicio de la aplicación.
+    """
+
+    def __init__(self, max_sessions=500, idle_ttl_seconds=3600, writer=None):
+        self.max_sessions = max_sessions
+        self.idle_ttl_seconds = idle_ttl_seconds
+        self.writer = writer
+        self._sessions = OrderedDict()
+        self._lock = threading.RLock()
+        self._purged = False
+        self.evictions = 0
+
+    def _evict(self, now):
+        cutoff = now - self.idle_ttl_seconds
+        while self._sessions:
+            state = next(iter(self._sessions.values()))
+            if state.last_active >= cutoff and len(self._sessions) <= self.max_sessions:
+                break
+            self._sessions.popitem(last=False)
+            self.evictions += 1
+
+    def _load(self, key, now):
+        if self.writer is None:
+            return None
+        try:
+            if not self._purged:
+                # Una vez por proceso: borrar las sesiones guardadas que ya expiraron
+                self._purged = True
+                purge_expired_sessions(self.idle_ttl_seconds)
+            row = get_connection().execute(
+                "SELECT user_id, scenario_id, turn_count, completed, history, created_at, last_active "
+                "FROM chat_sessions WHERE user_id = ? AND scenario_id = ? AND last_active >= ?",
+                (*key, now - self.idle_ttl_seconds)
+            ).fetchone()
+        except Exception as e:
+            print(f"No se pudo leer la sesión guardada: {e}")
+            return None
+        return SessionState.from_row(row) if row else None
+
+    @contextmanager
+    def session(self, user_id, scenario_id):
+        """Bloquea y entrega la sesión (creándola si no existe); al salir la marca y la guarda."""
+        key = (user_id, scenario_id)
+        with self._lock:
+            now = time.time()
+            state = self._sessions.get(key)
+            if state is not None and state.last_active < now - self.idle_ttl_seconds:
+                state = None
+            if state is None:
+                state = self._load(key, now) or SessionState(user_id, scenario_id)
+            self._sessions[key] = state
+            self._sessions.move_to_end(key)
+
+            yield state
+
+            state.last_active = time.time()
+            self._evict(state.last_active)
+            self._save(state)
+
+    def _save(self, state):
+        if self.writer is not None:
+            try:
+                self.writer.submit(state.to_row())
+            except RuntimeError as e:
+                print(f"No se pudo guardar la sesión: {e}")
+
+    def reset(self, user_id, scenario_id):
+        """Reemplaza la sesión por una vacía, también la guardada en SQLite.
+
+        Se usa cada vez que se presenta el escenario: los turnos y el cierre de
+        una presentación anterior no cuentan para la nueva.
+        """
+        key = (user_id, scenario_id)
+        with self._lock:
+            state = SessionState(user_id, scenario_id)
+            self._sessions[key] = state
+            self._sessions.move_to_end(key)
+            self._evict(state.last_active)
+            self._save(state)
+
+    def peek(self, user_id, scenario_id):
+        """Sesión en memoria sin crearla ni actualizarla (None si no existe)."""
+        with self._lock:
+            return self._sessions.get((user_id, scenario_id))
+
+    def discard(self, user_id, scenario_id):
+        """Olvida la sesión en memoria (la copia en SQLite expira sola)."""
+        with self._lock:
+            self._sessions.pop((user_id, scenario_id), None)
+
+    def clear(self):
+        with self._lock:
+            self._sessions.clear()
+
+    def __len__(self):
+        with self._lock:
+            return len(self._sessions)
+
+
+def purge_expired_sessions(idle_ttl_seconds):
+    """Elimina de chat_sessions las sesiones inactivas por más de idle_ttl_seconds."""
+    conn = get_connection()
+    with conn:
+        conn.execute("DELETE FROM chat_sessions WHERE last_active < ?", (time.time() - idle_ttl_seconds,))
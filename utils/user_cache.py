@@ -0,0 +1,121 @@
+import threading
+from collections import OrderedDict, namedtuple
+
+from utils.db import get_connection
+
+UserRecord = namedtuple("UserRecord", ["id", "username", "role", "department", "password_hash"])
+
+_USER_COLUMNS = "id, username, role, department, password_hash"
+
+
+class UserCache:
+    """Caché de lectura de registros de usuario, indexada por ID y por nombre.
+
+    Los registros se leen de la tabla users la primera vez que se piden y se
+    guardan en un LRU de hasta `max_entries` entradas. Las búsquedas de
+    usuarios inexistentes no se guardan, para que un registro nuevo sea visible
+    de inmediato. Cualquier código que modifique la tabla users debe llamar a
+    invalidate() (o clear()) para no servir datos obsoletos.
+    """
+
+    def __init__(self, max_entries=128):
+        self.max_entries = max_entries
+        self._by_id = OrderedDict()
+        self._by_username = {}
+        self._count = None
+        # Aumenta en cada invalidación; una lectura que se cruce con una escritura no se guarda
+        self._generation = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get_by_id(self, user_id):
+        """Devuelve el UserRecord del ID indicado o None si no existe."""
+        with self._lock:
+            record = self._by_id.get(user_id)
+            if record is not None:
+                self._by_id.move_to_end(user_id)
+                self.hits += 1
+                return record
+            self.misses += 1
+            generation = self._generation
+        return self._load("id = ?", user_id, generation)
+
+    def get_by_username(self, username):
+        """Devuelve el UserRecord del nombre indicado o None si no existe."""
+        with self._lock:
+            user_id = self._by_username.get(username)
+            if user_id is not None:
+                self._by_id.move_to_end(user_id)
+                self.hits += 1
+                return self._by_id[user_id]
+            self.misses += 1
+            generation = self._generation
+        return self._load("username = ?", username, generation)
+
+    def count(self) -> int:
+        """Número total de usuarios, recalculado solo tras una invalidación."""
+        with self._lock:
+            if self._count is not None:
+                self.hits += 1
+                return self._count
+            self.misses += 1
+            generation = self._generation
+        count = get_connection().execute("SELECT COUNT(*) FROM users").fetchone()[0]
+        with self._lock:
+            if generation == self._generation:
+                self._count = count
+        return count
+
+    def _load(self, condition, value, generation):
+        row = get_connection().execute(
+            f"SELECT {_USER_COLUMNS} FROM users WHERE {condition}", (value,)
+        ).fetchone()
+        if row is None:
+            return None
+        record = UserRecord(*row)
+        with self._lock:
+            if generation == self._generation:
+                self._remember(record)
+        return record
+
+    def _remember(self, record):
+        previous = self._by_id.pop(record.id, None)
+        if previous is not None:
+            self._by_username.pop(previous.username, None)
+        self._by_id[record.id] = record
+        self._by_username[record.username] = record.id
+        while len(self._by_id) > self.max_entries:
+            _, evicted = self._by_id.popitem(last=False)
+            self._by_username.pop(evicted.username, None)
+
+    def invalidate(self, user_id=None, username=None):
+        """Olvida el registro indicado (por ID y/o nombre) y el conteo total de usuarios."""
+        with self._lock:
+            if username is not None and user_id is None:
+                user_id = self._by_username.get(username)
+            record = self._by_id.pop(user_id, None) if user_id is not None else None
+            if record is not None:
+                self._by_username.pop(record.username, None)
+            if username is not None:
+                self._by_username.pop(username, None)
+            self._count = None
+            self._generation += 1
+
+    def clear(self):
+        with self._lock:
+            self._by_id.clear()
+            self._by_username.clear()
+            self._count = None
+            self._generation += 1
+
+    def stats(self) -> dict:
+        """Contadores de aciertos y fallos de la caché."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups * 100, 2) if lookups else 0.0,
+                "entries": len(self._by_id),
+            }